@@ -64,7 +64,6 @@ except Exception as e:
 
 DATA_DIR = os.getenv("DATA_DIR", "/data")
 WORKSPACE_DIR = os.getenv("WORKSPACE_DIR", "/workspace")
-API_KEY = os.getenv("API_KEY", "")  # Empty = no auth (local-only)
 AUTH_RATE_LIMIT = int(os.getenv("AUTH_RATE_LIMIT", "50"))
 key_store: KeyStore = None  # type: ignore  — initialized in lifespan
 PORT = int(os.getenv("PORT", "8000"))
@@ -152,6 +151,8 @@ EXTRACT_FALLBACK_NOVELTY_THRESHOLD = min(
 
 extract_queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize=EXTRACT_QUEUE_MAX)
 extract_jobs: Dict[str, Dict[str, Any]] = {}
+# Set once a job reaches a terminal state; lets in-process callers wait without polling
+extract_job_events: Dict[str, threading.Event] = {}
 extract_jobs_lock: asyncio.Lock = asyncio.Lock()
 extract_workers: List[asyncio.Task] = []
 memory_trimmer = MemoryTrimmer(
@@ -222,14 +223,21 @@ embedder_reload_metrics: Dict[str, Any] = {
 
 _auth_failures: Dict[str, list] = defaultdict(list)
 
+
+def _get_api_key() -> str:
+    """Env API key, read per request so an unset key really disables auth."""
+    return os.getenv("API_KEY", "")
+
+
 async def verify_api_key(request: Request):
     """Check X-API-Key header against env key and managed key store.
 
     Uses constant-time comparison for the env key and per-IP rate limiting
     on failures.  Sets ``request.state.auth`` to an :class:`AuthContext`.
     """
+    api_key = _get_api_key()
     # No auth configured at all → unrestricted
-    if not API_KEY and key_store is None:
+    if not api_key and key_store is None:
         request.state.auth = AuthContext.unrestricted()
         return
 
@@ -249,14 +257,14 @@ async def verify_api_key(request: Request):
 
     # No key supplied
     if not raw_key:
-        if not API_KEY:
+        if not api_key:
             request.state.auth = AuthContext.unrestricted()
             return
         _auth_failures[ip].append(now)
         raise HTTPException(status_code=401, detail="Invalid or missing API key")
 
     # Path 1: constant-time compare against env API_KEY
-    if API_KEY and hmac.compare_digest(raw_key.encode(), API_KEY.encode()):
+    if api_key and hmac.compare_digest(raw_key.encode(), api_key.encode()):
         request.state.auth = AuthContext(
             role="admin", prefixes=None, key_type="env",
         )
@@ -522,6 +530,7 @@ def _trim_finished_extract_jobs() -> None:
 
     for job_id in stale_job_ids:
         extract_jobs.pop(job_id, None)
+        extract_job_events.pop(job_id, None)
 
     # Enforce hard cap: evict oldest finished jobs when dict exceeds limit
     if len(extract_jobs) > EXTRACT_JOBS_MAX:
@@ -533,6 +542,7 @@ def _trim_finished_extract_jobs() -> None:
         to_evict = len(extract_jobs) - EXTRACT_JOBS_MAX
         for jid, _ in finished[:to_evict]:
             extract_jobs.pop(jid, None)
+            extract_job_events.pop(jid, None)
 
 
 _FALLBACK_DECISION_PATTERN = re.compile(
@@ -807,6 +817,9 @@ async def _extract_worker(worker_id: int) -> None:
                     trim_result.get("gc_collected"),
                 )
             extract_queue.task_done()
+            done_event = extract_job_events.get(job_id)
+            if done_event is not None:
+                done_event.set()
             _trim_finished_extract_jobs()
 
 
@@ -822,11 +835,15 @@ async def _periodic_job_cleanup() -> None:
             logger.debug("Periodic job cleanup error", exc_info=True)
 
 
-async def _periodic_memory_trim() -> None:
-    """Attempt periodic memory trim to reclaim allocator high-water marks."""
-    while True:
+async def _periodic_memory_trim(*, sleep=asyncio.sleep, stop: Optional[asyncio.Event] = None) -> None:
+    """Attempt periodic memory trim to reclaim allocator high-water marks.
+
+    ``sleep`` and ``stop`` let tests step the loop without waiting out the
+    real period; the loop exits once ``stop`` is set.
+    """
+    while stop is None or not stop.is_set():
         try:
-            await asyncio.sleep(MEMORY_TRIM_PERIODIC_SEC)
+            await sleep(MEMORY_TRIM_PERIODIC_SEC)
             trim_result = memory_trimmer.maybe_trim(reason="periodic")
             if trim_result.get("trimmed"):
                 logger.debug(
@@ -1117,6 +1134,7 @@ async def lifespan(app: FastAPI):
         extract_workers.clear()
     logger.info("Shutting down — saving index...")
     memory.save()
+    usage_tracker.flush()
     logger.info("Shutdown complete.")
 
 
@@ -1437,8 +1455,9 @@ async def health(request: Request):
     """
     base = {"status": "ok", "service": "memories", "version": "5.4.0"}
     # Only include detailed stats for authenticated callers
-    if not API_KEY or hmac.compare_digest(
-        request.headers.get("X-API-Key", "").encode(), API_KEY.encode()
+    api_key = _get_api_key()
+    if not api_key or hmac.compare_digest(
+        request.headers.get("X-API-Key", "").encode(), api_key.encode()
     ):
         stats = memory.stats_light()
         return {**base, **stats}
@@ -3139,6 +3158,9 @@ async def memory_extract(request_body: ExtractRequest, request: Request):
             extract_jobs[job_id]["completed_at"] = _utc_now_iso()
             extract_jobs[job_id]["error"] = str(e)
         finally:
+            done_event = threading.Event()
+            done_event.set()
+            extract_job_events[job_id] = done_event
             _trim_finished_extract_jobs()
 
         _audit(request, "extract", source=request_body.source or "extract/fallback")
@@ -3166,6 +3188,7 @@ async def memory_extract(request_body: ExtractRequest, request: Request):
         "created_at": _utc_now_iso(),
         "auth_key_id": auth.key_id,
     }
+    extract_job_events[job_id] = threading.Event()
     try:
         extract_queue.put_nowait(
             {
@@ -3184,6 +3207,7 @@ async def memory_extract(request_body: ExtractRequest, request: Request):
     except asyncio.QueueFull:
         # Remove the job we just registered since it won't be processed
         extract_jobs.pop(job_id, None)
+        extract_job_events.pop(job_id, None)
         queue_depth = extract_queue.qsize()
         retry_after_sec = max(1, min(30, (queue_depth // max(1, EXTRACT_MAX_INFLIGHT)) + 1))
         logger.warning(
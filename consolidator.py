@@ -8,8 +8,10 @@ import json
 import logging
 import random
 from collections import Counter
-from datetime import datetime, timezone
-from typing import Any, Dict, List
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +27,16 @@ Output a JSON array of consolidated text strings. Each must be self-contained.""
 # Categories that use the longer decision_days threshold (lowercase — matches llm_extract.py)
 _LONG_LIVED_CATEGORIES = {"decision", "learning"}
 
+# Category codes for prune_candidate_mask: index into the per-code threshold array
+CATEGORY_CODE_DETAIL = 0
+CATEGORY_CODE_LONG_LIVED = 1
+
+_NS_PER_DAY = 86_400 * 1_000_000_000
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Creation times are clamped to +/- 2**62 ns (about years 1823-2116) so the
+# int64 age subtraction cannot overflow; the clamp never changes a verdict.
+_NS_CLAMP = 2**62
+
 
 def _parse_datetime(ts: str) -> datetime:
     """Parse an ISO datetime string, handling both +00:00 and Z suffixes."""
@@ -237,8 +249,9 @@ def find_prune_candidates(
         and have never been retrieved.
     """
     unretrieved_set = set(unretrieved_ids)
-    now = datetime.now(timezone.utc)
-    candidates = []
+    eligible: List[Dict] = []
+    created_ns: List[int] = []
+    codes: List[int] = []
 
     for mem in all_memories:
         if not mem:
@@ -263,16 +276,51 @@ def find_prune_candidates(
         if created.tzinfo is None:
             created = created.replace(tzinfo=timezone.utc)
 
-        age_days = (now - created).days
-
         # Determine threshold based on category (lowercase from llm_extract.py)
         category = mem.get("category", "detail").lower()
-        if category in _LONG_LIVED_CATEGORIES:
-            threshold = decision_days
-        else:
-            threshold = detail_days
+        eligible.append(mem)
+        ns = (created - _EPOCH) // timedelta(microseconds=1) * 1000
+        created_ns.append(min(max(ns, -_NS_CLAMP), _NS_CLAMP))
+        codes.append(
+            CATEGORY_CODE_LONG_LIVED if category in _LONG_LIVED_CATEGORIES else CATEGORY_CODE_DETAIL
+        )
+
+    if not eligible:
+        return []
+
+    mask = prune_candidate_mask(
+        np.asarray(created_ns, dtype=np.int64),
+        np.asarray(codes, dtype=np.int8),
+        detail_days=detail_days,
+        decision_days=decision_days,
+    )
+    return [mem for mem, keep in zip(eligible, mask) if keep]
 
-        if age_days > threshold:
-            candidates.append(mem)
 
-    return candidates
+def prune_candidate_mask(
+    created_at_ns: np.ndarray,
+    category_codes: np.ndarray,
+    detail_days: int = 60,
+    decision_days: int = 120,
+    now_ns: Optional[int] = None,
+) -> np.ndarray:
+    """Vectorized age check behind find_prune_candidates().
+
+    Args:
+        created_at_ns: int64 (or datetime64) creation times in UTC nanoseconds.
+        category_codes: int8 codes, CATEGORY_CODE_DETAIL or CATEGORY_CODE_LONG_LIVED.
+        detail_days: Age threshold in days for DETAIL category memories.
+        decision_days: Age threshold in days for DECISION/LEARNING category memories.
+        now_ns: Reference time in UTC nanoseconds (defaults to now).
+
+    Returns:
+        Boolean mask, True where the whole-day age exceeds the category threshold.
+    """
+    created = np.asarray(created_at_ns)
+    if np.issubdtype(created.dtype, np.datetime64):
+        created = created.astype("datetime64[ns]").astype(np.int64)
+    if now_ns is None:
+        now_ns = (datetime.now(timezone.utc) - _EPOCH) // timedelta(microseconds=1) * 1000
+    thresholds = np.array([detail_days, decision_days], dtype=np.int64)
+    age_days = (now_ns - created.astype(np.int64)) // _NS_PER_DAY
+    return age_days > thresholds[np.asarray(category_codes, dtype=np.intp)]
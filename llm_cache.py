@@ -0,0 +1,79 @@
+"""In-process LRU cache for deterministic LLM completions."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+from typing import Optional
+
+from llm_provider import DEFAULT_TEMPERATURE, CompletionResult
+
+
+class LLMCache:
+    """Bounded LRU of completion text keyed by prompt, model and temperature.
+
+    Only temperature-0 completions are stored; anything else is not
+    reproducible. Hits come back with zero token counts since no tokens
+    were spent.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600.0, enabled: bool = True) -> None:
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled and self.max_entries > 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    @staticmethod
+    def make_key(system: str, user: str, model: str = "", temperature: float = DEFAULT_TEMPERATURE) -> str:
+        payload = json.dumps(
+            {"system": system, "user": user, "model": model, "temperature": temperature},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CompletionResult]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, text = entry
+            if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return CompletionResult(text=text, input_tokens=0, output_tokens=0)
+
+    def set(self, key: str, result: CompletionResult, temperature: float = DEFAULT_TEMPERATURE) -> None:
+        if not self.enabled or temperature > 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result.text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def complete(self, provider, system: str, user: str) -> CompletionResult:
+        """Return a cached completion for (system, user) or call the provider."""
+        if not self.enabled:
+            return provider.complete(system, user)
+        model = f"{getattr(provider, 'provider_name', '')}:{getattr(provider, 'model', '')}"
+        key = self.make_key(system, user, model)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        result = provider.complete(system, user)
+        self.set(key, result)
+        return result
@@ -6,16 +6,22 @@ Two-call pipeline:
 
 Usage:
   result = run_extraction(provider, engine, messages, source, context)
+  result = run_extraction_pipeline(provider, engine, message_chunks, source, context)
 """
+import contextlib
+import functools
 import json
 import logging
 import os
+import re
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional, List
 
 from auth_context import source_matches_prefixes
+from llm_cache import LLMCache
 
 logger = logging.getLogger(__name__)
 
@@ -39,8 +45,13 @@ def _training_output_path(out_dir: Path, now: datetime) -> Path:
     return path
 
 
+@functools.lru_cache(maxsize=32)
 def _build_extraction_system_prompt(source: str, context: str) -> str:
-    """Build the exact extraction system prompt used for a request."""
+    """Build the exact extraction system prompt used for a request.
+
+    Hooks call this with the same (source, context) for a whole session, so
+    the formatted prompt is memoized.
+    """
     template = FACT_EXTRACTION_PROMPT_AGGRESSIVE if context == "pre_compact" else FACT_EXTRACTION_PROMPT
     project = source.rsplit("/", 1)[-1] if "/" in source else source or "this"
     return template.format(project=project)
@@ -156,6 +167,38 @@ EXTRACT_SIMILAR_TEXT_CHARS = _env_int("EXTRACT_SIMILAR_TEXT_CHARS", 280, minimum
 EXTRACT_SIMILAR_PER_FACT = _env_int("EXTRACT_SIMILAR_PER_FACT", 5)
 EXTRACT_MAX_LINKS = _env_int("EXTRACT_MAX_LINKS", 3, minimum=0)
 EXTRACT_MIN_LINK_SCORE = _env_float("EXTRACT_MIN_LINK_SCORE", 0.005)
+# Transcript size actually sent to the extractor after preprocessing.
+EXTRACT_MESSAGE_CHAR_BUDGET = _env_int("EXTRACT_MESSAGE_CHAR_BUDGET", 120000, minimum=1000)
+# Fenced blocks at least this many lines long are replaced with a placeholder.
+EXTRACT_CODE_BLOCK_MAX_LINES = 20
+# Accuracy drops off when too many conversations share one extraction call.
+EXTRACT_BATCH_MAX_QUERIES = 16
+# Repeat (system, user) prompts for extraction and AUDN; off unless sized.
+LLM_CACHE = LLMCache(
+    max_entries=_env_int("EXTRACT_CACHE_SIZE", 0, minimum=0),
+    ttl_seconds=_env_float("EXTRACT_CACHE_TTL_SEC", 3600.0),
+)
+# Shared compact encoder for AUDN payloads; json.dumps with custom separators
+# builds a fresh JSONEncoder on every call.
+_COMPACT_JSON = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+_LONG_CODE_BLOCK_RE = re.compile(r"```[\w+-]*\n(?:(?!```).*\n){%d,}```" % EXTRACT_CODE_BLOCK_MAX_LINES)
+_ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;]*m")
+_BLANK_RUN_RE = re.compile(r"\n{3,}")
+
+
+def _preprocess_messages(text: str, char_budget: int) -> str:
+    """Trim transcript noise before it reaches the extraction prompt.
+
+    Long fenced code blocks and ANSI color codes carry little for fact
+    extraction, and blank-line runs collapse to one. If the transcript is
+    still over budget the most recent turns are kept.
+    """
+    text = _ANSI_ESCAPE_RE.sub("", text)
+    text = _LONG_CODE_BLOCK_RE.sub("[omitted code block]", text)
+    text = _BLANK_RUN_RE.sub("\n\n", text)
+    if len(text) > char_budget:
+        text = text[-char_budget:]
+    return text
 
 
 # --- Prompts ---
@@ -201,6 +244,15 @@ Output a JSON array of objects: [{{"category": "DECISION"|"LEARNING"|"DETAIL", "
 Each fact must be self-contained and understandable without the conversation.
 If nothing worth storing, output []."""
 
+# Appended to the extraction prompt when several conversations share one call.
+FACT_EXTRACTION_BATCH_SUFFIX = """
+
+The input contains {count} separate conversations labelled Q[1] to Q[{count}].
+Extract facts from each conversation independently.
+Output a JSON array with one object per conversation, in order:
+[{{"query_index": 1, "facts": [...]}}, ..., {{"query_index": {count}, "facts": [...]}}]
+where "facts" uses the fact format above and is [] when a conversation has nothing worth storing."""
+
 AUDN_PROMPT = """You are a memory manager. For each new fact, decide what to do given
 the existing similar memories.
 
@@ -257,13 +309,17 @@ def _build_rules_section(rules: dict | None) -> str:
 def _parse_json_array(text: str) -> list:
     """Parse a JSON array from LLM output, handling common edge cases."""
     text = text.strip()
-    # Try direct parse
-    try:
-        result = json.loads(text)
-        if isinstance(result, list):
-            return result
-    except json.JSONDecodeError:
-        pass
+    # No bracket at all: nothing below can succeed, so skip every parse attempt.
+    if "[" not in text:
+        return []
+    # Try direct parse; only a bracket-delimited payload can be a bare array.
+    if text[0] == "[" and text[-1] == "]":
+        try:
+            result = json.loads(text)
+            if isinstance(result, list):
+                return result
+        except json.JSONDecodeError:
+            pass
     # Try extracting JSON from markdown code blocks
     if "```" in text:
         for block in text.split("```"):
@@ -295,6 +351,7 @@ def extract_facts(
     context: str = "stop",
     return_error: bool = False,
     source: str = "",
+    preprocess: bool = True,
 ):
     """Extract categorized facts from conversation using LLM.
 
@@ -303,42 +360,23 @@ def extract_facts(
         messages: conversation text
         context: "stop", "pre_compact", or "session_end"
         source: memory source identifier (e.g. "claude-code/my-app")
+        preprocess: strip transcript noise via _preprocess_messages() first
 
     Returns:
         list[dict], or tuple[list[dict], Optional[str], dict] when return_error=True.
         Each dict has {"category": str, "text": str}.
     """
     system = _build_extraction_system_prompt(source, context)
+    if preprocess:
+        messages = _preprocess_messages(messages, EXTRACT_MESSAGE_CHAR_BUDGET)
 
     tokens = {"input": 0, "output": 0}
     try:
-        result = provider.complete(system, messages)
+        result = LLM_CACHE.complete(provider, system, messages)
         raw_facts = _parse_json_array(result.text)
         tokens = {"input": result.input_tokens, "output": result.output_tokens}
 
-        facts = []
-        for item in raw_facts:
-            if isinstance(item, dict) and "text" in item:
-                # New format: {"category": "...", "text": "..."}
-                cat = item.get("category", "detail").lower()
-                if cat not in ("decision", "learning", "detail"):
-                    cat = "detail"
-                text = _clip_text(str(item["text"]), EXTRACT_MAX_FACT_CHARS)
-                if text:
-                    facts.append({"category": cat, "text": text})
-            elif isinstance(item, str) and item.strip():
-                # Backward compat: plain string -> detail
-                text = _clip_text(item, EXTRACT_MAX_FACT_CHARS)
-                if text:
-                    facts.append({"category": "detail", "text": text})
-
-        if len(facts) > EXTRACT_MAX_FACTS:
-            logger.info(
-                "Extracted %d facts; keeping first %d",
-                len(facts), EXTRACT_MAX_FACTS,
-            )
-            facts = facts[:EXTRACT_MAX_FACTS]
-
+        facts = _normalize_facts(raw_facts)
         logger.info("Extracted %d facts (context=%s)", len(facts), context)
         if return_error:
             return facts, None, tokens
@@ -350,6 +388,109 @@ def extract_facts(
         return []
 
 
+def _normalize_facts(raw_facts: list) -> list[dict]:
+    """Coerce parsed LLM output into capped {"category", "text"} facts."""
+    max_facts, max_chars = EXTRACT_MAX_FACTS, EXTRACT_MAX_FACT_CHARS
+    facts = []
+    for item in raw_facts:
+        if len(facts) >= max_facts:
+            # Stop before normalizing the tail; it would be dropped anyway.
+            logger.info(
+                "Extracted %d raw facts; keeping first %d",
+                len(raw_facts), max_facts,
+            )
+            break
+        if isinstance(item, dict) and "text" in item:
+            # New format: {"category": "...", "text": "..."}
+            cat = item.get("category", "detail").lower()
+            if cat not in ("decision", "learning", "detail"):
+                cat = "detail"
+            raw_text = item["text"]
+            text = _clip_text(raw_text if isinstance(raw_text, str) else str(raw_text), max_chars)
+            if text:
+                facts.append({"category": cat, "text": text})
+        elif isinstance(item, str) and item.strip():
+            # Backward compat: plain string -> detail
+            text = _clip_text(item, max_chars)
+            if text:
+                facts.append({"category": "detail", "text": text})
+    return facts
+
+
+def _parse_batch_facts(text: str, count: int) -> list[list[dict]] | None:
+    """Map a batched response back to per-conversation facts, or None if malformed."""
+    by_index: dict[int, list] = {}
+    for entry in _parse_json_array(text):
+        if not isinstance(entry, dict):
+            return None
+        idx = entry.get("query_index")
+        raw_facts = entry.get("facts")
+        if not isinstance(idx, int) or not 1 <= idx <= count or idx in by_index:
+            return None
+        if not isinstance(raw_facts, list):
+            return None
+        by_index[idx] = raw_facts
+    if len(by_index) != count:
+        return None
+    return [_normalize_facts(by_index[i]) for i in range(1, count + 1)]
+
+
+def extract_facts_batch(
+    provider,
+    messages_list: list[str],
+    source: str = "",
+    context: str = "stop",
+) -> list[list[dict]]:
+    """Extract facts for several conversations with one LLM call per batch.
+
+    Conversations are packed as Q[1]..Q[n] under the regular extraction
+    system prompt, at most EXTRACT_BATCH_MAX_QUERIES per call. A batch whose
+    response doesn't map back onto its queries is retried one conversation
+    at a time through extract_facts().
+
+    Returns:
+        One fact list per input conversation, in input order.
+    """
+    results: list[list[dict]] = []
+    for start in range(0, len(messages_list), EXTRACT_BATCH_MAX_QUERIES):
+        chunk = [
+            _preprocess_messages(messages, EXTRACT_MESSAGE_CHAR_BUDGET)
+            for messages in messages_list[start:start + EXTRACT_BATCH_MAX_QUERIES]
+        ]
+        if len(chunk) == 1:
+            results.append(extract_facts(provider, chunk[0], context=context, source=source, preprocess=False))
+            continue
+
+        system = _build_extraction_system_prompt(source, context) + FACT_EXTRACTION_BATCH_SUFFIX.format(
+            count=len(chunk)
+        )
+        user = "\n\n".join(f"Q[{i}]:\n{messages}" for i, messages in enumerate(chunk, 1))
+        try:
+            result = provider.complete(system, user)
+        except Exception as e:
+            logger.error("Batched fact extraction failed: %s", e)
+            results.extend([] for _ in chunk)
+            continue
+
+        batch_facts = _parse_batch_facts(result.text, len(chunk))
+        if batch_facts is None:
+            logger.warning(
+                "Batched extraction response did not match %d queries; extracting individually",
+                len(chunk),
+            )
+            batch_facts = [
+                extract_facts(provider, messages, context=context, source=source, preprocess=False)
+                for messages in chunk
+            ]
+        else:
+            logger.info(
+                "Extracted %d facts across %d conversations (context=%s)",
+                sum(len(f) for f in batch_facts), len(chunk), context,
+            )
+        results.extend(batch_facts)
+    return results
+
+
 def run_audn(
     provider,
     engine,
@@ -400,11 +541,10 @@ def run_audn(
         except Exception:
             similar_per_fact[i] = []
 
-    facts_json = json.dumps(
-        [{"index": i, "text": _clip_text(f["text"], EXTRACT_MAX_FACT_CHARS), "category": f.get("category", "detail")} for i, f in enumerate(facts)],
-        separators=(",", ":"),
+    facts_json = _COMPACT_JSON.encode(
+        [{"index": i, "text": _clip_text(f["text"], EXTRACT_MAX_FACT_CHARS), "category": f.get("category", "detail")} for i, f in enumerate(facts)]
     )
-    similar_json = json.dumps(
+    similar_json = _COMPACT_JSON.encode(
         {
             str(i): [
                 {
@@ -415,8 +555,7 @@ def run_audn(
                 for m in mems[:EXTRACT_SIMILAR_PER_FACT]
             ]
             for i, mems in similar_per_fact.items()
-        },
-        separators=(",", ":"),
+        }
     )
 
     prompt = AUDN_PROMPT.format(facts_json=facts_json, similar_json=similar_json)
@@ -445,7 +584,7 @@ def run_audn(
         }
 
     try:
-        result = provider.complete(audn_system, prompt)
+        result = LLM_CACHE.complete(provider, audn_system, prompt)
         tokens = {"input": result.input_tokens, "output": result.output_tokens}
         decisions = _parse_json_array(result.text)
         del result, prompt, facts_json, similar_json
@@ -531,6 +670,13 @@ def extract_and_decide_single_call(
     return actions[:max_facts], usage, None
 
 
+# MemoryEngine.add_memories backs up before any batch larger than this.
+_ADD_BATCH_MAX = 10
+# Cosine similarity above which a queued ADD duplicates a stored memory or an
+# earlier fact in its batch (MemoryEngine.add_memories' default).
+_ADD_DEDUP_THRESHOLD = 0.90
+
+
 def execute_actions(
     engine,
     actions: list[dict],
@@ -556,6 +702,7 @@ def execute_actions(
     conflict_count = 0
     fallback_count = 0
     result_actions = []
+    pending_adds = []
 
     for action in actions:
         act = action.get("action", "").upper()
@@ -563,6 +710,10 @@ def execute_actions(
         fact = facts[fi] if 0 <= fi < len(facts) else {"text": "", "category": "detail"}
         fact_text = fact["text"] if isinstance(fact, dict) else str(fact)
 
+        if pending_adds and act not in ("ADD", "FALLBACK_ADD", "NOOP"):
+            # Store queued ADDs before any write that follows them.
+            _flush_adds(engine, pending_adds, source, result_actions)
+
         try:
             if act in ("ADD", "FALLBACK_ADD"):
                 if not source_matches_prefixes(source, allowed_prefixes):
@@ -573,17 +724,11 @@ def execute_actions(
                     fact_meta["extract_source"] = source
                 if document_at:
                     fact_meta["document_at"] = document_at
-                added_ids = engine.add_memories(
-                    texts=[fact_text],
-                    sources=[source],
-                    metadata_list=[fact_meta],
-                    deduplicate=True,
-                )
-                new_id = added_ids[0] if added_ids else None
-                result_actions.append({"action": "fallback_add" if act == "FALLBACK_ADD" else "add", "text": fact_text, "id": new_id})
-                stored_count += 1
-                if act == "FALLBACK_ADD":
-                    fallback_count += 1
+                # Deferred: consecutive ADDs go to the engine in one add_memories call.
+                pending_adds.append((len(result_actions), act, fact_text, fact_meta))
+                result_actions.append(None)
+                if len(pending_adds) >= _ADD_BATCH_MAX:
+                    _flush_adds(engine, pending_adds, source, result_actions)
 
             elif act == "UPDATE":
                 old_id = action.get("old_id")
@@ -683,6 +828,14 @@ def execute_actions(
             logger.error("Failed to execute %s for fact '%s': %s", act, fact_text[:50], e)
             result_actions.append({"action": "error", "text": fact_text, "error": str(e)})
 
+    if pending_adds:
+        _flush_adds(engine, pending_adds, source, result_actions)
+    for entry in result_actions:
+        if entry["action"] in ("add", "fallback_add"):
+            stored_count += 1
+            if entry["action"] == "fallback_add":
+                fallback_count += 1
+
     return {
         "actions": result_actions,
         "stored_count": stored_count,
@@ -693,6 +846,100 @@ def execute_actions(
     }
 
 
+def _flush_adds(engine, pending_adds: list[tuple], source: str, result_actions: list) -> None:
+    """Store queued ADD facts and fill in their result slots.
+
+    The batch goes to the engine in one call. If that call fails before
+    writing anything, each fact is retried on its own so one bad fact only
+    errors its own action; if it failed after a partial write, a retry would
+    match the stored facts as duplicates of themselves, so the whole batch
+    is reported as an error instead. Clears ``pending_adds``.
+    """
+    before = engine.stats_light()["total_memories"]
+    try:
+        new_ids = _add_deduplicated(engine, pending_adds, source)
+        batch_error = None
+    except Exception as e:
+        new_ids = None
+        if engine.stats_light()["total_memories"] != before:
+            logger.error("Batched ADD of %d facts failed after a partial write: %s", len(pending_adds), e)
+            batch_error = e
+        else:
+            logger.warning("Batched ADD of %d facts failed, retrying one by one: %s", len(pending_adds), e)
+            batch_error = None
+
+    for i, item in enumerate(pending_adds):
+        pos, act, fact_text, _ = item
+        try:
+            if batch_error is not None:
+                raise batch_error
+            new_id = new_ids[i] if new_ids is not None else _add_deduplicated(engine, [item], source)[0]
+        except Exception as e:
+            logger.error("Failed to execute %s for fact '%s': %s", act, fact_text[:50], e)
+            result_actions[pos] = {"action": "error", "text": fact_text, "error": str(e)}
+            continue
+        result_actions[pos] = {"action": "fallback_add" if act == "FALLBACK_ADD" else "add", "text": fact_text, "id": new_id}
+    pending_adds.clear()
+
+
+def _add_deduplicated(engine, pending_adds: list[tuple], source: str) -> list[Optional[int]]:
+    """Store deferred ADD facts in one add_memories call.
+
+    Returns one id per pending add, None where the fact was a duplicate.
+    Repeats of a text, and facts within _ADD_DEDUP_THRESHOLD of an earlier
+    fact in the batch, are dropped up front; the engine drops facts that
+    match existing memories and returns ids for the rest in order, which
+    are matched back to their texts.
+    """
+    texts, metas = [], []
+    seen = set()
+    for _, _, fact_text, fact_meta in pending_adds:
+        if fact_text not in seen:
+            seen.add(fact_text)
+            texts.append(fact_text)
+            metas.append(fact_meta)
+    if len(texts) > 1:
+        # Batches are capped at _ADD_BATCH_MAX, so one similarity matrix is cheap.
+        embeddings = engine.encode_texts(texts)
+        sims = embeddings @ embeddings.T
+        keep: list[int] = []
+        for i in range(len(texts)):
+            if not keep or float(sims[i, keep].max()) < _ADD_DEDUP_THRESHOLD:
+                keep.append(i)
+        texts = [texts[i] for i in keep]
+        metas = [metas[i] for i in keep]
+    added_ids = engine.add_memories(
+        texts=texts,
+        sources=[source] * len(texts),
+        metadata_list=metas,
+        deduplicate=True,
+        dedup_threshold=_ADD_DEDUP_THRESHOLD,
+    ) or []
+
+    if len(added_ids) == len(texts):
+        id_by_text = dict(zip(texts, added_ids))
+    else:
+        id_by_text = {}
+        remaining = iter(texts)
+        for new_id in added_ids:
+            stored_text = engine.get_memory(new_id).get("text")
+            for text in remaining:
+                if text == stored_text:
+                    id_by_text[text] = new_id
+                    break
+
+    ids: list[Optional[int]] = []
+    assigned = set()
+    for _, _, fact_text, _ in pending_adds:
+        # Only the first occurrence of a text owns the stored id.
+        if fact_text in assigned:
+            ids.append(None)
+            continue
+        assigned.add(fact_text)
+        ids.append(id_by_text.get(fact_text))
+    return ids
+
+
 def _mem_score(m: dict) -> float:
     """Extract the relevance score from a memory dict (RRF or cosine fallback)."""
     return float(m.get("rrf_score", m.get("similarity", 0.0)))
@@ -817,109 +1064,86 @@ def _apply_maintenance(
     }
 
 
-def run_extraction(
-    provider: Optional[object],
-    engine,
-    messages: str,
-    source: str,
-    context: str = "stop",
-    allowed_prefixes: Optional[List[str]] = None,
-    debug: bool = False,
-    profile: dict | None = None,
-    document_at: Optional[str] = None,
-) -> dict:
-    """Full extraction pipeline: extract facts -> AUDN -> execute.
+def _profile_settings(profile: dict | None, context: str) -> tuple[int, int, dict, str]:
+    """Resolve (max_facts, max_fact_chars, rules, context) for an extraction profile."""
+    if not profile:
+        return 30, 500, {}, context
+    if profile.get("mode", "standard") == "aggressive":
+        context = "pre_compact"
+    return (
+        profile.get("max_facts", 30),
+        profile.get("max_fact_chars", 500),
+        profile.get("rules", {}),
+        context,
+    )
 
-    Args:
-        provider: LLM provider (None = extraction disabled)
-        engine: MemoryEngine instance
-        messages: conversation text
-        source: memory source identifier
-        context: "stop", "pre_compact", or "session_end"
-        debug: when True, include detailed debug_trace in result
-        profile: resolved extraction profile (from ExtractionProfiles.resolve)
 
-    Returns: result dict with actions and counts
-    """
-    if provider is None:
-        return {"error": "extraction_disabled"}
+@contextlib.contextmanager
+def _fact_limits(profile: dict | None, max_facts: int, max_chars: int):
+    """Temporarily override the module-level fact caps extract_facts applies."""
+    global EXTRACT_MAX_FACTS, EXTRACT_MAX_FACT_CHARS
+    if not profile:
+        yield
+        return
+    orig_max_facts, orig_max_chars = EXTRACT_MAX_FACTS, EXTRACT_MAX_FACT_CHARS
+    EXTRACT_MAX_FACTS, EXTRACT_MAX_FACT_CHARS = max_facts, max_chars
+    try:
+        yield
+    finally:
+        EXTRACT_MAX_FACTS, EXTRACT_MAX_FACT_CHARS = orig_max_facts, orig_max_chars
 
-    job_id = uuid.uuid4().hex[:12]
 
-    # Apply profile settings
-    if profile:
-        max_facts = profile.get("max_facts", 30)
-        max_chars = profile.get("max_fact_chars", 500)
-        mode = profile.get("mode", "standard")
-        if mode == "aggressive":
-            context = "pre_compact"
-        rules = profile.get("rules", {})
-    else:
-        max_facts = 30
-        max_chars = 500
-        rules = {}
+def _run_single_call(
+    provider,
+    engine,
+    messages: str,
+    source: str,
+    allowed_prefixes: Optional[List[str]],
+    rules: dict,
+    max_facts: int,
+    job_id: str,
+    document_at: Optional[str],
+) -> dict:
+    """Extract and decide in one LLM call, then execute the actions."""
+    actions, usage, _ = extract_and_decide_single_call(
+        provider=provider,
+        messages=messages,
+        source=source,
+        engine=engine,
+        rules=rules,
+        max_facts=max_facts,
+    )
+    facts = [{"text": a.get("text", ""), "category": a.get("category", "detail")}
+             for a in actions]
+    result = execute_actions(engine, actions, facts, source, allowed_prefixes, job_id=job_id, document_at=document_at)
+    result["tokens"] = {"single_call": usage}
+    result["job_id"] = job_id
+    result["links_created"] = []
+    result["compaction_candidates"] = []
+    return result
 
-    # Single-call mode: combine extraction + AUDN in one LLM call
-    if profile and profile.get("single_call"):
-        actions, usage, _ = extract_and_decide_single_call(
-            provider=provider,
-            messages=messages,
-            source=source,
-            engine=engine,
-            rules=rules,
-            max_facts=max_facts,
-        )
-        facts = [{"text": a.get("text", ""), "category": a.get("category", "detail")}
-                 for a in actions]
-        result = execute_actions(engine, actions, facts, source, allowed_prefixes, job_id=job_id, document_at=document_at)
-        result["tokens"] = {"single_call": usage}
-        result["job_id"] = job_id
-        result["links_created"] = []
-        result["compaction_candidates"] = []
-        return result
-
-    # Temporarily override module-level constants for extract_facts
-    import llm_extract as _mod
-    orig_max_facts = _mod.EXTRACT_MAX_FACTS
-    orig_max_chars = _mod.EXTRACT_MAX_FACT_CHARS
-    if profile:
-        _mod.EXTRACT_MAX_FACTS = max_facts
-        _mod.EXTRACT_MAX_FACT_CHARS = max_chars
-    try:
-        # Step 1: Extract facts
-        facts, extract_error, extract_tokens = extract_facts(
-            provider,
-            messages,
-            context=context,
-            return_error=True,
-            source=source,
-        )
-    finally:
-        _mod.EXTRACT_MAX_FACTS = orig_max_facts
-        _mod.EXTRACT_MAX_FACT_CHARS = orig_max_chars
-    if extract_error:
-        return {
-            "actions": [],
-            "extracted_count": 0,
-            "stored_count": 0,
-            "updated_count": 0,
-            "deleted_count": 0,
-            "error": "provider_runtime_failure",
-            "error_stage": "extract_facts",
-            "error_message": extract_error,
-            "tokens": {"extract": extract_tokens, "audn": {"input": 0, "output": 0}},
-        }
 
-    if not facts:
-        return {
-            "actions": [],
-            "extracted_count": 0,
-            "stored_count": 0,
-            "updated_count": 0,
-            "deleted_count": 0,
-            "tokens": {"extract": extract_tokens, "audn": {"input": 0, "output": 0}},
-        }
+def _run_chunk(
+    provider,
+    engine,
+    messages: str,
+    facts: list[dict],
+    extract_tokens: dict,
+    source: str,
+    context: str,
+    allowed_prefixes: Optional[List[str]],
+    debug: bool,
+    profile: dict | None,
+    rules: dict,
+    job_id: str,
+    document_at: Optional[str],
+) -> dict:
+    """AUDN -> execute -> maintenance for facts already extracted from ``messages``.
 
+    Returns the run_extraction result for one chunk: the planned actions when
+    the profile asks for a dry run, otherwise the executed actions and counts,
+    plus debug_trace when ``debug`` is set.
+    """
     # Step 2: AUDN decisions
     decisions, audn_tokens, audn_artifacts = run_audn(
         provider,
@@ -1051,3 +1275,214 @@ def run_extraction(
     )
 
     return result
+
+
+def run_extraction(
+    provider: Optional[object],
+    engine,
+    messages: str,
+    source: str,
+    context: str = "stop",
+    allowed_prefixes: Optional[List[str]] = None,
+    debug: bool = False,
+    profile: dict | None = None,
+    document_at: Optional[str] = None,
+    preprocess: bool = True,
+) -> dict:
+    """Full extraction pipeline: extract facts -> AUDN -> execute.
+
+    Args:
+        provider: LLM provider (None = extraction disabled)
+        engine: MemoryEngine instance
+        messages: conversation text
+        source: memory source identifier
+        context: "stop", "pre_compact", or "session_end"
+        debug: when True, include detailed debug_trace in result
+        profile: resolved extraction profile (from ExtractionProfiles.resolve)
+        preprocess: strip transcript noise via _preprocess_messages() first
+
+    Returns: result dict with actions and counts
+    """
+    if provider is None:
+        return {"error": "extraction_disabled"}
+
+    if preprocess:
+        messages = _preprocess_messages(messages, EXTRACT_MESSAGE_CHAR_BUDGET)
+
+    job_id = uuid.uuid4().hex[:12]
+
+    # Apply profile settings
+    max_facts, max_chars, rules, context = _profile_settings(profile, context)
+
+    # Single-call mode: combine extraction + AUDN in one LLM call
+    if profile and profile.get("single_call"):
+        return _run_single_call(
+            provider, engine, messages, source, allowed_prefixes,
+            rules, max_facts, job_id, document_at,
+        )
+
+    # Step 1: Extract facts
+    with _fact_limits(profile, max_facts, max_chars):
+        facts, extract_error, extract_tokens = extract_facts(
+            provider,
+            messages,
+            context=context,
+            return_error=True,
+            source=source,
+            preprocess=False,
+        )
+    if extract_error:
+        return {
+            "actions": [],
+            "extracted_count": 0,
+            "stored_count": 0,
+            "updated_count": 0,
+            "deleted_count": 0,
+            "error": "provider_runtime_failure",
+            "error_stage": "extract_facts",
+            "error_message": extract_error,
+            "tokens": {"extract": extract_tokens, "audn": {"input": 0, "output": 0}},
+        }
+
+    if not facts:
+        return {
+            "actions": [],
+            "extracted_count": 0,
+            "stored_count": 0,
+            "updated_count": 0,
+            "deleted_count": 0,
+            "tokens": {"extract": extract_tokens, "audn": {"input": 0, "output": 0}},
+        }
+
+    return _run_chunk(
+        provider, engine, messages, facts, extract_tokens, source, context,
+        allowed_prefixes, debug, profile, rules, job_id, document_at,
+    )
+
+
+def run_extraction_pipeline(
+    provider: Optional[object],
+    engine,
+    message_chunks: list[str],
+    source: str,
+    context: str = "stop",
+    allowed_prefixes: Optional[List[str]] = None,
+    debug: bool = False,
+    profile: dict | None = None,
+    document_at: Optional[str] = None,
+) -> dict:
+    """Run extract -> AUDN -> execute over consecutive chunks of one conversation.
+
+    Fact extraction for chunk N+1 runs on a worker thread while chunk N goes
+    through AUDN and execution, so the two LLM round-trips overlap. AUDN and
+    execution stay in chunk order, letting each chunk see what the previous
+    one stored. ``debug`` and ``profile`` are honoured per chunk as in
+    run_extraction; single-call profiles run the chunks one after another.
+
+    Returns: run_extraction-style result with counts, actions and tokens summed
+    across chunks; per-chunk extraction failures are listed under "errors".
+    With ``debug``, debug_trace concatenates the chunks' traces and tags each
+    AUDN decision with its chunk index.
+    """
+    if provider is None:
+        return {"error": "extraction_disabled"}
+
+    job_id = uuid.uuid4().hex[:12]
+    max_facts, max_chars, rules, context = _profile_settings(profile, context)
+    merged = {
+        "actions": [],
+        "extracted_count": 0,
+        "stored_count": 0,
+        "updated_count": 0,
+        "deleted_count": 0,
+        "conflict_count": 0,
+        "fallback_count": 0,
+        "tokens": {},
+        "job_id": job_id,
+        "links_created": [],
+        "compaction_candidates": [],
+    }
+    if profile and profile.get("dry_run") and not profile.get("single_call"):
+        merged["dry_run"] = True
+    if debug:
+        merged["debug_trace"] = {
+            "extracted_facts": [],
+            "audn_decisions": [],
+            "execution_summary": {"added": [], "updated": [], "deleted": [], "noops": 0, "conflicts": 0},
+        }
+    errors = []
+
+    def _add_tokens(tokens: dict) -> None:
+        for stage, usage in tokens.items():
+            total = merged["tokens"].setdefault(stage, {})
+            for key, count in usage.items():
+                total[key] = total.get(key, 0) + count
+
+    def _merge(index: int, result: dict) -> None:
+        merged["actions"].extend(result["actions"])
+        merged["extracted_count"] += result.get("extracted_count", len(result["actions"]))
+        for key in ("stored_count", "updated_count", "deleted_count", "conflict_count", "fallback_count"):
+            merged[key] += result.get(key, 0)
+        merged["links_created"].extend(result.get("links_created", []))
+        merged["compaction_candidates"].extend(result.get("compaction_candidates", []))
+        trace = result.get("debug_trace")
+        if trace:
+            merged_trace = merged["debug_trace"]
+            merged_trace["extracted_facts"].extend(trace["extracted_facts"])
+            merged_trace["audn_decisions"].extend(
+                {"chunk": index, **entry} for entry in trace["audn_decisions"]
+            )
+            summary = merged_trace["execution_summary"]
+            for key, value in trace["execution_summary"].items():
+                summary[key] += value
+
+    if profile and profile.get("single_call"):
+        for index, chunk in enumerate(message_chunks):
+            result = _run_single_call(
+                provider, engine, _preprocess_messages(chunk, EXTRACT_MESSAGE_CHAR_BUDGET),
+                source, allowed_prefixes, rules, max_facts, job_id, document_at,
+            )
+            _add_tokens(result["tokens"])
+            _merge(index, result)
+    else:
+        merged["tokens"] = {"extract": {"input": 0, "output": 0}, "audn": {"input": 0, "output": 0}}
+
+        def _extract(chunk: str):
+            messages = _preprocess_messages(chunk, EXTRACT_MESSAGE_CHAR_BUDGET)
+            facts, extract_error, extract_tokens = extract_facts(
+                provider, messages, context=context, return_error=True, source=source, preprocess=False,
+            )
+            return messages, facts, extract_error, extract_tokens
+
+        with _fact_limits(profile, max_facts, max_chars), ThreadPoolExecutor(max_workers=2) as pool:
+            pending = pool.submit(_extract, message_chunks[0]) if message_chunks else None
+            for index in range(len(message_chunks)):
+                messages, facts, extract_error, extract_tokens = pending.result()
+                if index + 1 < len(message_chunks):
+                    pending = pool.submit(_extract, message_chunks[index + 1])
+                _add_tokens({"extract": extract_tokens})
+                if extract_error:
+                    errors.append({
+                        "chunk": index,
+                        "error_stage": "extract_facts",
+                        "error_message": extract_error,
+                    })
+                    continue
+                if not facts:
+                    continue
+
+                result = _run_chunk(
+                    provider, engine, messages, facts, extract_tokens, source, context,
+                    allowed_prefixes, debug, profile, rules, job_id, document_at,
+                )
+                _add_tokens({"audn": result["tokens"]["audn"]})
+                _merge(index, result)
+
+    if errors:
+        merged["errors"] = errors
+    logger.info(
+        "Pipelined extraction complete: %d chunks, %d extracted, %d stored, %d updated, %d deleted",
+        len(message_chunks), merged["extracted_count"], merged["stored_count"],
+        merged["updated_count"], merged["deleted_count"],
+    )
+    return merged
@@ -10,6 +10,7 @@ Supports five provider sources via environment variables:
   ollama:                 OLLAMA_URL (default: http://host.docker.internal:11434)
 """
 import os
+import functools
 import json
 import time
 import logging
@@ -346,6 +347,15 @@ class OllamaProvider(LLMProvider):
         if parsed.scheme not in ("http", "https"):
             raise ValueError(f"Invalid OLLAMA_URL scheme: {parsed.scheme!r} (must be http or https)")
         self.model = model or DEFAULT_MODELS["ollama"]
+        import httpx
+
+        # One pooled client per provider so extraction bursts reuse keep-alive
+        # connections instead of paying a TCP handshake per completion.
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            headers={"Content-Type": "application/json"},
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=4),
+        )
 
     def complete(self, system: str, user: str) -> CompletionResult:
         # No format:"json" — breaks array extraction; _parse_json_array handles freeform text.
@@ -358,14 +368,9 @@ class OllamaProvider(LLMProvider):
             "think": False,
             "options": {"temperature": DEFAULT_TEMPERATURE},
         }).encode()
-        req = urllib.request.Request(
-            f"{self.base_url}/api/generate",
-            data=payload,
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=120) as resp:
-            data = json.loads(resp.read())
+        resp = self._client.post("/api/generate", content=payload, timeout=120)
+        resp.raise_for_status()
+        data = resp.json()
         return CompletionResult(
             text=data["response"],
             input_tokens=data.get("prompt_eval_count", 0),
@@ -374,41 +379,62 @@ class OllamaProvider(LLMProvider):
 
     def health_check(self) -> bool:
         try:
-            req = urllib.request.Request(f"{self.base_url}/api/tags")
-            with urllib.request.urlopen(req, timeout=5) as resp:
-                return resp.status == 200
+            resp = self._client.get("/api/tags", timeout=5)
+            return resp.status_code == 200
         except Exception as e:
             logger.warning("Ollama health check failed: %s", e)
             return False
 
 
+# Every env var that shapes the provider get_provider() builds.
+_PROVIDER_ENV_VARS = (
+    "EXTRACT_PROVIDER",
+    "EXTRACT_MODEL",
+    "ANTHROPIC_API_KEY",
+    "OPENAI_API_KEY",
+    "CHATGPT_REFRESH_TOKEN",
+    "CHATGPT_CLIENT_ID",
+    "OLLAMA_URL",
+)
+
+
 def get_provider() -> LLMProvider | None:
     """Factory: create an LLM provider from environment variables.
 
     Returns None if EXTRACT_PROVIDER is not set (extraction disabled).
     Raises ValueError for invalid configuration.
+
+    Providers are cached by the values of the env vars above, so repeat
+    calls under the same configuration share one client. Call
+    get_provider.cache_clear() to force a rebuild.
     """
-    provider_name = os.environ.get("EXTRACT_PROVIDER", "").strip().lower()
+    return _build_provider(tuple(os.environ.get(name, "") for name in _PROVIDER_ENV_VARS))
+
+
+@functools.lru_cache(maxsize=4)
+def _build_provider(fingerprint: tuple[str, ...]) -> LLMProvider | None:
+    env = dict(zip(_PROVIDER_ENV_VARS, fingerprint))
+    provider_name = env["EXTRACT_PROVIDER"].strip().lower()
     if not provider_name:
         return None
 
-    model = os.environ.get("EXTRACT_MODEL", "").strip() or None
+    model = env["EXTRACT_MODEL"].strip() or None
 
     if provider_name == "anthropic":
-        api_key = os.environ.get("ANTHROPIC_API_KEY", "").strip()
+        api_key = env["ANTHROPIC_API_KEY"].strip()
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY required when EXTRACT_PROVIDER=anthropic")
         return AnthropicProvider(api_key=api_key, model=model)
 
     elif provider_name == "openai":
-        api_key = os.environ.get("OPENAI_API_KEY", "").strip()
+        api_key = env["OPENAI_API_KEY"].strip()
         if not api_key:
             raise ValueError("OPENAI_API_KEY required when EXTRACT_PROVIDER=openai")
         return OpenAIProvider(api_key=api_key, model=model)
 
     elif provider_name == "chatgpt-subscription":
-        refresh_token = os.environ.get("CHATGPT_REFRESH_TOKEN", "").strip()
-        client_id = os.environ.get("CHATGPT_CLIENT_ID", "").strip()
+        refresh_token = env["CHATGPT_REFRESH_TOKEN"].strip()
+        client_id = env["CHATGPT_CLIENT_ID"].strip()
         if not refresh_token:
             raise ValueError("CHATGPT_REFRESH_TOKEN required when EXTRACT_PROVIDER=chatgpt-subscription")
         if not client_id:
@@ -418,7 +444,7 @@ def get_provider() -> LLMProvider | None:
         )
 
     elif provider_name == "ollama":
-        base_url = os.environ.get("OLLAMA_URL", "").strip() or None
+        base_url = env["OLLAMA_URL"].strip() or None
         return OllamaProvider(base_url=base_url, model=model)
 
     else:
@@ -426,3 +452,6 @@ def get_provider() -> LLMProvider | None:
             f"Unknown EXTRACT_PROVIDER: '{provider_name}'. "
             "Use: anthropic, openai, chatgpt-subscription, or ollama"
         )
+
+
+get_provider.cache_clear = _build_provider.cache_clear
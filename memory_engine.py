@@ -316,6 +316,10 @@ class MemoryEngine:
                 show_progress_bar=show_progress_bar,
             )
 
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Normalized embeddings for ``texts``, one row per text."""
+        return self._encode(texts)
+
     def _reindex_store_from_metadata(self):
         if not self.metadata:
             self.qdrant_store.recreate_collection(self.dim)
@@ -24,6 +24,24 @@ _KNOWN_DIMENSIONS = {
 _MAX_RETRIES = 2
 
 
+def _make_normalizer(dim: int):
+    """Build an in-place L2 normalizer specialized for a fixed embedding width."""
+
+    def _normalize_inplace(out: np.ndarray) -> np.ndarray:
+        if out.shape[1] != dim:
+            raise ValueError(f"Expected embeddings of width {dim}, got {out.shape[1]}")
+        norms = np.sqrt(np.einsum("ij,ij->i", out, out))
+        np.maximum(norms, 1e-9, out=norms)
+        out /= norms[:, None]
+        return out
+
+    return _normalize_inplace
+
+
+# Specializations for the known widths, built once at import time
+_NORMALIZERS = {dim: _make_normalizer(dim) for dim in set(_KNOWN_DIMENSIONS.values())}
+
+
 class OpenAIEmbedder:
     """
     Drop-in replacement for OnnxEmbedder using the OpenAI embeddings API.
@@ -48,6 +66,7 @@ class OpenAIEmbedder:
         if self._dim is None:
             probe = self._call_api(["probe"])
             self._dim = probe.shape[1]
+        self._normalize = _NORMALIZERS.get(self._dim) or _make_normalizer(self._dim)
 
         logger.info("OpenAI embedder loaded: model=%s, dim=%d", self._model, self._dim)
 
@@ -101,17 +120,13 @@ class OpenAIEmbedder:
         if isinstance(sentences, str):
             sentences = [sentences]
 
-        all_embeddings = []
+        result = np.empty((len(sentences), self._dim), dtype=np.float32)
         for i in range(0, len(sentences), batch_size):
             batch = sentences[i : i + batch_size]
-            all_embeddings.append(self._call_api(batch))
-
-        result = np.vstack(all_embeddings)
+            result[i : i + len(batch)] = self._call_api(batch)
 
         if normalize_embeddings:
-            norms = np.linalg.norm(result, axis=1, keepdims=True)
-            norms = np.clip(norms, a_min=1e-9, a_max=None)
-            result = result / norms
+            self._normalize(result)
 
         return result
 
@@ -25,6 +25,12 @@ def _normalize_point_id(value: Any) -> Any:
         return value
 
 
+def _as_vector(value: Any) -> List[float]:
+    """Accept NumPy rows as well as lists; PointStruct needs a plain list."""
+    tolist = getattr(value, "tolist", None)
+    return tolist() if tolist is not None else value
+
+
 class QdrantStore:
     def __init__(
         self,
@@ -121,7 +127,7 @@ class QdrantStore:
         point_structs = [
             models.PointStruct(
                 id=_normalize_point_id(point["id"]),
-                vector=point["vector"],
+                vector=_as_vector(point["vector"]),
                 payload=point.get("payload") or {},
             )
             for point in points
@@ -195,7 +201,7 @@ class QdrantStore:
     ) -> List[Dict[str, Any]]:
         response = self.client.query_points(
             collection_name=self.collection,
-            query=query_vector,
+            query=_as_vector(query_vector),
             limit=limit,
             score_threshold=score_threshold,
             with_payload=True,
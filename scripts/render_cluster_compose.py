@@ -3,7 +3,10 @@
 
 from __future__ import annotations
 
-from render_qdrant_cluster_compose import main
+try:
+    from render_qdrant_cluster_compose import main, render_cluster_compose
+except ImportError:  # imported as scripts.render_cluster_compose
+    from scripts.render_qdrant_cluster_compose import main, render_cluster_compose
 
 
 if __name__ == "__main__":
@@ -73,12 +73,12 @@ def render_cluster_compose(nodes: int, image: str = "qdrant/qdrant:v1.15.4") ->
     return "\n".join(lines) + "\n"
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description="Render N-node Qdrant cluster compose file")
     parser.add_argument("--nodes", type=int, required=True, help="Number of Qdrant nodes")
     parser.add_argument("--output", type=Path, required=True, help="Output compose path")
     parser.add_argument("--image", default="qdrant/qdrant:v1.15.4", help="Qdrant image")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     rendered = render_cluster_compose(nodes=args.nodes, image=args.image)
     args.output.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,265 @@
+"""Shared pytest fixtures and lightweight test doubles."""
+
+import functools
+import hashlib
+import os
+import re
+from collections import defaultdict, deque
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from llm_provider import CompletionResult
+
+
+@pytest.fixture(scope="module")
+def app_env():
+    """(app module, TestClient) shared by every test in a module.
+
+    The env is set while the module runs; auth reads API_KEY per request, so
+    app is imported as-is rather than reloaded. State earlier modules may
+    have left behind (auth failure counts, the memory trend, an extraction
+    provider) is reset for the module. Tests swap ``app.memory`` per test
+    with monkeypatch.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("API_KEY", "test-key")
+        mp.setenv("EXTRACT_PROVIDER", "")
+        # Imported here so collecting test modules does not pull in the app graph.
+        from fastapi.testclient import TestClient
+
+        import app as app_module
+
+        mp.setattr(app_module, "_auth_failures", defaultdict(list))
+        mp.setattr(app_module, "memory_trend", deque(maxlen=app_module.METRICS_TREND_SAMPLES))
+        mp.setattr(app_module, "extract_provider", None)
+        test_client = TestClient(app_module.app)
+        yield app_module, test_client
+        test_client.close()
+
+
+# Every env var llm_provider.get_provider() and memories_auth.get_auth_status() read.
+AUTH_ENV_KEYS = (
+    "EXTRACT_PROVIDER",
+    "EXTRACT_MODEL",
+    "ANTHROPIC_API_KEY",
+    "OPENAI_API_KEY",
+    "CHATGPT_REFRESH_TOKEN",
+    "CHATGPT_CLIENT_ID",
+    "OLLAMA_URL",
+)
+
+
+@pytest.fixture
+def clean_auth_env(monkeypatch):
+    """Unset the provider env vars and return monkeypatch for the test's own setenv."""
+    for key in AUTH_ENV_KEYS:
+        monkeypatch.delenv(key, raising=False)
+    return monkeypatch
+
+
+@pytest.fixture(scope="session")
+def ollama_provider():
+    """OllamaProvider built once by get_provider() from EXTRACT_PROVIDER=ollama alone.
+
+    Shared across tests: patch its client per test rather than mutating it.
+    """
+    import llm_provider
+
+    with patch.dict(os.environ, {"EXTRACT_PROVIDER": "ollama"}):
+        os.environ.pop("EXTRACT_MODEL", None)
+        os.environ.pop("OLLAMA_URL", None)
+        provider = llm_provider.get_provider()
+    llm_provider.get_provider.cache_clear()
+    return provider
+
+
+@functools.lru_cache(maxsize=4096)
+def _token_vector(token: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class HashEmbedder:
+    """OnnxEmbedder stand-in that needs no model download or ONNX session.
+
+    Each text embeds as the sum of per-token pseudo-random vectors, so texts
+    sharing words still score as similar and identical texts match exactly.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", cache_dir=None, dim: int = 384):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, sentences, normalize_embeddings: bool = True, show_progress_bar: bool = False, **kwargs):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        out = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for row, text in enumerate(sentences):
+            for token in re.findall(r"\w+", text.lower()) or [""]:
+                out[row] += _token_vector(token, self.dim)
+        if normalize_embeddings:
+            out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture(scope="module")
+def hash_embedder():
+    """Swap OnnxEmbedder for HashEmbedder for every engine built in the module."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("onnx_embedder.OnnxEmbedder", HashEmbedder)
+        yield HashEmbedder
+
+
+@pytest.fixture(scope="session")
+def _onnx_embedder_cache():
+    """ONNX embedders built so far, shared by every module that opts in."""
+    return {}
+
+
+@pytest.fixture(scope="module")
+def shared_onnx_embedders(_onnx_embedder_cache):
+    """Build each ONNX embedder once per session instead of once per MemoryEngine.
+
+    Opt in per module with pytestmark = pytest.mark.usefixtures("shared_onnx_embedders").
+    Keyed by the embedder class (so hash_embedder modules get their own), model
+    and cache dir. A closed embedder is rebuilt on next use. Only engine
+    construction is shared: an engine that already has a model, as in
+    reload_embedder or reembed, always gets a fresh instance.
+    """
+    try:
+        import memory_engine
+    except ImportError:  # engine deps (qdrant-client) missing; nothing to share
+        yield
+        return
+
+    original = memory_engine.MemoryEngine._make_embedder
+    embedders = _onnx_embedder_cache
+
+    def _make_embedder(self):
+        if self._embed_provider != "onnx" or getattr(self, "model", None) is not None:
+            return original(self)
+        import onnx_embedder
+
+        key = (onnx_embedder.OnnxEmbedder, self._active_embed_model(), self._embedder_cache_dir)
+        embedder = embedders.get(key)
+        if embedder is None or getattr(embedder, "_closed", False):
+            embedder = embedders[key] = original(self)
+        return embedder
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(memory_engine.MemoryEngine, "_make_embedder", _make_embedder)
+        yield
+
+
+class StubProvider:
+    """LLMProvider stand-in that replays canned completions in order.
+
+    Each response may be a string (wrapped in a CompletionResult), a
+    CompletionResult, or an exception instance to raise. With ``raises``
+    set, every call raises that exception instead.
+    """
+
+    provider_name = "stub"
+    model = "stub-model"
+
+    def __init__(self, responses=(), supports_audn: bool = True, raises: BaseException | None = None):
+        self._responses = iter(responses)
+        self.supports_audn = supports_audn
+        self.raises = raises
+        self.calls: list[tuple[str, str]] = []
+
+    def complete(self, system: str, user: str) -> CompletionResult:
+        self.calls.append((system, user))
+        if self.raises is not None:
+            raise self.raises
+        response = next(self._responses)
+        if isinstance(response, BaseException):
+            raise response
+        if isinstance(response, str):
+            return CompletionResult(text=response, input_tokens=10, output_tokens=5)
+        return response
+
+    def health_check(self) -> bool:
+        return True
+
+
+class StubEngine:
+    """MemoryEngine stand-in covering the calls llm_extract makes.
+
+    Records every call as (method, args, kwargs) and hands out sequential
+    ids from add_memories. Texts embed with HashEmbedder.
+    """
+
+    def __init__(self, search_results=(), novel=(True, None), memories=None, next_id: int = 100):
+        self.search_results = list(search_results)
+        self.novel = novel
+        self.memories = dict(memories or {})
+        self.calls: list[tuple[str, tuple, dict]] = []
+        self.next_id = next_id
+        self.added_count = 0
+        self._embedder = HashEmbedder()
+
+    def calls_to(self, method: str) -> list[tuple[tuple, dict]]:
+        return [(args, kwargs) for name, args, kwargs in self.calls if name == method]
+
+    def hybrid_search(self, *args, **kwargs):
+        self.calls.append(("hybrid_search", args, kwargs))
+        return list(self.search_results)
+
+    def is_novel(self, *args, **kwargs):
+        self.calls.append(("is_novel", args, kwargs))
+        return self.novel
+
+    def encode_texts(self, texts):
+        self.calls.append(("encode_texts", (texts,), {}))
+        return self._embedder.encode(texts)
+
+    def stats_light(self):
+        self.calls.append(("stats_light", (), {}))
+        return {"total_memories": len(self.memories) + self.added_count}
+
+    def add_memories(self, *args, **kwargs):
+        self.calls.append(("add_memories", args, kwargs))
+        texts = kwargs.get("texts", args[0] if args else [])
+        ids = list(range(self.next_id, self.next_id + len(texts)))
+        self.next_id += len(texts)
+        self.added_count += len(texts)
+        return ids
+
+    def get_memory(self, memory_id):
+        self.calls.append(("get_memory", (memory_id,), {}))
+        if memory_id not in self.memories:
+            raise ValueError(f"Memory {memory_id} not found")
+        return self.memories[memory_id]
+
+    def update_memory(self, memory_id, **kwargs):
+        self.calls.append(("update_memory", (memory_id,), kwargs))
+        return {"id": memory_id, "updated_fields": sorted(kwargs)}
+
+    def delete_memory(self, memory_id):
+        self.calls.append(("delete_memory", (memory_id,), {}))
+        return {"deleted_id": memory_id}
+
+    def add_link(self, from_id, to_id, link_type):
+        self.calls.append(("add_link", (from_id, to_id, link_type), {}))
+        return {"from_id": from_id, "to_id": to_id, "type": link_type}
+
+
+@pytest.fixture
+def stub_provider():
+    """Factory for StubProvider: stub_provider(responses, supports_audn=True, raises=None)."""
+    return StubProvider
+
+
+@pytest.fixture
+def stub_engine():
+    return StubEngine()
@@ -18,6 +18,9 @@ from unittest.mock import MagicMock, patch
 import pytest
 from fastapi.testclient import TestClient
 
+# Engines in this module share one ONNX embedder per model.
+pytestmark = pytest.mark.usefixtures("shared_onnx_embedders")
+
 
 @pytest.fixture(scope="module")
 def bench_client():
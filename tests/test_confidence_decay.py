@@ -8,6 +8,9 @@ import pytest
 
 from memory_engine import MemoryEngine
 
+# Engines in this module share one ONNX embedder per model.
+pytestmark = pytest.mark.usefixtures("shared_onnx_embedders")
+
 
 class TestConfidenceComputation:
     """Test computed confidence score based on memory age."""
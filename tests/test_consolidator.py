@@ -1,10 +1,19 @@
 """Tests for consolidator module."""
 import json
+import zlib
 from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, call
 
+import numpy as np
+
 from llm_provider import CompletionResult
 
+_NOW = datetime.now(timezone.utc)
+_NOW_ISO = _NOW.isoformat()
+_OLD_100 = (_NOW - timedelta(days=100)).isoformat()
+_OLD_112 = (_NOW - timedelta(days=112)).isoformat()
+_OLD_150 = (_NOW - timedelta(days=150)).isoformat()
+_OLD_200 = (_NOW - timedelta(days=200)).isoformat()
 
 def _cr(text, input_tokens=10, output_tokens=5):
     """Helper to build CompletionResult from text."""
@@ -14,7 +23,7 @@ def _cr(text, input_tokens=10, output_tokens=5):
 def _make_memory(id, text, source="project/decisions", category="detail",
                  created_at=None):
     """Build a metadata dict resembling a real memory."""
-    ts = created_at or datetime.now(timezone.utc).isoformat()
+    ts = created_at or _NOW_ISO
     return {
         "id": id,
         "text": text,
@@ -26,6 +35,51 @@ def _make_memory(id, text, source="project/decisions", category="detail",
     }
 
 
+def _bulk_make_memories(ages_days, categories):
+    """Build memories whose created_at is now minus each age, computed in one pass."""
+    created = (np.datetime64("now") - np.asarray(ages_days).astype("timedelta64[D]")).astype(str)
+    return [
+        _make_memory(i, f"Memory {i}", category=cat, created_at=ts)
+        for i, (ts, cat) in enumerate(zip(created, categories))
+    ]
+
+
+def _seeded_vector(key, dim):
+    """Deterministic standard-normal vector seeded from a string key."""
+    return np.random.default_rng(zlib.crc32(key.encode("utf-8"))).standard_normal(dim)
+
+
+class _VectorEngine:
+    """In-memory engine backed by a precomputed cosine similarity matrix.
+
+    Each memory is embedded as its topic direction plus a small text-seeded
+    perturbation, so memories sharing a topic land close together. All
+    pairwise scores come from one matmul at construction; hybrid_search is a
+    row lookup and counts its calls.
+    """
+
+    def __init__(self, memories, topics, dim=64, noise=0.3):
+        self.metadata = memories
+        embs = np.stack([
+            _seeded_vector(topic, dim) + noise * _seeded_vector(m["text"], dim)
+            for m, topic in zip(memories, topics)
+        ])
+        self._embs = np.ascontiguousarray(embs, dtype=np.float32)
+        self._embs /= np.linalg.norm(self._embs, axis=1, keepdims=True)
+        self._sims = self._embs @ self._embs.T
+        self._row_by_text = {m["text"]: i for i, m in enumerate(memories)}
+        self.search_calls = 0
+
+    def hybrid_search(self, query, k=10, source_prefix=None):
+        self.search_calls += 1
+        scores = self._sims[self._row_by_text[query]]
+        order = np.argsort(-scores)[:k]
+        hits = [{**self.metadata[i], "similarity": float(scores[i])} for i in order]
+        if source_prefix:
+            hits = [h for h in hits if h["source"].startswith(source_prefix)]
+        return hits
+
+
 class TestClusterDetection:
     """Tests for find_clusters()."""
 
@@ -37,20 +91,9 @@ class TestClusterDetection:
         m2 = _make_memory(2, "Postgres chosen for relational data storage")
         m3 = _make_memory(3, "Frontend uses React with TypeScript")
 
-        engine = MagicMock()
-        engine.metadata = [m0, m1, m2, m3]
-
-        # hybrid_search returns similar memories for each query
-        def fake_search(query, k=10, source_prefix=None):
-            if "Postgres" in query or "database" in query.lower():
-                results = []
-                for m in [m0, m1, m2]:
-                    if m["text"] != query:
-                        results.append({**m, "rrf_score": 0.85})
-                return results
-            return []
-
-        engine.hybrid_search.side_effect = fake_search
+        engine = _VectorEngine(
+            [m0, m1, m2, m3], topics=["postgres", "postgres", "postgres", "frontend"],
+        )
 
         clusters = find_clusters(engine, similarity_threshold=0.75, min_cluster_size=2)
 
@@ -59,6 +102,8 @@ class TestClusterDetection:
         biggest = max(clusters, key=len)
         cluster_ids = {m["id"] for m in biggest}
         assert {0, 1, 2}.issubset(cluster_ids)
+        # At most one neighbour lookup per memory
+        assert engine.search_calls <= len(engine.metadata)
 
     def test_no_clusters_when_all_unique(self):
         from consolidator import find_clusters
@@ -82,20 +127,16 @@ class TestClusterDetection:
         m1 = _make_memory(1, "Postgres is great", source="project/db")
         m2 = _make_memory(2, "Use Postgres too", source="other/stuff")
 
-        engine = MagicMock()
-        engine.metadata = [m0, m1, m2]
-
-        engine.hybrid_search.return_value = [{**m1, "rrf_score": 0.9}]
+        engine = _VectorEngine([m0, m1, m2], topics=["postgres"] * 3)
 
         clusters = find_clusters(
             engine, source_prefix="project/", similarity_threshold=0.75,
             min_cluster_size=2,
         )
 
-        # m2 should not be in any cluster because its source doesn't match
-        for cluster in clusters:
-            for mem in cluster:
-                assert mem["source"].startswith("project/")
+        # m2 is just as similar but its source doesn't match
+        assert [{m["id"] for m in c} for c in clusters] == [{0, 1}]
+        assert engine.search_calls <= len(engine.metadata)
 
     def test_respects_min_cluster_size(self):
         from consolidator import find_clusters
@@ -227,7 +268,7 @@ class TestPruning:
     def test_identifies_old_unretrieved_detail(self):
         from consolidator import find_prune_candidates
 
-        old_date = (datetime.now(timezone.utc) - timedelta(days=112)).isoformat()
+        old_date = _OLD_112
         m0 = _make_memory(0, "Old detail", category="detail", created_at=old_date)
         m1 = _make_memory(1, "Recent detail", category="detail")
 
@@ -245,7 +286,7 @@ class TestPruning:
     def test_decision_uses_longer_threshold(self):
         from consolidator import find_prune_candidates
 
-        old_date = (datetime.now(timezone.utc) - timedelta(days=112)).isoformat()
+        old_date = _OLD_112
         m0 = _make_memory(0, "Old decision", category="decision", created_at=old_date)
 
         candidates = find_prune_candidates(
@@ -258,10 +299,25 @@ class TestPruning:
         # 112 days < 120 day threshold for DECISION → should NOT be pruned
         assert len(candidates) == 0
 
+    def test_extreme_dates_do_not_overflow(self):
+        from consolidator import find_prune_candidates
+
+        m0 = _make_memory(0, "Ancient detail", category="detail", created_at="0001-01-01T00:00:00+00:00")
+        m1 = _make_memory(1, "Far future detail", category="detail", created_at="9999-12-31T00:00:00+00:00")
+
+        candidates = find_prune_candidates(
+            all_memories=[m0, m1],
+            unretrieved_ids=[0, 1],
+            detail_days=60,
+            decision_days=120,
+        )
+
+        assert [c["id"] for c in candidates] == [0]
+
     def test_decision_pruned_when_exceeds_threshold(self):
         from consolidator import find_prune_candidates
 
-        old_date = (datetime.now(timezone.utc) - timedelta(days=150)).isoformat()
+        old_date = _OLD_150
         m0 = _make_memory(0, "Very old decision", category="decision", created_at=old_date)
 
         candidates = find_prune_candidates(
@@ -277,7 +333,7 @@ class TestPruning:
     def test_retrieved_memories_are_never_pruned(self):
         from consolidator import find_prune_candidates
 
-        old_date = (datetime.now(timezone.utc) - timedelta(days=200)).isoformat()
+        old_date = _OLD_200
         m0 = _make_memory(0, "Old but retrieved", category="detail", created_at=old_date)
 
         candidates = find_prune_candidates(
@@ -292,7 +348,7 @@ class TestPruning:
     def test_learning_uses_decision_threshold(self):
         from consolidator import find_prune_candidates
 
-        old_date = (datetime.now(timezone.utc) - timedelta(days=112)).isoformat()
+        old_date = _OLD_112
         m0 = _make_memory(0, "Old learning", category="learning", created_at=old_date)
 
         candidates = find_prune_candidates(
@@ -310,7 +366,7 @@ class TestPruning:
         from consolidator import find_prune_candidates
 
         # Use Z suffix instead of +00:00
-        old_date = (datetime.now(timezone.utc) - timedelta(days=100)).strftime(
+        old_date = (_NOW - timedelta(days=100)).strftime(
             "%Y-%m-%dT%H:%M:%S.%fZ"
         )
         m0 = _make_memory(0, "Old detail with Z", category="detail", created_at=old_date)
@@ -326,7 +382,7 @@ class TestPruning:
     def test_handles_missing_category(self):
         from consolidator import find_prune_candidates
 
-        old_date = (datetime.now(timezone.utc) - timedelta(days=100)).isoformat()
+        old_date = _OLD_100
         m0 = _make_memory(0, "No category", created_at=old_date)
         del m0["category"]
 
@@ -338,3 +394,43 @@ class TestPruning:
 
         # Without category, should use DETAIL threshold (default)
         assert len(candidates) == 1
+
+    def test_bulk_ages_use_per_category_thresholds(self):
+        from consolidator import find_prune_candidates
+
+        ages = np.array([10, 100, 100, 130, 200])
+        cats = ["detail", "detail", "decision", "learning", "decision"]
+        mems = _bulk_make_memories(ages, cats)
+
+        candidates = find_prune_candidates(
+            all_memories=mems,
+            unretrieved_ids=[m["id"] for m in mems],
+            detail_days=60,
+            decision_days=120,
+        )
+
+        assert [c["id"] for c in candidates] == [1, 3, 4]
+
+    def test_find_prune_candidates_accepts_datetime64_array(self):
+        from consolidator import (
+            CATEGORY_CODE_DETAIL,
+            CATEGORY_CODE_LONG_LIVED,
+            prune_candidate_mask,
+        )
+
+        now = np.datetime64("2026-01-01T00:00:00", "ns")
+        created_at_ns = now - np.array([10, 100, 100, 130], dtype="timedelta64[D]")
+        category_codes = np.array(
+            [CATEGORY_CODE_DETAIL, CATEGORY_CODE_DETAIL,
+             CATEGORY_CODE_LONG_LIVED, CATEGORY_CODE_LONG_LIVED],
+            dtype=np.int8,
+        )
+
+        mask = prune_candidate_mask(
+            created_at_ns, category_codes,
+            detail_days=60, decision_days=120,
+            now_ns=int(now.astype(np.int64)),
+        )
+
+        assert mask.dtype == np.bool_
+        assert mask.tolist() == [False, True, False, True]
@@ -1,10 +1,15 @@
 """Container configuration regression tests."""
+from functools import lru_cache
 from pathlib import Path
 
+import pytest
+
 
 ROOT = Path(__file__).resolve().parents[1]
+COMPOSE_FILES = ("docker-compose.yml", "docker-compose.snippet.yml")
 
 
+@lru_cache(maxsize=8)
 def _read(path: str) -> str:
     return (ROOT / path).read_text(encoding="utf-8")
 
@@ -53,36 +58,36 @@ def test_dockerfile_copies_evidence_packet_module() -> None:
     assert "COPY evidence_packet.py ." in dockerfile
 
 
-def test_compose_healthchecks_use_python_probe() -> None:
-    for compose_file in ("docker-compose.yml", "docker-compose.snippet.yml"):
-        contents = _read(compose_file)
-        assert "healthcheck:" in contents
-        assert 'test: ["CMD", "python", "-c", "import sys,urllib.request;' in contents
-        assert '"curl"' not in contents
+@pytest.mark.parametrize("compose_file", COMPOSE_FILES)
+def test_compose_healthchecks_use_python_probe(compose_file: str) -> None:
+    contents = _read(compose_file)
+    assert "healthcheck:" in contents
+    assert 'test: ["CMD", "python", "-c", "import sys,urllib.request;' in contents
+    assert '"curl"' not in contents
 
 
-def test_compose_defaults_to_core_target() -> None:
-    for compose_file in ("docker-compose.yml", "docker-compose.snippet.yml"):
-        contents = _read(compose_file)
-        assert "target: ${MEMORIES_IMAGE_TARGET:-core}" in contents
-        assert "image: memories:${MEMORIES_IMAGE_TARGET:-core}" in contents
-        assert "PRELOAD_MODEL: ${PRELOAD_MODEL:-false}" in contents
+@pytest.mark.parametrize("compose_file", COMPOSE_FILES)
+def test_compose_defaults_to_core_target(compose_file: str) -> None:
+    contents = _read(compose_file)
+    assert "target: ${MEMORIES_IMAGE_TARGET:-core}" in contents
+    assert "image: memories:${MEMORIES_IMAGE_TARGET:-core}" in contents
+    assert "PRELOAD_MODEL: ${PRELOAD_MODEL:-false}" in contents
 
 
-def test_compose_sets_memory_and_allocator_guardrails() -> None:
-    for compose_file in ("docker-compose.yml", "docker-compose.snippet.yml"):
-        contents = _read(compose_file)
-        assert "mem_limit: ${MEMORIES_MEM_LIMIT:-3g}" in contents
-        assert "MALLOC_ARENA_MAX=${MALLOC_ARENA_MAX:-2}" in contents
-        assert "MALLOC_TRIM_THRESHOLD_=${MALLOC_TRIM_THRESHOLD_:-131072}" in contents
-        assert "MALLOC_MMAP_THRESHOLD_=${MALLOC_MMAP_THRESHOLD_:-131072}" in contents
+@pytest.mark.parametrize("compose_file", COMPOSE_FILES)
+def test_compose_sets_memory_and_allocator_guardrails(compose_file: str) -> None:
+    contents = _read(compose_file)
+    assert "mem_limit: ${MEMORIES_MEM_LIMIT:-3g}" in contents
+    assert "MALLOC_ARENA_MAX=${MALLOC_ARENA_MAX:-2}" in contents
+    assert "MALLOC_TRIM_THRESHOLD_=${MALLOC_TRIM_THRESHOLD_:-131072}" in contents
+    assert "MALLOC_MMAP_THRESHOLD_=${MALLOC_MMAP_THRESHOLD_:-131072}" in contents
 
 
-def test_compose_supports_extraction_env_passthrough() -> None:
-    for compose_file in ("docker-compose.yml", "docker-compose.snippet.yml"):
-        contents = _read(compose_file)
-        assert "EXTRACT_PROVIDER=${EXTRACT_PROVIDER:-}" in contents
-        assert "EXTRACT_MODEL=${EXTRACT_MODEL:-}" in contents
-        assert "ANTHROPIC_API_KEY=${ANTHROPIC_API_KEY:-}" in contents
-        assert "OPENAI_API_KEY=${OPENAI_API_KEY:-}" in contents
-        assert "OLLAMA_URL=${OLLAMA_URL:-}" in contents
+@pytest.mark.parametrize("compose_file", COMPOSE_FILES)
+def test_compose_supports_extraction_env_passthrough(compose_file: str) -> None:
+    contents = _read(compose_file)
+    assert "EXTRACT_PROVIDER=${EXTRACT_PROVIDER:-}" in contents
+    assert "EXTRACT_MODEL=${EXTRACT_MODEL:-}" in contents
+    assert "ANTHROPIC_API_KEY=${ANTHROPIC_API_KEY:-}" in contents
+    assert "OPENAI_API_KEY=${OPENAI_API_KEY:-}" in contents
+    assert "OLLAMA_URL=${OLLAMA_URL:-}" in contents
@@ -1,59 +1,64 @@
 """Tests for entity-level lock behavior."""
 
 import threading
-import time
 
 from entity_locks import EntityLockManager
 
 
 def test_same_entity_serialized():
     manager = EntityLockManager()
-    events = []
+    enter_evt = {"t1": threading.Event(), "t2": threading.Event()}
+    release_evt = {"t1": threading.Event(), "t2": threading.Event()}
 
     def worker(name: str):
         with manager.acquire_many(["default:carto/poet-pads/db"]):
-            events.append((name, "enter", time.perf_counter()))
-            time.sleep(0.08)
-            events.append((name, "exit", time.perf_counter()))
+            enter_evt[name].set()
+            release_evt[name].wait(timeout=2.0)
 
     t1 = threading.Thread(target=worker, args=("t1",))
     t2 = threading.Thread(target=worker, args=("t2",))
 
-    start = time.perf_counter()
     t1.start()
-    time.sleep(0.01)
+    assert enter_evt["t1"].wait(timeout=1.0)
     t2.start()
+
+    # t2 must stay blocked while t1 holds the entity lock.
+    assert enter_evt["t2"].wait(timeout=0.05) is False
+
+    release_evt["t1"].set()
+    assert enter_evt["t2"].wait(timeout=1.0) is True
+    release_evt["t2"].set()
     t1.join()
     t2.join()
-    elapsed = time.perf_counter() - start
-
-    # Serialized critical sections should take roughly sum of both sleeps.
-    assert elapsed >= 0.14
-    first_exit = next(ts for name, ev, ts in events if name == "t1" and ev == "exit")
-    second_enter = next(ts for name, ev, ts in events if name == "t2" and ev == "enter")
-    assert second_enter >= first_exit
 
 
 def test_different_entities_parallel():
     manager = EntityLockManager()
-    barrier = threading.Barrier(3)
+    start_barrier = threading.Barrier(3)
+    # Both holders must be inside their critical sections at once to pass.
+    inside_barrier = threading.Barrier(2, timeout=1.0)
+    counter_lock = threading.Lock()
+    state = {"current": 0, "max": 0}
 
     def worker(key: str):
-        barrier.wait()
+        start_barrier.wait()
         with manager.acquire_many([key]):
-            time.sleep(0.10)
+            with counter_lock:
+                state["current"] += 1
+                state["max"] = max(state["max"], state["current"])
+            inside_barrier.wait()
+            with counter_lock:
+                state["current"] -= 1
 
     t1 = threading.Thread(target=worker, args=("default:carto/poet-pads/db",))
     t2 = threading.Thread(target=worker, args=("default:carto/poet-pads/notes",))
 
     t1.start()
     t2.start()
-    start = time.perf_counter()
-    barrier.wait()
+    start_barrier.wait()
     t1.join()
     t2.join()
-    elapsed = time.perf_counter() - start
-
-    # Parallel lock domains should complete near single-sleep duration.
-    assert elapsed < 0.18
 
+    # Parallel lock domains should be held concurrently.
+    assert state["max"] == 2
+    assert not inside_barrier.broken
@@ -1,115 +1,189 @@
 """Tests for extraction API endpoints in app.py."""
-import os
-import time
+import asyncio
+from functools import lru_cache
+import httpx
 import pytest
-from unittest.mock import patch, MagicMock
-from fastapi.testclient import TestClient
+from unittest.mock import Mock, create_autospec
+from llm_provider import LLMProvider
 
 
 @pytest.fixture
-def client():
-    """Create a test client with mocked memory engine and auth."""
-    # Set test API key (app.py reads API_KEY env var)
-    with patch.dict(os.environ, {"API_KEY": "test-key", "EXTRACT_PROVIDER": "ollama"}):
-        # Need to reimport app to pick up env changes
-        import importlib
-        import app as app_module
-        importlib.reload(app_module)
+def app_module(app_env):
+    return app_env[0]
 
-        mock_engine = MagicMock()
-        mock_engine.stats_light.return_value = {"total_memories": 5}
-        app_module.memory = mock_engine
 
-        yield TestClient(app_module.app), mock_engine
+@pytest.fixture(scope="session")
+def _engine_spec():
+    """One autospecced MemoryEngine, reset between tests instead of rebuilt."""
+    from memory_engine import MemoryEngine
+
+    return create_autospec(MemoryEngine, instance=True)
+
+
+@pytest.fixture
+def reset_state(app_env, _engine_spec, monkeypatch):
+    """Reset the engine mock and extraction bookkeeping between tests."""
+    app_module, _ = app_env
+
+    _engine_spec.reset_mock(return_value=True, side_effect=True)
+    _engine_spec.stats_light.return_value = {"total_memories": 5}
+    monkeypatch.setattr(app_module, "memory", _engine_spec)
+    # Each TestClient request runs on its own event loop, so the queue and
+    # workers from a previous test can't be reused.
+    monkeypatch.setattr(
+        app_module, "extract_queue", asyncio.Queue(maxsize=app_module.EXTRACT_QUEUE_MAX)
+    )
+    app_module.extract_workers.clear()
+    app_module.extract_jobs.clear()
+    app_module.extract_job_events.clear()
+    return _engine_spec
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def aclient(app_env, reset_state):
+    """Async client on the ASGI app, sharing the test's loop with extract workers."""
+    app_module, _ = app_env
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac, reset_state
+    for task in app_module.extract_workers:
+        task.cancel()
+    await asyncio.gather(*app_module.extract_workers, return_exceptions=True)
+
+
+@pytest.fixture
+def client(app_env, reset_state):
+    """Shared test client plus the freshly reset mocked memory engine."""
+    _, test_client = app_env
+    return test_client, reset_state
+
+
+def _stub_provider(**attrs) -> Mock:
+    """Provider mock limited to the LLMProvider interface."""
+    provider = Mock(spec=LLMProvider)
+    provider.configure_mock(
+        **{"provider_name": "ollama", "model": "gemma3:4b", "supports_audn": True, **attrs}
+    )
+    return provider
+
+
+@lru_cache(maxsize=None)
+def _oversized_extract_body(max_chars: int) -> bytes:
+    """Pre-encoded extract request whose messages exceed max_chars by one."""
+    return (
+        b'{"messages":"' + b"x" * (max_chars + 1)
+        + b'","source":"test","context":"stop"}'
+    )
+
+
+def _make_full_queue(size: int) -> asyncio.Queue:
+    """Bounded asyncio.Queue already at capacity, filled without touching an event loop.
+
+    Appends placeholders straight to the queue's internal deque and bumps the
+    unfinished-task count, which is all put_nowait would have done.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+    queue._queue.extend([None] * size)
+    queue._unfinished_tasks += size
+    return queue
+
+
+async def _await_terminal_job(job_id: str, timeout_sec: float = 2.0) -> dict:
+    """Wait for a job to finish and return its in-process state.
+
+    Blocks off-loop on the job's completion event and reads the entry from
+    app.extract_jobs, the same dict the status endpoint serves.
+    """
+    import app as app_module
+
+    done_event = app_module.extract_job_events.get(job_id)
+    if done_event is not None:
+        await asyncio.to_thread(done_event.wait, timeout_sec)
+    state = app_module.extract_jobs.get(job_id)
+    if state is None or state["status"] not in {"completed", "failed"}:
+        pytest.fail(f"Extraction job {job_id} did not finish in time; last_state={state}")
+    return state
 
 
 class TestExtractEndpoint:
     """Test POST /memory/extract."""
 
-    @staticmethod
-    def _wait_for_terminal_job(test_client, job_id: str, timeout_sec: float = 2.0):
-        deadline = time.time() + timeout_sec
-        last_state = None
-        while time.time() < deadline:
-            response = test_client.get(
-                f"/memory/extract/{job_id}",
-                headers={"X-API-Key": "test-key"},
-            )
-            assert response.status_code == 200
-            last_state = response.json()
-            if last_state["status"] in {"completed", "failed"}:
-                return last_state
-            time.sleep(0.02)
-        pytest.fail(f"Extraction job {job_id} did not finish in time; last_state={last_state}")
-
-    def test_extract_returns_501_when_disabled(self, client):
-        test_client, mock_engine = client
-        with patch("app.extract_provider", None):
-            response = test_client.post(
-                "/memory/extract",
-                json={"messages": "test", "source": "test", "context": "stop"},
-                headers={"X-API-Key": "test-key"},
-            )
-            assert response.status_code == 501
-
-    def test_extract_fallback_add_stores_memory_when_enabled(self, client):
+    def test_extract_returns_501_when_disabled(self, client, app_module, monkeypatch):
         test_client, mock_engine = client
+        monkeypatch.setattr(app_module, "extract_provider", None)
+        response = test_client.post(
+            "/memory/extract",
+            json={"messages": "test", "source": "test", "context": "stop"},
+            headers={"X-API-Key": "test-key"},
+        )
+        assert response.status_code == 501
+
+    @pytest.mark.anyio
+    async def test_extract_fallback_add_stores_memory_when_enabled(self, aclient, app_module, monkeypatch):
+        ac, mock_engine = aclient
         mock_engine.is_novel.return_value = (True, None)
         mock_engine.add_memories.return_value = [123]
-        with patch("app.extract_provider", None), \
-             patch("app.run_extraction", None), \
-             patch("app.EXTRACT_FALLBACK_ADD_ENABLED", True):
-            response = test_client.post(
-                "/memory/extract",
-                json={
-                    "messages": "User: We decided to use qdrant as the default vector store for production.",
-                    "source": "test/proj",
-                    "context": "stop",
-                },
-                headers={"X-API-Key": "test-key"},
-            )
-            assert response.status_code == 202
-            data = response.json()
-            assert data["status"] == "completed"
-
-            job_state = self._wait_for_terminal_job(test_client, data["job_id"])
-            assert job_state["status"] == "completed"
-            assert job_state["result"]["mode"] == "fallback_add"
-            assert job_state["result"]["stored_count"] == 1
-            assert job_state["result"]["extracted_count"] == 1
+        monkeypatch.setattr(app_module, "extract_provider", None)
+        monkeypatch.setattr(app_module, "run_extraction", None)
+        monkeypatch.setattr(app_module, "EXTRACT_FALLBACK_ADD_ENABLED", True)
+        response = await ac.post(
+            "/memory/extract",
+            json={
+                "messages": "User: We decided to use qdrant as the default vector store for production.",
+                "source": "test/proj",
+                "context": "stop",
+            },
+            headers={"X-API-Key": "test-key"},
+        )
+        assert response.status_code == 202
+        data = response.json()
+        assert data["status"] == "completed"
+
+        job_state = await _await_terminal_job(data["job_id"])
+        assert job_state["status"] == "completed"
+        assert job_state["result"]["mode"] == "fallback_add"
+        assert job_state["result"]["stored_count"] == 1
+        assert job_state["result"]["extracted_count"] == 1
 
         mock_engine.is_novel.assert_called_once()
         mock_engine.add_memories.assert_called_once()
 
-    def test_extract_fallback_add_skips_when_no_fact_candidate(self, client):
-        test_client, mock_engine = client
-        with patch("app.extract_provider", None), \
-             patch("app.run_extraction", None), \
-             patch("app.EXTRACT_FALLBACK_ADD_ENABLED", True):
-            response = test_client.post(
-                "/memory/extract",
-                json={
-                    "messages": "User: hi\nAssistant: hello",
-                    "source": "test/proj",
-                    "context": "stop",
-                },
-                headers={"X-API-Key": "test-key"},
-            )
-            assert response.status_code == 202
-            data = response.json()
-            assert data["status"] == "completed"
-
-            job_state = self._wait_for_terminal_job(test_client, data["job_id"])
-            assert job_state["status"] == "completed"
-            assert job_state["result"]["mode"] == "fallback_add"
-            assert job_state["result"]["stored_count"] == 0
-            assert job_state["result"]["extracted_count"] == 0
+    @pytest.mark.anyio
+    async def test_extract_fallback_add_skips_when_no_fact_candidate(self, aclient, app_module, monkeypatch):
+        ac, mock_engine = aclient
+        monkeypatch.setattr(app_module, "extract_provider", None)
+        monkeypatch.setattr(app_module, "run_extraction", None)
+        monkeypatch.setattr(app_module, "EXTRACT_FALLBACK_ADD_ENABLED", True)
+        response = await ac.post(
+            "/memory/extract",
+            json={
+                "messages": "User: hi\nAssistant: hello",
+                "source": "test/proj",
+                "context": "stop",
+            },
+            headers={"X-API-Key": "test-key"},
+        )
+        assert response.status_code == 202
+        data = response.json()
+        assert data["status"] == "completed"
+
+        job_state = await _await_terminal_job(data["job_id"])
+        assert job_state["status"] == "completed"
+        assert job_state["result"]["mode"] == "fallback_add"
+        assert job_state["result"]["stored_count"] == 0
+        assert job_state["result"]["extracted_count"] == 0
 
         mock_engine.is_novel.assert_not_called()
         mock_engine.add_memories.assert_not_called()
 
-    def test_extract_returns_results(self, client):
-        test_client, mock_engine = client
+    @pytest.mark.anyio
+    async def test_extract_returns_results(self, aclient, app_module, monkeypatch):
+        ac, mock_engine = aclient
         mock_result = {
             "actions": [{"action": "add", "text": "test fact", "id": 1}],
             "extracted_count": 1,
@@ -117,91 +191,104 @@ class TestExtractEndpoint:
             "updated_count": 0,
             "deleted_count": 0,
         }
-        with patch("app.extract_provider", MagicMock()), \
-             patch("app.run_extraction", return_value=mock_result):
-            response = test_client.post(
-                "/memory/extract",
-                json={
-                    "messages": "User: test\nAssistant: ok",
-                    "source": "test/proj",
-                    "context": "stop",
-                },
-                headers={"X-API-Key": "test-key"},
-            )
-            assert response.status_code == 202
-            data = response.json()
-            assert data["status"] == "queued"
-            assert "job_id" in data
-
-            job_state = self._wait_for_terminal_job(test_client, data["job_id"])
-            assert job_state["status"] == "completed"
-            assert job_state["result"]["extracted_count"] == 1
-
-    def test_extract_runtime_failure_uses_fallback_when_enabled(self, client):
-        test_client, mock_engine = client
+        monkeypatch.setattr(app_module, "extract_provider", _stub_provider())
+        monkeypatch.setattr(app_module, "run_extraction", Mock(return_value=mock_result))
+        response = await ac.post(
+            "/memory/extract",
+            json={
+                "messages": "User: test\nAssistant: ok",
+                "source": "test/proj",
+                "context": "stop",
+            },
+            headers={"X-API-Key": "test-key"},
+        )
+        assert response.status_code == 202
+        data = response.json()
+        assert data["status"] == "queued"
+        assert "job_id" in data
+
+        job_state = await _await_terminal_job(data["job_id"])
+        assert job_state["status"] == "completed"
+        assert job_state["result"]["extracted_count"] == 1
+
+        status_response = await ac.get(
+            f"/memory/extract/{data['job_id']}",
+            headers={"X-API-Key": "test-key"},
+        )
+        assert status_response.status_code == 200
+        assert status_response.json()["result"]["extracted_count"] == 1
+
+    @pytest.mark.anyio
+    async def test_extract_runtime_failure_uses_fallback_when_enabled(self, aclient, app_module, monkeypatch):
+        ac, mock_engine = aclient
         mock_engine.is_novel.return_value = (True, None)
         mock_engine.add_memories.return_value = [777]
-        with patch("app.extract_provider", MagicMock()), \
-             patch("app.EXTRACT_FALLBACK_ADD_ENABLED", True), \
-             patch(
-                 "app.run_extraction",
-                 return_value={
-                     "actions": [],
-                     "extracted_count": 0,
-                     "stored_count": 0,
-                     "updated_count": 0,
-                     "deleted_count": 0,
-                     "error": "provider_runtime_failure",
-                     "error_stage": "extract_facts",
-                     "error_message": "429 Too Many Requests",
-                 },
-             ):
-            response = test_client.post(
-                "/memory/extract",
-                json={
-                    "messages": "User: We decided to keep fallback enabled for quota failures.",
-                    "source": "test/runtime-fallback",
-                    "context": "stop",
-                },
-                headers={"X-API-Key": "test-key"},
-            )
-            assert response.status_code == 202
-            job_state = self._wait_for_terminal_job(test_client, response.json()["job_id"])
-            assert job_state["status"] == "completed"
-            assert job_state["result"]["mode"] == "fallback_add"
-            assert job_state["result"]["stored_count"] == 1
-            assert job_state["result"]["fallback_triggered"] is True
-            assert job_state["result"]["fallback_reason"] == "provider_runtime_failure"
+        monkeypatch.setattr(app_module, "extract_provider", _stub_provider())
+        monkeypatch.setattr(app_module, "EXTRACT_FALLBACK_ADD_ENABLED", True)
+        monkeypatch.setattr(
+            app_module,
+            "run_extraction",
+            Mock(return_value={
+                "actions": [],
+                "extracted_count": 0,
+                "stored_count": 0,
+                "updated_count": 0,
+                "deleted_count": 0,
+                "error": "provider_runtime_failure",
+                "error_stage": "extract_facts",
+                "error_message": "429 Too Many Requests",
+            }),
+        )
+        response = await ac.post(
+            "/memory/extract",
+            json={
+                "messages": "User: We decided to keep fallback enabled for quota failures.",
+                "source": "test/runtime-fallback",
+                "context": "stop",
+            },
+            headers={"X-API-Key": "test-key"},
+        )
+        assert response.status_code == 202
+        job_state = await _await_terminal_job(response.json()["job_id"])
+        assert job_state["status"] == "completed"
+        assert job_state["result"]["mode"] == "fallback_add"
+        assert job_state["result"]["stored_count"] == 1
+        assert job_state["result"]["fallback_triggered"] is True
+        assert job_state["result"]["fallback_reason"] == "provider_runtime_failure"
 
         mock_engine.is_novel.assert_called_once()
         mock_engine.add_memories.assert_called_once()
 
-    def test_extract_triggers_memory_trim(self, client):
-        test_client, _ = client
-        with patch("app.extract_provider", MagicMock()), \
-             patch("app.run_extraction", return_value={"actions": [], "extracted_count": 0, "stored_count": 0, "updated_count": 0, "deleted_count": 0}), \
-             patch("app.memory_trimmer.maybe_trim", return_value={"trimmed": False, "reason": "cooldown"}) as trim_mock:
-            response = test_client.post(
-                "/memory/extract",
-                json={"messages": "test", "source": "test", "context": "stop"},
-                headers={"X-API-Key": "test-key"},
-            )
-            assert response.status_code == 202
-            job_id = response.json()["job_id"]
-            self._wait_for_terminal_job(test_client, job_id)
-            trim_mock.assert_called_once()
-
-    def test_extract_rejects_oversized_payload(self, client):
+    @pytest.mark.anyio
+    async def test_extract_triggers_memory_trim(self, aclient, app_module, monkeypatch):
+        ac, _ = aclient
+        trim_mock = Mock(return_value={"trimmed": False, "reason": "cooldown"})
+        monkeypatch.setattr(app_module, "extract_provider", _stub_provider())
+        monkeypatch.setattr(
+            app_module,
+            "run_extraction",
+            Mock(return_value={"actions": [], "extracted_count": 0, "stored_count": 0, "updated_count": 0, "deleted_count": 0}),
+        )
+        monkeypatch.setattr(app_module.memory_trimmer, "maybe_trim", trim_mock)
+        response = await ac.post(
+            "/memory/extract",
+            json={"messages": "test", "source": "test", "context": "stop"},
+            headers={"X-API-Key": "test-key"},
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        await _await_terminal_job(job_id)
+        trim_mock.assert_called_once()
+
+    def test_extract_rejects_oversized_payload(self, client, app_module, monkeypatch):
         test_client, _ = client
-        import app as app_module
-
-        oversized = "x" * (app_module.MAX_EXTRACT_MESSAGE_CHARS + 1)
-        with patch("app.extract_provider", MagicMock()):
-            response = test_client.post(
-                "/memory/extract",
-                json={"messages": oversized, "source": "test", "context": "stop"},
-                headers={"X-API-Key": "test-key"},
-            )
+        body = _oversized_extract_body(app_module.MAX_EXTRACT_MESSAGE_CHARS)
+        monkeypatch.setattr(app_module, "extract_provider", _stub_provider())
+        response = test_client.post(
+            "/memory/extract",
+            content=body,
+            headers={"X-API-Key": "test-key", "Content-Type": "application/json"},
+        )
         assert response.status_code == 422
 
     def test_extract_job_not_found(self, client):
@@ -212,23 +299,17 @@ class TestExtractEndpoint:
         )
         assert response.status_code == 404
 
-    def test_extract_returns_429_when_queue_full(self, client):
+    def test_extract_returns_429_when_queue_full(self, client, app_module, monkeypatch):
         test_client, _ = client
-        import asyncio
-        import app as app_module
-
+        monkeypatch.setattr(app_module, "extract_provider", _stub_provider())
+        monkeypatch.setattr(app_module, "run_extraction", Mock())
         # Replace the queue with a tiny bounded queue that's already full
-        tiny_queue: asyncio.Queue = asyncio.Queue(maxsize=1)
-        tiny_queue.put_nowait({"job_id": "dummy", "request": {"messages": "", "source": "", "context": ""}})
-
-        with patch("app.extract_provider", MagicMock()), \
-             patch("app.run_extraction", MagicMock()), \
-             patch.object(app_module, "extract_queue", tiny_queue):
-            response = test_client.post(
-                "/memory/extract",
-                json={"messages": "test", "source": "test", "context": "stop"},
-                headers={"X-API-Key": "test-key"},
-            )
+        monkeypatch.setattr(app_module, "extract_queue", _make_full_queue(1))
+        response = test_client.post(
+            "/memory/extract",
+            json={"messages": "test", "source": "test", "context": "stop"},
+            headers={"X-API-Key": "test-key"},
+        )
         assert response.status_code == 429
         assert "Retry-After" in response.headers
         detail = response.json()["detail"]
@@ -268,37 +349,37 @@ class TestSupersedeEndpoint:
 class TestExtractStatusEndpoint:
     """Test GET /extract/status."""
 
-    def test_status_when_disabled(self, client):
+    def test_status_when_disabled(self, client, app_module, monkeypatch):
         test_client, _ = client
-        with patch("app.extract_provider", None):
-            response = test_client.get(
-                "/extract/status",
-                headers={"X-API-Key": "test-key"},
-            )
-            assert response.status_code == 200
-            data = response.json()
-            assert data["enabled"] is False
-            assert "queue_depth" in data
-            assert "queue_max" in data
-            assert "workers" in data
-
-    def test_status_when_enabled(self, client):
+        monkeypatch.setattr(app_module, "extract_provider", None)
+        response = test_client.get(
+            "/extract/status",
+            headers={"X-API-Key": "test-key"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["enabled"] is False
+        assert "queue_depth" in data
+        assert "queue_max" in data
+        assert "workers" in data
+
+    def test_status_when_enabled(self, client, app_module, monkeypatch):
         test_client, _ = client
-        mock_provider = MagicMock()
-        mock_provider.provider_name = "anthropic"
-        mock_provider.model = "claude-haiku-4-5-20251001"
+        mock_provider = _stub_provider(
+            provider_name="anthropic", model="claude-haiku-4-5-20251001"
+        )
         mock_provider.health_check.return_value = True
 
-        with patch("app.extract_provider", mock_provider):
-            response = test_client.get(
-                "/extract/status",
-                headers={"X-API-Key": "test-key"},
-            )
-            assert response.status_code == 200
-            data = response.json()
-            assert data["enabled"] is True
-            assert data["provider"] == "anthropic"
-            assert data["status"] == "healthy"
-            assert "queue_depth" in data
-            assert "queue_max" in data
-            assert "workers" in data
+        monkeypatch.setattr(app_module, "extract_provider", mock_provider)
+        response = test_client.get(
+            "/extract/status",
+            headers={"X-API-Key": "test-key"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["enabled"] is True
+        assert data["provider"] == "anthropic"
+        assert data["status"] == "healthy"
+        assert "queue_depth" in data
+        assert "queue_max" in data
+        assert "workers" in data
@@ -4,6 +4,7 @@ import os
 import tempfile
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 
@@ -265,7 +266,8 @@ class TestExtractCommit:
     def test_commit_multiple_approved(self, client):
         """Multiple approved ADD actions result in correct stored_count."""
         tc, mock = client
-        mock.add_memories.return_value = [10]
+        mock.add_memories.return_value = [10, 11, 12]
+        mock.encode_texts.return_value = np.eye(3)
         resp = tc.post(
             "/memory/extract/commit",
             json={
@@ -283,4 +285,6 @@ class TestExtractCommit:
         )
         assert resp.status_code == 200
         assert resp.json()["stored_count"] == 3
-        assert mock.add_memories.call_count == 3
+        # Approved ADDs are stored in one batched call.
+        assert mock.add_memories.call_count == 1
+        assert mock.add_memories.call_args.kwargs["texts"] == ["fact 0", "fact 1", "fact 2"]
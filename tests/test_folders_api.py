@@ -1,37 +1,37 @@
 """Tests for folder listing and rename API endpoints."""
 
-import importlib
-import os
-from unittest.mock import MagicMock, patch
+import copy
+from unittest.mock import MagicMock
 
 import pytest
-from fastapi.testclient import TestClient
+
+
+# Canonical engine configuration, applied to a fresh mock for every test.
+_ENGINE_TEMPLATE = {
+    "stats_light.return_value": {
+        "total_memories": 5,
+        "dimension": 384,
+        "model": "all-MiniLM-L6-v2",
+    },
+    "is_ready.return_value": {"ready": True, "status": "ready"},
+    "metadata": [
+        {"id": 0, "text": "a", "source": "project-x/decisions"},
+        {"id": 1, "text": "b", "source": "project-x/bugs"},
+        {"id": 2, "text": "c", "source": "project-y/notes"},
+        {"id": 3, "text": "d", "source": "standalone"},
+        {"id": 4, "text": "e", "source": ""},
+    ],
+    "update_memory.return_value": {"id": 0, "updated_fields": ["source"]},
+    "delete_by_prefix.return_value": {"deleted_count": 2},
+}
 
 
 @pytest.fixture
-def client():
-    with patch.dict(os.environ, {"API_KEY": "test-key", "EXTRACT_PROVIDER": ""}):
-        import app as app_module
-
-        importlib.reload(app_module)
-        mock_engine = MagicMock()
-        mock_engine.stats_light.return_value = {
-            "total_memories": 5,
-            "dimension": 384,
-            "model": "all-MiniLM-L6-v2",
-        }
-        mock_engine.is_ready.return_value = {"ready": True, "status": "ready"}
-        mock_engine.metadata = [
-            {"id": 0, "text": "a", "source": "project-x/decisions"},
-            {"id": 1, "text": "b", "source": "project-x/bugs"},
-            {"id": 2, "text": "c", "source": "project-y/notes"},
-            {"id": 3, "text": "d", "source": "standalone"},
-            {"id": 4, "text": "e", "source": ""},
-        ]
-        mock_engine.update_memory.return_value = {"id": 0, "updated_fields": ["source"]}
-        mock_engine.delete_by_prefix.return_value = {"deleted_count": 2}
-        app_module.memory = mock_engine
-        yield TestClient(app_module.app), mock_engine
+def client(app_env, monkeypatch):
+    app_module, test_client = app_env
+    mock_engine = MagicMock(**copy.deepcopy(_ENGINE_TEMPLATE))
+    monkeypatch.setattr(app_module, "memory", mock_engine)
+    yield test_client, mock_engine
 
 
 HEADERS = {"X-API-Key": "test-key"}
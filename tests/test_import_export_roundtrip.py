@@ -6,6 +6,9 @@ import pytest
 
 from memory_engine import MemoryEngine
 
+# Engines in this module share one ONNX embedder per model.
+pytestmark = pytest.mark.usefixtures("shared_onnx_embedders")
+
 
 @pytest.fixture
 def engine(tmp_path):
@@ -1,14 +1,62 @@
 """Tests for installer target selection and Codex integration behavior."""
 
+import hashlib
 import json
 import os
 import shutil
 import subprocess
 from pathlib import Path
+from typing import Iterable
+
+import pytest
 
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 INSTALL_SCRIPT = REPO_ROOT / "integrations" / "claude-code" / "install.sh"
+# Everything the installer reads or copies, plus these tests themselves.
+INSTALLER_INPUTS = (
+    REPO_ROOT / "integrations" / "claude-code",
+    REPO_ROOT / "integrations" / "codex",
+    REPO_ROOT / "integrations" / "openclaw-skill.md",
+    REPO_ROOT / "integrations" / "opencode" / "plugin" / "memories.js",
+    REPO_ROOT / "plugin" / "skills" / "memories",
+    REPO_ROOT / "mcp-server" / "index.js",
+    Path(__file__).resolve(),
+)
+# Digest of INSTALLER_INPUTS at the last green run. Refresh it after the
+# suite passes with: python tests/test_installer.py > tests/installer_inputs.sha256
+INSTALLER_PIN = Path(__file__).with_name("installer_inputs.sha256")
+
+
+def _installer_inputs_digest() -> str:
+    digest = hashlib.sha256()
+    for root in INSTALLER_INPUTS:
+        paths = [root] if root.is_file() else sorted(p for p in root.rglob("*") if p.is_file())
+        for path in paths:
+            digest.update(path.relative_to(REPO_ROOT).as_posix().encode())
+            digest.update(b"\0")
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _installer_inputs_unchanged() -> bool:
+    try:
+        pinned = INSTALLER_PIN.read_text(encoding="utf-8").strip()
+    except OSError:
+        return False
+    return pinned == _installer_inputs_digest()
+
+
+pytestmark = [
+    pytest.mark.skipif(
+        os.name != "posix" or shutil.which("bash") is None,
+        reason="installer tests need a POSIX shell",
+    ),
+    pytest.mark.skipif(
+        bool(os.getenv("SKIP_UNCHANGED_INSTALLER_TESTS")) and _installer_inputs_unchanged(),
+        reason="installer inputs match the pinned digest and SKIP_UNCHANGED_INSTALLER_TESTS is set",
+    ),
+]
 
 
 def _prepare_installer_fixture(tmp_path: Path) -> Path:
@@ -54,6 +102,19 @@ printf '{"job_id":"job-1"}\n'
     script.chmod(0o755)
 
 
+def _make_dirs(root: Path, paths: Iterable[str]) -> None:
+    for rel in paths:
+        (root / rel).mkdir(parents=True, exist_ok=True)
+
+
+def _installer_env(home: Path, extra_env: dict[str, str] | None = None) -> dict[str, str]:
+    env = os.environ.copy()
+    env["HOME"] = str(home)
+    if extra_env:
+        env.update(extra_env)
+    return env
+
+
 def _run_installer(
     home: Path,
     *args: str,
@@ -61,14 +122,10 @@ def _run_installer(
     input_text: str | None = None,
     extra_env: dict[str, str] | None = None,
 ) -> subprocess.CompletedProcess[str]:
-    env = os.environ.copy()
-    env["HOME"] = str(home)
-    if extra_env:
-        env.update(extra_env)
     return subprocess.run(
         [str(install_script), *args],
         cwd=str(install_script.parent),
-        env=env,
+        env=_installer_env(home, extra_env),
         text=True,
         capture_output=True,
         input=input_text,
@@ -76,44 +133,82 @@ def _run_installer(
     )
 
 
-def test_auto_detect_defaults_to_claude_when_no_client_dirs(tmp_path: Path) -> None:
-    result = _run_installer(tmp_path, "--auto", "--dry-run")
-    assert result.returncode == 0
-    assert "targets=claude" in result.stdout
-    assert "mode=install" in result.stdout
-
-
-def test_auto_detect_finds_all_supported_targets(tmp_path: Path) -> None:
-    (tmp_path / ".claude").mkdir()
-    (tmp_path / ".codex").mkdir()
-    (tmp_path / ".config" / "opencode").mkdir(parents=True)
-    (tmp_path / ".openclaw" / "skills").mkdir(parents=True)
-
-    result = _run_installer(tmp_path, "--auto", "--dry-run")
-    assert result.returncode == 0
-    assert "targets=claude,codex,opencode,openclaw" in result.stdout
-
-
-def test_auto_detect_finds_opencode_target(tmp_path: Path) -> None:
-    (tmp_path / ".config" / "opencode" / "opencode.json").parent.mkdir(parents=True)
-    (tmp_path / ".config" / "opencode" / "opencode.json").write_text("{}")
-
-    result = _run_installer(tmp_path, "--auto", "--dry-run")
-    assert result.returncode == 0
-    assert "targets=opencode" in result.stdout
-
-
-def test_explicit_target_flags_override_auto_detection(tmp_path: Path) -> None:
-    (tmp_path / ".claude").mkdir()
-
-    result = _run_installer(tmp_path, "--codex", "--opencode", "--openclaw", "--dry-run", "--uninstall")
+# name -> (dirs to create under HOME, files to write, installer args, expected stdout fragments)
+_TARGET_SELECTION_CASES = {
+    "defaults_to_claude_when_no_client_dirs": (
+        (),
+        {},
+        ("--auto", "--dry-run"),
+        ("targets=claude", "mode=install"),
+    ),
+    "auto_detect_finds_all_supported_targets": (
+        (".claude", ".codex", ".config/opencode", ".openclaw/skills"),
+        {},
+        ("--auto", "--dry-run"),
+        ("targets=claude,codex,opencode,openclaw",),
+    ),
+    "auto_detect_finds_opencode_target": (
+        (".config/opencode",),
+        {".config/opencode/opencode.json": "{}"},
+        ("--auto", "--dry-run"),
+        ("targets=opencode",),
+    ),
+    "explicit_target_flags_override_auto_detection": (
+        (".claude",),
+        {},
+        ("--codex", "--opencode", "--openclaw", "--dry-run", "--uninstall"),
+        ("targets=codex,opencode,openclaw", "mode=uninstall"),
+    ),
+}
+
+
+def _run_many(
+    runs: list[tuple[Path, tuple[str, ...]]],
+) -> list[subprocess.CompletedProcess[str]]:
+    """Launch independent installer invocations up front, then collect them in order."""
+    procs = []
+    for home, args in runs:
+        argv = [str(INSTALL_SCRIPT), *args]
+        proc = subprocess.Popen(
+            argv,
+            cwd=str(INSTALL_SCRIPT.parent),
+            env=_installer_env(home),
+            text=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        procs.append((argv, proc))
+
+    results = []
+    for argv, proc in procs:
+        stdout, stderr = proc.communicate()
+        results.append(subprocess.CompletedProcess(argv, proc.returncode, stdout, stderr))
+    return results
+
+
+@pytest.fixture(scope="module")
+def target_selection_results(tmp_path_factory) -> dict[str, subprocess.CompletedProcess[str]]:
+    runs = []
+    for name, (dirs, files, args, _) in _TARGET_SELECTION_CASES.items():
+        home = tmp_path_factory.mktemp(name)
+        _make_dirs(home, dirs)
+        for rel, contents in files.items():
+            (home / rel).write_text(contents)
+        runs.append((home, args))
+    return dict(zip(_TARGET_SELECTION_CASES, _run_many(runs)))
+
+
+@pytest.mark.parametrize("case", list(_TARGET_SELECTION_CASES))
+def test_target_selection(case: str, target_selection_results) -> None:
+    result = target_selection_results[case]
     assert result.returncode == 0
-    assert "targets=codex,opencode,openclaw" in result.stdout
-    assert "mode=uninstall" in result.stdout
+    for expected in _TARGET_SELECTION_CASES[case][3]:
+        assert expected in result.stdout
 
 
 def test_uninstall_mode_does_not_require_shell_profile_variable(tmp_path: Path) -> None:
-    (tmp_path / ".claude").mkdir(parents=True)
+    _make_dirs(tmp_path, [".claude"])
 
     result = _run_installer(tmp_path, "--claude", "--uninstall")
     assert result.returncode == 0
@@ -520,3 +615,7 @@ def test_opencode_uninstall_removes_stale_memories_plugin_paths(tmp_path: Path)
         "plugin": ["/tmp/other-plugin.js", "/tmp/memories-but-not-opencode.js"],
         "theme": "system",
     }
+
+
+if __name__ == "__main__":
+    print(_installer_inputs_digest())
@@ -7,6 +7,9 @@ import pytest
 from extraction_profiles import ExtractionProfiles
 from memory_engine import MemoryEngine
 
+# Engines in this module share one ONNX embedder per model.
+pytestmark = pytest.mark.usefixtures("shared_onnx_embedders")
+
 
 @pytest.fixture
 def profiles(tmp_path):
@@ -0,0 +1,73 @@
+"""Tests for the in-process LLM completion cache."""
+
+from unittest.mock import Mock
+
+from llm_cache import LLMCache
+from llm_provider import CompletionResult, LLMProvider
+
+
+def _provider(text="[]"):
+    provider = Mock(spec=LLMProvider)
+    provider.configure_mock(provider_name="ollama", model="gemma3:4b")
+    provider.complete.return_value = CompletionResult(text=text, input_tokens=12, output_tokens=4)
+    return provider
+
+
+def test_hit_returns_text_without_token_usage():
+    cache = LLMCache(max_entries=4)
+    provider = _provider('["fact"]')
+
+    first = cache.complete(provider, "system", "user")
+    second = cache.complete(provider, "system", "user")
+
+    assert provider.complete.call_count == 1
+    assert first.input_tokens == 12
+    assert second == CompletionResult(text='["fact"]', input_tokens=0, output_tokens=0)
+
+
+def test_key_covers_prompt_and_model():
+    base = LLMCache.make_key("s", "u", "ollama:a")
+    assert base == LLMCache.make_key("s", "u", "ollama:a")
+    assert base != LLMCache.make_key("s", "u2", "ollama:a")
+    assert base != LLMCache.make_key("s2", "u", "ollama:a")
+    assert base != LLMCache.make_key("s", "u", "ollama:b")
+
+
+def test_evicts_least_recently_used():
+    cache = LLMCache(max_entries=2)
+    result = CompletionResult(text="x")
+    cache.set("a", result)
+    cache.set("b", result)
+    assert cache.get("a") is not None  # "b" is now least recent
+    cache.set("c", result)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_expired_entries_miss(monkeypatch):
+    clock = iter([100.0, 200.0])
+    monkeypatch.setattr("llm_cache.time.monotonic", lambda: next(clock))
+    cache = LLMCache(max_entries=2, ttl_seconds=50)
+    cache.set("a", CompletionResult(text="x"))
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_nonzero_temperature_is_not_stored():
+    cache = LLMCache(max_entries=2)
+    cache.set("a", CompletionResult(text="x"), temperature=0.7)
+    assert cache.get("a") is None
+
+
+def test_disabled_cache_always_calls_provider():
+    cache = LLMCache(max_entries=0)
+    provider = _provider()
+
+    cache.complete(provider, "system", "user")
+    cache.complete(provider, "system", "user")
+
+    assert not cache.enabled
+    assert provider.complete.call_count == 2
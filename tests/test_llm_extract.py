@@ -1,8 +1,64 @@
 """Tests for llm_extract module."""
 import pytest
 import json
-from unittest.mock import MagicMock, patch
-from llm_provider import CompletionResult
+import threading
+from unittest.mock import Mock, patch
+
+import numpy as np
+from llm_cache import LLMCache
+from llm_provider import CompletionResult, LLMProvider
+import llm_extract
+from llm_extract import (
+    AUDN_PROMPT,
+    EXTRACT_BATCH_MAX_QUERIES,
+    EXTRACT_MAX_FACT_CHARS,
+    EXTRACT_MAX_FACTS,
+    EXTRACT_SIMILAR_TEXT_CHARS,
+    _apply_maintenance,
+    _build_extraction_system_prompt,
+    _preprocess_messages,
+    _env_float,
+    _env_int,
+    execute_actions,
+    extract_facts,
+    extract_facts_batch,
+    run_audn,
+    run_extraction,
+    run_extraction_pipeline,
+)
+
+# MemoryEngine surface touched by llm_extract; a name list keeps the spec
+# narrow without importing the Qdrant-backed engine module.
+_ENGINE_API = [
+    "add_link",
+    "add_memories",
+    "delete_memory",
+    "encode_texts",
+    "get_memory",
+    "hybrid_search",
+    "is_novel",
+    "stats_light",
+    "update_memory",
+]
+
+# Canned provider responses for the full-pipeline test: the extract call,
+# then the AUDN call.
+_FACTS_PAYLOAD = json.dumps([
+    {"category": "DECISION", "text": "Uses Drizzle ORM"},
+    {"category": "DETAIL", "text": "TypeScript strict mode"},
+])
+_AUDN_PAYLOAD = json.dumps([
+    {"action": "ADD", "fact_index": 0},
+    {"action": "NOOP", "fact_index": 1, "existing_id": 30},
+])
+
+
+@pytest.fixture
+def mock_provider():
+    """LLMProvider-specced mock for tests whose completions depend on the prompt."""
+    provider = Mock(spec=LLMProvider)
+    provider.configure_mock(supports_audn=True)
+    return provider
 
 
 def _cr(text, input_tokens=10, output_tokens=5):
@@ -13,178 +69,299 @@ def _cr(text, input_tokens=10, output_tokens=5):
 class TestFactExtraction:
     """Test extract_facts() function."""
 
-    def test_extracts_facts_from_conversation(self):
-        from llm_extract import extract_facts
-
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr(json.dumps([
+    def test_extracts_facts_from_conversation(self, stub_provider):
+        provider = stub_provider([json.dumps([
             {"category": "DECISION", "text": "User prefers Drizzle ORM over Prisma"},
             {"category": "DETAIL", "text": "Project uses TypeScript strict mode"}
-        ]))
+        ])])
 
-        facts = extract_facts(mock_provider, "User: let's use drizzle\nAssistant: Good choice!")
+        facts = extract_facts(provider, "User: let's use drizzle\nAssistant: Good choice!")
+        assert len(provider.calls) == 1
         assert len(facts) == 2
         assert "Drizzle" in facts[0]["text"]
 
-    def test_returns_empty_when_nothing_worth_storing(self):
-        from llm_extract import extract_facts
+    def test_returns_empty_when_nothing_worth_storing(self, stub_provider):
+        provider = stub_provider(["[]"])
+
+        facts = extract_facts(provider, "User: hi\nAssistant: hello!")
+        assert facts == []
 
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr("[]")
+    def test_handles_llm_returning_non_json(self, stub_provider):
+        provider = stub_provider(["Sorry, I can't extract facts from this."])
 
-        facts = extract_facts(mock_provider, "User: hi\nAssistant: hello!")
+        facts = extract_facts(provider, "User: hi")
         assert facts == []
 
-    def test_handles_llm_returning_non_json(self):
-        from llm_extract import extract_facts
+    def test_non_json_response_skips_parsing(self, stub_provider):
+        provider = stub_provider(["Sorry, I can't extract facts from this."])
 
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr("Sorry, I can't extract facts from this.")
+        with patch.object(llm_extract.json, "loads", side_effect=AssertionError("parsed")):
+            assert extract_facts(provider, "User: hi") == []
 
-        facts = extract_facts(mock_provider, "User: hi")
-        assert facts == []
+    def test_array_wrapped_in_prose_still_parses(self, stub_provider):
+        provider = stub_provider([
+            'Here you go: [{"category": "DETAIL", "text": "Uses Vite"}]. Done.'
+        ])
 
-    def test_pre_compact_context_uses_aggressive_prompt(self):
-        from llm_extract import extract_facts
+        facts = extract_facts(provider, "User: we use vite")
+        assert facts == [{"category": "detail", "text": "Uses Vite"}]
 
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr("[]")
+    def test_pre_compact_context_uses_aggressive_prompt(self, stub_provider):
+        provider = stub_provider(["[]"])
 
-        extract_facts(mock_provider, "some messages", context="pre_compact")
-        call_args = mock_provider.complete.call_args
-        system_prompt = call_args[0][0] if call_args[0] else call_args[1].get("system", "")
+        extract_facts(provider, "some messages", context="pre_compact")
+        system_prompt, _ = provider.calls[-1]
         assert "thorough" in system_prompt.lower()
 
-    def test_caps_fact_count_and_length(self):
-        from llm_extract import extract_facts, EXTRACT_MAX_FACTS, EXTRACT_MAX_FACT_CHARS
-
-        mock_provider = MagicMock()
+    def test_caps_fact_count_and_length(self, stub_provider):
         oversized_fact = "x" * (EXTRACT_MAX_FACT_CHARS + 300)
-        mock_provider.complete.return_value = _cr(json.dumps(
+        provider = stub_provider([json.dumps(
             [{"category": "DETAIL", "text": oversized_fact}] * (EXTRACT_MAX_FACTS + 10)
-        ))
+        )])
 
-        facts = extract_facts(mock_provider, "User: test")
+        facts = extract_facts(provider, "User: test")
         assert len(facts) == EXTRACT_MAX_FACTS
         assert all(len(f["text"]) <= EXTRACT_MAX_FACT_CHARS for f in facts)
         assert all(f["text"].endswith("...") for f in facts)
 
+    def test_truncation_skips_alloc_for_in_bound_text(self):
+        class _Unrendered:
+            def __str__(self):
+                raise AssertionError("tail fact should not be normalized")
+
+        in_bound = "Uses Drizzle ORM"
+        raw = [{"category": "DETAIL", "text": in_bound}] * EXTRACT_MAX_FACTS
+        raw += [{"category": "DETAIL", "text": _Unrendered()}] * 5
+
+        facts = llm_extract._normalize_facts(raw)
+
+        assert len(facts) == EXTRACT_MAX_FACTS
+        assert all(f["text"] == in_bound for f in facts)
+
+    def test_batch_extracts_facts_across_conversations(self, stub_provider):
+        conversations = [f"User: service {i} uses Postgres" for i in range(8)]
+        provider = stub_provider([json.dumps([
+            {"query_index": i + 1, "facts": [{"category": "DECISION", "text": f"Service {i} uses Postgres"}]}
+            for i in reversed(range(8))
+        ])])
+
+        results = extract_facts_batch(provider, conversations, source="claude-code/my-app")
+
+        assert len(provider.calls) == 1
+        system_prompt, user_prompt = provider.calls[-1]
+        assert "my-app" in system_prompt
+        assert "Q[1]:" in user_prompt and "Q[8]:" in user_prompt
+        assert results == [
+            [{"category": "decision", "text": f"Service {i} uses Postgres"}] for i in range(8)
+        ]
+
+    def test_batch_falls_back_per_conversation_on_shape_mismatch(self, stub_provider):
+        provider = stub_provider([
+            json.dumps([{"query_index": 1, "facts": []}]),  # missing Q[2]
+            json.dumps([{"category": "LEARNING", "text": "first"}]),
+            "[]",
+        ])
+
+        results = extract_facts_batch(provider, ["User: a", "User: b"])
+
+        assert len(provider.calls) == 3
+        assert results == [[{"category": "learning", "text": "first"}], []]
+
+    def test_batch_caps_queries_per_call(self, mock_provider):
+        def answer(system, user):
+            count = user.count("Q[")
+            return _cr(json.dumps([{"query_index": i, "facts": []} for i in range(1, count + 1)]))
+
+        mock_provider.complete.side_effect = answer
+        results = extract_facts_batch(mock_provider, ["User: x"] * (EXTRACT_BATCH_MAX_QUERIES + 2))
+
+        assert mock_provider.complete.call_count == 2
+        assert len(results) == EXTRACT_BATCH_MAX_QUERIES + 2
+
+
+class TestPreprocessMessages:
+    """Test transcript cleanup ahead of extract_facts()."""
+
+    def test_preprocess_strips_long_code_blocks(self):
+        code = "\n".join(f"line {i}" for i in range(30))
+        short = "```\nprint('hi')\n```"
+        text = f"User: see below\n```python\n{code}\n```\n\n\n\nAssistant: \x1b[32mdone\x1b[0m\n{short}"
+
+        cleaned = _preprocess_messages(text, 10_000)
+
+        assert "line 29" not in cleaned
+        assert "[omitted code block]" in cleaned
+        assert short in cleaned
+        assert "\x1b" not in cleaned
+        assert "\n\n\n" not in cleaned
+        assert cleaned.startswith("User: see below")
+
+    def test_preprocess_strips_long_code_blocks_containing_backticks(self):
+        code = "\n".join(f"msg = `line {i}` + '``'" for i in range(30))
+        text = f"User: see below\n```js\n{code}\n```\nAssistant: done"
+
+        cleaned = _preprocess_messages(text, 10_000)
+
+        assert cleaned == "User: see below\n[omitted code block]\nAssistant: done"
+
+    def test_preprocess_respects_budget(self):
+        text = "User: old turn\n" + "x" * 5000 + "\nUser: latest turn"
+
+        cleaned = _preprocess_messages(text, 1000)
+
+        assert len(cleaned) == 1000
+        assert cleaned.endswith("User: latest turn")
+
+    def test_extract_facts_can_skip_preprocessing(self, stub_provider):
+        provider = stub_provider(["[]", "[]"])
+        raw = "User: a\n\n\n\nAssistant: b"
+
+        extract_facts(provider, raw)
+        assert provider.calls[-1][1] == "User: a\n\nAssistant: b"
+
+        extract_facts(provider, raw, preprocess=False)
+        assert provider.calls[-1][1] == raw
+
+
+class TestCompletionCache:
+    """Test the LLM response cache around extract_facts() and run_audn()."""
+
+    @pytest.fixture(autouse=True)
+    def _enabled_cache(self, monkeypatch):
+        monkeypatch.setattr(llm_extract, "LLM_CACHE", LLMCache(max_entries=16))
+
+    def test_extract_facts_uses_cache_on_repeat(self, stub_provider):
+        provider = stub_provider([json.dumps([
+            {"category": "DECISION", "text": "Uses Drizzle ORM"}
+        ])])
+
+        first = extract_facts(provider, "User: use drizzle", source="claude-code/my-app")
+        second = extract_facts(provider, "User: use drizzle", source="claude-code/my-app")
+
+        assert len(provider.calls) == 1
+        assert first == second
+
+    def test_cache_miss_on_differing_source(self, stub_provider):
+        provider = stub_provider(["[]", "[]"])
+
+        extract_facts(provider, "User: use drizzle", source="claude-code/app-a")
+        extract_facts(provider, "User: use drizzle", source="claude-code/app-b")
+
+        assert len(provider.calls) == 2
+
+    def test_run_audn_uses_cache_on_repeat(self, stub_provider, stub_engine):
+        provider = stub_provider([json.dumps([
+            {"action": "ADD", "fact_index": 0}
+        ])])
+        facts = [{"text": "Uses Drizzle ORM", "category": "decision"}]
+
+        first, _, _ = run_audn(provider, stub_engine, facts=facts, source="test/project")
+        second, _, _ = run_audn(provider, stub_engine, facts=facts, source="test/project")
+
+        assert len(provider.calls) == 1
+        assert first == second
+
 
 class TestCategoryExtraction:
     """Test that extract_facts returns categorized facts."""
 
-    def test_extracts_categorized_facts(self):
-        from llm_extract import extract_facts
-
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr(json.dumps([
+    def test_extracts_categorized_facts(self, stub_provider):
+        provider = stub_provider([json.dumps([
             {"category": "DECISION", "text": "Chose Drizzle over Prisma for smaller Docker images"},
             {"category": "LEARNING", "text": "Prisma query engine adds 40MB to images"},
-        ]))
+        ])])
 
-        facts = extract_facts(mock_provider, "User: which ORM?\nAssistant: Let's use Drizzle")
+        facts = extract_facts(provider, "User: which ORM?\nAssistant: Let's use Drizzle")
         assert len(facts) == 2
         assert facts[0]["category"] == "decision"
         assert facts[0]["text"] == "Chose Drizzle over Prisma for smaller Docker images"
         assert facts[1]["category"] == "learning"
 
-    def test_falls_back_to_plain_strings(self):
+    def test_falls_back_to_plain_strings(self, stub_provider):
         """Old-format plain string arrays still work (backward compat)."""
-        from llm_extract import extract_facts
-
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr(json.dumps([
+        provider = stub_provider([json.dumps([
             "Chose Drizzle over Prisma"
-        ]))
+        ])])
 
-        facts = extract_facts(mock_provider, "User: which ORM?")
+        facts = extract_facts(provider, "User: which ORM?")
         assert len(facts) == 1
         assert facts[0]["category"] == "detail"
         assert facts[0]["text"] == "Chose Drizzle over Prisma"
 
-    def test_source_project_name_in_prompt(self):
-        from llm_extract import extract_facts
-
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr("[]")
+    def test_source_project_name_in_prompt(self, stub_provider):
+        provider = stub_provider(["[]"])
 
-        extract_facts(mock_provider, "some messages", source="claude-code/my-app")
-        system_prompt = mock_provider.complete.call_args[0][0]
+        extract_facts(provider, "some messages", source="claude-code/my-app")
+        system_prompt, _ = provider.calls[-1]
         assert "my-app" in system_prompt
 
-    def test_source_without_slash_uses_whole_source(self):
-        from llm_extract import extract_facts
-
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr("[]")
+    def test_source_without_slash_uses_whole_source(self, stub_provider):
+        provider = stub_provider(["[]"])
 
-        extract_facts(mock_provider, "some messages", source="my-project")
-        system_prompt = mock_provider.complete.call_args[0][0]
+        extract_facts(provider, "some messages", source="my-project")
+        system_prompt, _ = provider.calls[-1]
         assert "my-project" in system_prompt
 
-    def test_empty_source_uses_this(self):
-        from llm_extract import extract_facts
+    def test_empty_source_uses_this(self, stub_provider):
+        provider = stub_provider(["[]"])
 
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr("[]")
-
-        extract_facts(mock_provider, "some messages", source="")
-        system_prompt = mock_provider.complete.call_args[0][0]
+        extract_facts(provider, "some messages", source="")
+        system_prompt, _ = provider.calls[-1]
         assert "this" in system_prompt
 
-    def test_invalid_category_falls_back_to_detail(self):
-        from llm_extract import extract_facts
+    def test_system_prompt_is_cached(self, stub_provider):
+        provider = stub_provider(["[]", "[]"])
+        _build_extraction_system_prompt.cache_clear()
+
+        extract_facts(provider, "first", source="claude-code/cached-app")
+        extract_facts(provider, "second", source="claude-code/cached-app")
+
+        first_system = provider.calls[0][0]
+        second_system = provider.calls[1][0]
+        assert first_system is second_system
+        assert _build_extraction_system_prompt.cache_info().hits >= 1
 
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr(json.dumps([
+    def test_invalid_category_falls_back_to_detail(self, stub_provider):
+        provider = stub_provider([json.dumps([
             {"category": "UNKNOWN", "text": "Some fact"},
-        ]))
+        ])])
 
-        facts = extract_facts(mock_provider, "User: test")
+        facts = extract_facts(provider, "User: test")
         assert len(facts) == 1
         assert facts[0]["category"] == "detail"
 
-    def test_mixed_format_old_and_new(self):
+    def test_mixed_format_old_and_new(self, stub_provider):
         """Mix of old plain strings and new categorized objects."""
-        from llm_extract import extract_facts
-
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr(json.dumps([
+        provider = stub_provider([json.dumps([
             {"category": "DECISION", "text": "Chose Redis for caching"},
             "Project uses Python 3.12",
-        ]))
+        ])])
 
-        facts = extract_facts(mock_provider, "User: test")
+        facts = extract_facts(provider, "User: test")
         assert len(facts) == 2
         assert facts[0]["category"] == "decision"
         assert facts[0]["text"] == "Chose Redis for caching"
         assert facts[1]["category"] == "detail"
         assert facts[1]["text"] == "Project uses Python 3.12"
 
-    def test_return_error_true_returns_tuple(self):
-        from llm_extract import extract_facts
-
-        mock_provider = MagicMock()
-        mock_provider.complete.return_value = _cr(json.dumps([
+    def test_return_error_true_returns_tuple(self, stub_provider):
+        provider = stub_provider([json.dumps([
             {"category": "LEARNING", "text": "Some learning"},
-        ]))
+        ])])
 
         facts, error, tokens = extract_facts(
-            mock_provider, "User: test", return_error=True
+            provider, "User: test", return_error=True
         )
         assert len(facts) == 1
         assert error is None
         assert tokens["input"] == 10
         assert tokens["output"] == 5
 
-    def test_return_error_true_on_failure(self):
-        from llm_extract import extract_facts
-
-        mock_provider = MagicMock()
-        mock_provider.complete.side_effect = Exception("LLM error")
+    def test_return_error_true_on_failure(self, stub_provider):
+        provider = stub_provider(raises=Exception("LLM error"))
 
         facts, error, tokens = extract_facts(
-            mock_provider, "User: test", return_error=True
+            provider, "User: test", return_error=True
         )
         assert facts == []
         assert error == "LLM error"
@@ -194,216 +371,175 @@ class TestCategoryExtraction:
 class TestAUDNCycle:
     """Test run_audn() function."""
 
-    def test_add_new_fact(self):
-        from llm_extract import run_audn
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.return_value = _cr(json.dumps([
+    def test_add_new_fact(self, stub_provider, stub_engine):
+        provider = stub_provider([json.dumps([
             {"action": "ADD", "fact_index": 0}
-        ]))
-
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = []
+        ])])
 
         decisions, _, _ = run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "Uses Drizzle ORM", "category": "decision"}],
             source="test/project"
         )
         assert len(decisions) == 1
         assert decisions[0]["action"] == "ADD"
 
-    def test_noop_existing_fact(self):
-        from llm_extract import run_audn
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.return_value = _cr(json.dumps([
+    def test_noop_existing_fact(self, stub_provider, stub_engine):
+        provider = stub_provider([json.dumps([
             {"action": "NOOP", "fact_index": 0, "existing_id": 42}
-        ]))
-
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = [
+        ])])
+        stub_engine.search_results = [
             {"id": 42, "text": "Uses Drizzle ORM", "similarity": 0.95}
         ]
 
         decisions, _, _ = run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "Uses Drizzle ORM", "category": "decision"}],
             source="test/project"
         )
         assert len(decisions) == 1
         assert decisions[0]["action"] == "NOOP"
 
-    def test_update_existing_fact(self):
-        from llm_extract import run_audn
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.return_value = _cr(json.dumps([
+    def test_update_existing_fact(self, stub_provider, stub_engine):
+        provider = stub_provider([json.dumps([
             {"action": "UPDATE", "fact_index": 0, "old_id": 10, "new_text": "Uses Drizzle ORM (switched from Prisma)"}
-        ]))
-
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = [
+        ])])
+        stub_engine.search_results = [
             {"id": 10, "text": "Uses Prisma ORM", "similarity": 0.75}
         ]
 
         decisions, _, _ = run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "Switched from Prisma to Drizzle ORM", "category": "decision"}],
             source="test/project"
         )
         assert decisions[0]["action"] == "UPDATE"
         assert decisions[0]["old_id"] == 10
 
-    def test_ollama_skips_audn_uses_novelty(self):
-        from llm_extract import run_audn
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = False
-
-        mock_engine = MagicMock()
-        mock_engine.is_novel.return_value = (True, None)
+    def test_ollama_skips_audn_uses_novelty(self, stub_provider, stub_engine):
+        provider = stub_provider(supports_audn=False)
+        stub_engine.novel = (True, None)
 
         decisions, _, _ = run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "New fact", "category": "detail"}],
             source="test/project"
         )
         assert len(decisions) == 1
         assert decisions[0]["action"] == "ADD"
-        mock_engine.is_novel.assert_called_once()
-        mock_provider.complete.assert_not_called()
-
-    def test_ollama_noop_for_existing(self):
-        from llm_extract import run_audn
+        assert len(stub_engine.calls_to("is_novel")) == 1
+        assert provider.calls == []
 
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = False
-
-        mock_engine = MagicMock()
-        mock_engine.is_novel.return_value = (False, {"id": 5, "text": "Existing fact", "similarity": 0.95})
+    def test_ollama_noop_for_existing(self, stub_provider, stub_engine):
+        provider = stub_provider(supports_audn=False)
+        stub_engine.novel = (False, {"id": 5, "text": "Existing fact", "similarity": 0.95})
 
         decisions, _, _ = run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "Existing fact", "category": "detail"}],
             source="test/project"
         )
         assert decisions[0]["action"] == "NOOP"
 
-    def test_audn_prompt_truncates_similar_memory_text(self):
-        from llm_extract import run_audn, EXTRACT_SIMILAR_TEXT_CHARS
-
+    def test_audn_prompt_truncates_similar_memory_text(self, stub_provider, stub_engine):
         long_memory = "m" * (EXTRACT_SIMILAR_TEXT_CHARS + 500)
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.return_value = _cr(json.dumps(
+        provider = stub_provider([json.dumps(
             [{"action": "ADD", "fact_index": 0}]
-        ))
-
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = [
+        )])
+        stub_engine.search_results = [
             {"id": 42, "text": long_memory, "similarity": 0.95}
         ]
 
         run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "Uses Drizzle ORM", "category": "decision"}],
             source="test/project"
         )
 
-        prompt = mock_provider.complete.call_args[0][1]
+        _, prompt = provider.calls[-1]
         assert "m" * (EXTRACT_SIMILAR_TEXT_CHARS + 50) not in prompt
         assert "..." in prompt
 
-    def test_audn_prompt_includes_rrf_score_not_zero(self):
+    def test_audn_prompt_includes_rrf_score_not_zero(self, stub_provider, stub_engine):
         """Verify similar_json sent to LLM includes actual RRF score, not 0.0."""
-        from llm_extract import run_audn
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.return_value = _cr(json.dumps([
+        provider = stub_provider([json.dumps([
             {"action": "ADD", "fact_index": 0}
-        ]))
-
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = [
+        ])])
+        stub_engine.search_results = [
             {"id": 42, "text": "Uses Drizzle ORM", "rrf_score": 0.025}
         ]
 
         run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "New fact", "category": "decision"}],
             source="test/project"
         )
 
-        prompt = mock_provider.complete.call_args[0][1]
+        _, prompt = provider.calls[-1]
         assert '"relevance":0.025' in prompt or '"relevance":0.02' in prompt
         assert '"relevance":0.0,' not in prompt  # must NOT be zero
 
-    def test_audn_facts_json_includes_category(self):
+    def test_audn_facts_json_includes_category(self, stub_provider, stub_engine):
         """Verify the facts_json sent to the LLM includes category."""
-        from llm_extract import run_audn
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.return_value = _cr(json.dumps([
+        provider = stub_provider([json.dumps([
             {"action": "ADD", "fact_index": 0}
-        ]))
-
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = []
+        ])])
 
         run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "Uses Drizzle ORM", "category": "decision"}],
             source="test/project"
         )
 
-        prompt = mock_provider.complete.call_args[0][1]
+        _, prompt = provider.calls[-1]
         assert '"category":"decision"' in prompt
 
-    def test_audn_filters_similar_memories_by_allowed_prefixes(self):
-        from llm_extract import run_audn
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.return_value = _cr(json.dumps([
+    def test_audn_payload_is_compact_no_spaces(self, stub_provider, stub_engine):
+        provider = stub_provider([json.dumps([
             {"action": "ADD", "fact_index": 0}
-        ]))
+        ])])
+        stub_engine.search_results = [
+            {"id": 7, "text": "Uses Postgres", "source": "test/project", "similarity": 0.8},
+        ]
+
+        run_audn(
+            provider, stub_engine,
+            facts=[{"text": "Uses Drizzle ORM", "category": "decision"}],
+            source="test/project"
+        )
 
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = [
+        _, prompt = provider.calls[-1]
+        assert '[{"index":0,"text":"Uses Drizzle ORM","category":"decision"}]' in prompt
+        assert '{"0":[{"id":7,"text":"Uses Postgres","relevance":0.8}]}' in prompt
+
+    def test_audn_filters_similar_memories_by_allowed_prefixes(self, stub_provider, stub_engine):
+        provider = stub_provider([json.dumps([
+            {"action": "ADD", "fact_index": 0}
+        ])])
+        stub_engine.search_results = [
             {"id": 1, "text": "Allowed", "source": "claude-code/proj", "similarity": 0.9},
             {"id": 2, "text": "Blocked", "source": "other/secret", "similarity": 0.95},
         ]
 
         run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "Uses Drizzle ORM", "category": "decision"}],
             source="claude-code/proj",
             allowed_prefixes=["claude-code/*"],
         )
 
-        prompt = mock_provider.complete.call_args[0][1]
+        _, prompt = provider.calls[-1]
         assert "Allowed" in prompt
         assert "Blocked" not in prompt
 
-    def test_audn_returns_artifacts_dict_with_similar_per_fact(self):
+    def test_audn_returns_artifacts_dict_with_similar_per_fact(self, stub_provider, stub_engine):
         """run_audn() always returns audn_artifacts dict with similar_per_fact."""
-        from llm_extract import run_audn
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.return_value = _cr(json.dumps([{"action": "ADD", "fact_index": 0}]))
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = [
+        provider = stub_provider([json.dumps([{"action": "ADD", "fact_index": 0}])])
+        stub_engine.search_results = [
             {"id": 5, "text": "Existing memory", "rrf_score": 0.025, "source": "test/proj"}
         ]
         decisions, tokens, artifacts = run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "New fact", "category": "decision"}],
             source="test/project"
         )
@@ -413,41 +549,31 @@ class TestAUDNCycle:
         assert artifacts["similar_per_fact"][0][0]["id"] == 5
         assert "debug_similar" not in artifacts
 
-    def test_audn_artifacts_includes_debug_similar_when_debug(self):
-        from llm_extract import run_audn
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.return_value = _cr(json.dumps([{"action": "ADD", "fact_index": 0}]))
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = [{"id": 5, "text": "Existing memory", "rrf_score": 0.025}]
+    def test_audn_artifacts_includes_debug_similar_when_debug(self, stub_provider, stub_engine):
+        provider = stub_provider([json.dumps([{"action": "ADD", "fact_index": 0}])])
+        stub_engine.search_results = [{"id": 5, "text": "Existing memory", "rrf_score": 0.025}]
         _, _, artifacts = run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "New fact", "category": "decision"}],
             source="test/project", debug=True,
         )
         assert "debug_similar" in artifacts
         assert 0 in artifacts["debug_similar"]
 
-    def test_audn_ollama_returns_empty_artifacts(self):
-        from llm_extract import run_audn
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = False
-        mock_engine = MagicMock()
-        mock_engine.is_novel.return_value = (True, None)
+    def test_audn_ollama_returns_empty_artifacts(self, stub_provider, stub_engine):
+        provider = stub_provider(supports_audn=False)
+        stub_engine.novel = (True, None)
         _, _, artifacts = run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "New fact", "category": "detail"}],
             source="test/project"
         )
         assert isinstance(artifacts, dict)
         assert artifacts["similar_per_fact"] == {}
 
-    def test_audn_empty_facts_returns_empty_artifacts(self):
-        from llm_extract import run_audn
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
+    def test_audn_empty_facts_returns_empty_artifacts(self, stub_provider, stub_engine):
         decisions, _, artifacts = run_audn(
-            mock_provider, MagicMock(), facts=[], source="test/project"
+            stub_provider(), stub_engine, facts=[], source="test/project"
         )
         assert decisions == []
         assert isinstance(artifacts, dict)
@@ -457,162 +583,251 @@ class TestAUDNCycle:
 class TestExecuteActions:
     """Test execute_actions() function."""
 
-    def test_execute_add(self):
-        from llm_extract import execute_actions
-
-        mock_engine = MagicMock()
-        mock_engine.add_memories.return_value = [100]
-
+    def test_execute_add(self, stub_engine):
         actions = [{"action": "ADD", "fact_index": 0}]
         facts = [{"text": "New fact to store", "category": "decision"}]
 
-        result = execute_actions(mock_engine, actions, facts, source="test/proj")
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
         assert result["stored_count"] == 1
-        mock_engine.add_memories.assert_called_once()
+        add_calls = stub_engine.calls_to("add_memories")
+        assert len(add_calls) == 1
         # Verify API contract: sources must be a list, metadata includes category
-        call_kwargs = mock_engine.add_memories.call_args
-        assert call_kwargs.kwargs.get("metadata_list") == [{"category": "decision"}]
+        _, call_kwargs = add_calls[0]
+        assert call_kwargs["sources"] == ["test/proj"]
+        assert call_kwargs["metadata_list"] == [{"category": "decision"}]
+
+    def test_execute_add_batches_multiple_facts_into_one_call(self, stub_engine):
+        actions = [
+            {"action": "ADD", "fact_index": 0},
+            {"action": "NOOP", "fact_index": 1, "existing_id": 7},
+            {"action": "FALLBACK_ADD", "fact_index": 2},
+        ]
+        facts = [
+            {"text": "Uses Drizzle ORM", "category": "decision"},
+            {"text": "Already known", "category": "detail"},
+            {"text": "Deploys on Fly.io", "category": "detail"},
+        ]
+
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
+
+        add_calls = stub_engine.calls_to("add_memories")
+        assert len(add_calls) == 1
+        _, call_kwargs = add_calls[0]
+        assert call_kwargs["texts"] == ["Uses Drizzle ORM", "Deploys on Fly.io"]
+        assert call_kwargs["sources"] == ["test/proj", "test/proj"]
+        assert [a["action"] for a in result["actions"]] == ["add", "noop", "fallback_add"]
+        assert [a.get("id") for a in result["actions"]] == [100, None, 101]
+        assert result["stored_count"] == 2
+        assert result["fallback_count"] == 1
+
+    def test_execute_add_batch_maps_ids_past_duplicates(self):
+        mock_engine = Mock(spec=_ENGINE_API)
+        mock_engine.stats_light.return_value = {"total_memories": 0}
+        mock_engine.encode_texts.return_value = np.eye(2)
+        # The engine skipped the first fact as a near-duplicate of a stored memory.
+        mock_engine.add_memories.return_value = [201]
+        mock_engine.get_memory.return_value = {"id": 201, "text": "Second fact"}
+
+        actions = [
+            {"action": "ADD", "fact_index": 0},
+            {"action": "ADD", "fact_index": 1},
+            {"action": "ADD", "fact_index": 1},
+        ]
+        facts = [
+            {"text": "First fact", "category": "detail"},
+            {"text": "Second fact", "category": "detail"},
+        ]
 
-    def test_execute_add_passes_category_metadata(self):
-        from llm_extract import execute_actions
+        result = execute_actions(mock_engine, actions, facts, source="test/proj")
 
-        mock_engine = MagicMock()
-        mock_engine.add_memories.return_value = [100]
+        assert mock_engine.add_memories.call_args.kwargs["texts"] == ["First fact", "Second fact"]
+        assert [a["id"] for a in result["actions"]] == [None, 201, None]
+        assert result["stored_count"] == 3
 
+    def test_execute_add_batch_flushes_before_later_writes(self, stub_engine):
+        stub_engine.memories[5] = {"id": 5, "text": "Old", "source": "test/proj"}
+        actions = [
+            {"action": "ADD", "fact_index": 0},
+            {"action": "DELETE", "fact_index": 1, "old_id": 5},
+            {"action": "ADD", "fact_index": 2},
+        ]
+        facts = [
+            {"text": "First fact", "category": "detail"},
+            {"text": "Stale fact", "category": "detail"},
+            {"text": "Second fact", "category": "detail"},
+        ]
+
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
+
+        writes = [(name, kw.get("texts")) for name, _, kw in stub_engine.calls if name in ("add_memories", "delete_memory")]
+        assert writes == [("add_memories", ["First fact"]), ("delete_memory", None), ("add_memories", ["Second fact"])]
+        assert [a["action"] for a in result["actions"]] == ["add", "delete", "add"]
+
+    def test_execute_add_batch_stays_under_backup_threshold(self, stub_engine):
+        actions = [{"action": "ADD", "fact_index": i} for i in range(12)]
+        facts = [{"text": f"Fact number {i}", "category": "detail"} for i in range(12)]
+
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
+
+        assert [len(kw["texts"]) for _, kw in stub_engine.calls_to("add_memories")] == [10, 2]
+        assert result["stored_count"] == 12
+
+    def test_execute_add_batch_failure_isolated_per_fact(self):
+        mock_engine = Mock(spec=_ENGINE_API)
+        mock_engine.stats_light.return_value = {"total_memories": 0}
+        mock_engine.encode_texts.return_value = np.eye(2)
+        mock_engine.add_memories.side_effect = [RuntimeError("embed failed"), RuntimeError("bad fact"), [301]]
+
+        actions = [{"action": "ADD", "fact_index": 0}, {"action": "ADD", "fact_index": 1}]
+        facts = [
+            {"text": "Broken fact", "category": "detail"},
+            {"text": "Good fact", "category": "detail"},
+        ]
+
+        result = execute_actions(mock_engine, actions, facts, source="test/proj")
+
+        assert result["actions"][0] == {"action": "error", "text": "Broken fact", "error": "bad fact"}
+        assert result["actions"][1] == {"action": "add", "text": "Good fact", "id": 301}
+        assert result["stored_count"] == 1
+
+    def test_execute_add_batch_partial_write_not_retried(self):
+        mock_engine = Mock(spec=_ENGINE_API)
+        # One fact landed before the batched call failed.
+        mock_engine.stats_light.side_effect = [{"total_memories": 0}, {"total_memories": 1}]
+        mock_engine.encode_texts.return_value = np.eye(2)
+        mock_engine.add_memories.side_effect = RuntimeError("save failed")
+
+        actions = [{"action": "ADD", "fact_index": 0}, {"action": "ADD", "fact_index": 1}]
+        facts = [
+            {"text": "Stored fact", "category": "detail"},
+            {"text": "Lost fact", "category": "detail"},
+        ]
+
+        result = execute_actions(mock_engine, actions, facts, source="test/proj")
+
+        assert mock_engine.add_memories.call_count == 1
+        assert [a["action"] for a in result["actions"]] == ["error", "error"]
+        assert result["stored_count"] == 0
+
+    def test_execute_add_batch_drops_near_duplicate_facts(self, stub_engine):
+        actions = [
+            {"action": "ADD", "fact_index": 0},
+            {"action": "ADD", "fact_index": 1},
+            {"action": "ADD", "fact_index": 2},
+        ]
+        facts = [
+            {"text": "The team uses PostgreSQL", "category": "decision"},
+            {"text": "Deploys run on Fly.io", "category": "detail"},
+            {"text": "The team uses PostgreSQL.", "category": "detail"},
+        ]
+
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
+
+        (_, call_kwargs), = stub_engine.calls_to("add_memories")
+        assert call_kwargs["texts"] == ["The team uses PostgreSQL", "Deploys run on Fly.io"]
+        assert call_kwargs["metadata_list"] == [{"category": "decision"}, {"category": "detail"}]
+        assert [a["id"] for a in result["actions"]] == [100, 101, None]
+
+    def test_execute_add_passes_category_metadata(self, stub_engine):
         actions = [{"action": "ADD", "fact_index": 0}]
         facts = [{"text": "Bug: Redis timeout at 5s", "category": "learning"}]
 
-        execute_actions(mock_engine, actions, facts, source="test/proj")
-        call_kwargs = mock_engine.add_memories.call_args
-        assert call_kwargs.kwargs.get("metadata_list") == [{"category": "learning"}]
-
-    def test_execute_update_calls_supersede(self):
-        from llm_extract import execute_actions
+        execute_actions(stub_engine, actions, facts, source="test/proj")
+        (_, call_kwargs), = stub_engine.calls_to("add_memories")
+        assert call_kwargs.get("metadata_list") == [{"category": "learning"}]
 
-        mock_engine = MagicMock()
-        mock_engine.get_memory.return_value = {"id": 42, "source": "test", "text": "old"}
-        mock_engine.add_memories.return_value = [101]
-        mock_engine.add_link.return_value = {}
+    def test_execute_update_calls_supersede(self, stub_engine):
+        stub_engine.memories[42] = {"id": 42, "source": "test", "text": "old"}
 
         actions = [{"action": "UPDATE", "fact_index": 0, "old_id": 42, "new_text": "updated text"}]
         facts = [{"text": "original fact", "category": "decision"}]
 
-        result = execute_actions(mock_engine, actions, facts, source="test/proj")
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
         assert result["updated_count"] == 1
         # Old memory is archived, not deleted (version preservation)
-        mock_engine.delete_memory.assert_not_called()
-        mock_engine.update_memory.assert_called_once_with(42, archived=True, metadata_patch={"is_latest": False})
+        assert stub_engine.calls_to("delete_memory") == []
+        assert stub_engine.calls_to("update_memory") == [
+            ((42,), {"archived": True, "metadata_patch": {"is_latest": False}})
+        ]
         # Verify metadata includes category, supersedes, and is_latest
-        call_kwargs = mock_engine.add_memories.call_args
-        assert call_kwargs.kwargs.get("metadata_list") == [{"category": "decision", "supersedes": 42, "is_latest": True}]
+        (_, call_kwargs), = stub_engine.calls_to("add_memories")
+        assert call_kwargs.get("metadata_list") == [{"category": "decision", "supersedes": 42, "is_latest": True}]
         # Verify supersedes link is created
-        mock_engine.add_link.assert_called_once_with(101, 42, "supersedes")
-
-    def test_execute_noop_does_nothing(self):
-        from llm_extract import execute_actions
+        assert stub_engine.calls_to("add_link") == [((100, 42, "supersedes"), {})]
 
-        mock_engine = MagicMock()
+    def test_execute_noop_does_nothing(self, stub_engine):
         actions = [{"action": "NOOP", "fact_index": 0, "existing_id": 30}]
         facts = [{"text": "existing fact", "category": "detail"}]
 
-        result = execute_actions(mock_engine, actions, facts, source="test/proj")
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
         assert result["stored_count"] == 0
         assert result["updated_count"] == 0
-        mock_engine.add_memories.assert_not_called()
+        assert stub_engine.calls == []
 
-    def test_execute_delete(self):
-        from llm_extract import execute_actions
-
-        mock_engine = MagicMock()
+    def test_execute_delete(self, stub_engine):
+        stub_engine.memories[55] = {"id": 55, "source": "test/proj", "text": "old"}
         actions = [{"action": "DELETE", "fact_index": 0, "old_id": 55}]
         facts = [{"text": "contradicted fact", "category": "detail"}]
 
-        result = execute_actions(mock_engine, actions, facts, source="test/proj")
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
         assert result["deleted_count"] == 1
-        mock_engine.delete_memory.assert_called_once_with(55)
-
-    def test_execute_with_out_of_bounds_fact_index(self):
-        from llm_extract import execute_actions
-
-        mock_engine = MagicMock()
-        mock_engine.add_memories.return_value = [100]
+        assert stub_engine.calls_to("delete_memory") == [((55,), {})]
 
+    def test_execute_with_out_of_bounds_fact_index(self, stub_engine):
         actions = [{"action": "ADD", "fact_index": 99}]
         facts = [{"text": "only fact", "category": "detail"}]
 
-        result = execute_actions(mock_engine, actions, facts, source="test/proj")
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
         assert result["stored_count"] == 1
-        call_kwargs = mock_engine.add_memories.call_args
+        (_, call_kwargs), = stub_engine.calls_to("add_memories")
         # Out-of-bounds should use default empty text
-        assert call_kwargs.kwargs.get("texts") == [""]
-
-    def test_execute_update_skips_disallowed_old_id(self):
-        from llm_extract import execute_actions
+        assert call_kwargs.get("texts") == [""]
 
-        mock_engine = MagicMock()
-        mock_engine.get_memory.return_value = {"id": 42, "source": "other/secret", "text": "old"}
+    def test_execute_update_skips_disallowed_old_id(self, stub_engine):
+        stub_engine.memories[42] = {"id": 42, "source": "other/secret", "text": "old"}
         actions = [{"action": "UPDATE", "fact_index": 0, "old_id": 42, "new_text": "updated text"}]
         facts = [{"text": "original fact", "category": "decision"}]
 
         result = execute_actions(
-            mock_engine,
+            stub_engine,
             actions,
             facts,
             source="claude-code/proj",
             allowed_prefixes=["claude-code/*"],
         )
         assert result["updated_count"] == 0
-        mock_engine.delete_memory.assert_not_called()
-        mock_engine.add_memories.assert_not_called()
+        assert stub_engine.calls_to("delete_memory") == []
+        assert stub_engine.calls_to("add_memories") == []
         assert any(a.get("action") == "error" for a in result["actions"])
 
-    def test_execute_delete_skips_disallowed_old_id(self):
-        from llm_extract import execute_actions
-
-        mock_engine = MagicMock()
-        mock_engine.get_memory.return_value = {"id": 55, "source": "other/secret", "text": "old"}
+    def test_execute_delete_skips_disallowed_old_id(self, stub_engine):
+        stub_engine.memories[55] = {"id": 55, "source": "other/secret", "text": "old"}
         actions = [{"action": "DELETE", "fact_index": 0, "old_id": 55}]
         facts = [{"text": "contradicted fact", "category": "detail"}]
 
         result = execute_actions(
-            mock_engine,
+            stub_engine,
             actions,
             facts,
             source="claude-code/proj",
             allowed_prefixes=["claude-code/*"],
         )
         assert result["deleted_count"] == 0
-        mock_engine.delete_memory.assert_not_called()
+        assert stub_engine.calls_to("delete_memory") == []
         assert any(a.get("action") == "error" for a in result["actions"])
 
 
 class TestFullPipeline:
     """Test run_extraction() end-to-end with mocks."""
 
-    def test_full_extraction_pipeline(self):
-        from llm_extract import run_extraction
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.side_effect = [
-            _cr(json.dumps([
-                {"category": "DECISION", "text": "Uses Drizzle ORM"},
-                {"category": "DETAIL", "text": "TypeScript strict mode"},
-            ])),
-            _cr(json.dumps([
-                {"action": "ADD", "fact_index": 0},
-                {"action": "NOOP", "fact_index": 1, "existing_id": 30}
-            ]))
-        ]
-
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = [
+    def test_full_extraction_pipeline(self, stub_provider, stub_engine):
+        provider = stub_provider([_FACTS_PAYLOAD, _AUDN_PAYLOAD])
+        stub_engine.search_results = [
             {"id": 30, "text": "TypeScript strict mode", "similarity": 0.92}
         ]
-        mock_engine.add_memories.return_value = [121]
 
         result = run_extraction(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             messages="User: use drizzle\nAssistant: Done",
             source="test/project",
             context="stop"
@@ -622,28 +837,22 @@ class TestFullPipeline:
         assert result["stored_count"] == 1
         assert len(result["actions"]) == 2
 
-    def test_extraction_disabled_returns_error(self):
-        from llm_extract import run_extraction
-
+    def test_extraction_disabled_returns_error(self, stub_engine):
         result = run_extraction(
             provider=None,
-            engine=MagicMock(),
+            engine=stub_engine,
             messages="some messages",
             source="test",
             context="stop"
         )
         assert result["error"] == "extraction_disabled"
 
-    def test_provider_runtime_failure_returns_error_signal(self):
-        from llm_extract import run_extraction
-
-        mock_provider = MagicMock()
-        mock_provider.complete.side_effect = Exception("429 Too Many Requests")
-        mock_provider.supports_audn = True
+    def test_provider_runtime_failure_returns_error_signal(self, stub_provider, stub_engine):
+        provider = stub_provider(raises=Exception("429 Too Many Requests"))
 
         result = run_extraction(
-            provider=mock_provider,
-            engine=MagicMock(),
+            provider=provider,
+            engine=stub_engine,
             messages="User: capture this decision",
             source="test",
             context="stop",
@@ -654,41 +863,128 @@ class TestFullPipeline:
         assert "429" in result["error_message"]
         assert result["stored_count"] == 0
 
-    def test_source_passed_to_extract_facts(self):
+    def test_source_passed_to_extract_facts(self, stub_provider, stub_engine):
         """Verify run_extraction passes source to extract_facts for prompt formatting."""
-        from llm_extract import run_extraction
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.side_effect = [
-            _cr("[]"),  # extract_facts returns empty
-        ]
+        provider = stub_provider(["[]"])  # extract_facts returns empty
 
         run_extraction(
-            mock_provider, MagicMock(),
+            provider, stub_engine,
             messages="User: test",
             source="claude-code/my-app",
             context="stop"
         )
 
         # The first complete call is extract_facts; check that source was used in prompt
-        system_prompt = mock_provider.complete.call_args_list[0][0][0]
+        system_prompt = provider.calls[0][0]
         assert "my-app" in system_prompt
 
 
+class TestExtractionPipeline:
+    """Test run_extraction_pipeline() over several chunks."""
+
+    def test_pipeline_overlaps_extract_and_audn(self, mock_provider, stub_engine):
+        chunks = ["User: chunk 0", "User: chunk 1", "User: chunk 2"]
+        # Only passes if chunk 1's extraction runs while chunk 0's AUDN is in flight.
+        overlap = threading.Barrier(2, timeout=2.0)
+
+        def complete(system, user):
+            if system.startswith("You are a memory manager"):
+                if '"text":"fact 0"' in user:
+                    overlap.wait()
+                return _cr(json.dumps([{"action": "ADD", "fact_index": 0}]))
+            index = user.rsplit(" ", 1)[-1]
+            if index == "1":
+                overlap.wait()
+            return _cr(json.dumps([{"category": "DETAIL", "text": f"fact {index}"}]))
+
+        mock_provider.complete.side_effect = complete
+
+        result = run_extraction_pipeline(mock_provider, stub_engine, chunks, source="test/project")
+
+        assert mock_provider.complete.call_count == 2 * len(chunks)
+        assert not overlap.broken
+        assert result["extracted_count"] == 3
+        assert result["stored_count"] == 3
+        assert [a["text"] for a in result["actions"]] == ["fact 0", "fact 1", "fact 2"]
+        assert result["tokens"]["extract"] == {"input": 30, "output": 15}
+        assert "errors" not in result
+
+    def test_pipeline_reports_failed_chunks(self, stub_provider, stub_engine):
+        provider = stub_provider([Exception("429 Too Many Requests"), "[]"])
+
+        result = run_extraction_pipeline(
+            provider, stub_engine, ["User: a", "User: b"], source="test/project"
+        )
+
+        assert result["stored_count"] == 0
+        assert result["errors"] == [
+            {"chunk": 0, "error_stage": "extract_facts", "error_message": "429 Too Many Requests"}
+        ]
+
+    def test_pipeline_applies_profile_limits_and_dry_run(self, stub_provider, stub_engine):
+        # Novelty-only AUDN keeps the provider calls in chunk order.
+        provider = stub_provider([
+            json.dumps([{"category": "DETAIL", "text": "fact a"}, {"category": "DETAIL", "text": "fact b"}]),
+            json.dumps([{"category": "DETAIL", "text": "fact c"}]),
+        ], supports_audn=False)
+
+        result = run_extraction_pipeline(
+            provider, stub_engine, ["User: a", "User: b"], source="test/project",
+            profile={"max_facts": 1, "dry_run": True},
+        )
+
+        assert result["dry_run"] is True
+        assert result["extracted_count"] == 2
+        assert [a["fact"]["text"] for a in result["actions"]] == ["fact a", "fact c"]
+        assert stub_engine.calls_to("add_memories") == []
+        assert llm_extract.EXTRACT_MAX_FACTS == EXTRACT_MAX_FACTS
+
+    def test_pipeline_debug_trace_tags_chunks(self, stub_provider, stub_engine):
+        provider = stub_provider([
+            json.dumps([{"category": "DETAIL", "text": "fact a"}]),
+            json.dumps([{"category": "DETAIL", "text": "fact b"}]),
+        ], supports_audn=False)
+
+        result = run_extraction_pipeline(
+            provider, stub_engine, ["User: a", "User: b"], source="test/project", debug=True,
+        )
+
+        trace = result["debug_trace"]
+        assert [f["text"] for f in trace["extracted_facts"]] == ["fact a", "fact b"]
+        assert [d["chunk"] for d in trace["audn_decisions"]] == [0, 1]
+        assert trace["execution_summary"]["added"] == [100, 101]
+
+    def test_pipeline_single_call_profile(self, stub_provider, stub_engine):
+        provider = stub_provider([
+            json.dumps([{"action": "ADD", "text": "fact a", "category": "detail"}]),
+            json.dumps([{"action": "ADD", "text": "fact b", "category": "detail"}]),
+        ])
+
+        result = run_extraction_pipeline(
+            provider, stub_engine, ["User: a", "User: b"], source="test/project",
+            profile={"single_call": True},
+        )
+
+        assert len(provider.calls) == 2
+        assert result["stored_count"] == 2
+        assert result["tokens"] == {"single_call": {"input_tokens": 20, "output_tokens": 10}}
+
+    def test_pipeline_disabled_without_provider(self, stub_engine):
+        result = run_extraction_pipeline(None, stub_engine, ["User: a"], source="test")
+        assert result["error"] == "extraction_disabled"
+
+
 class TestMaintenanceConfig:
     """Test maintenance configuration env vars."""
 
     def test_extract_max_links_zero_allowed(self):
         """EXTRACT_MAX_LINKS=0 must be supported (disables auto-linking)."""
-        from llm_extract import _env_int
         import os
         with patch.dict(os.environ, {"EXTRACT_MAX_LINKS": "0"}):
             val = _env_int("EXTRACT_MAX_LINKS", 3, minimum=0)
         assert val == 0
 
     def test_extract_min_link_score_default(self):
-        from llm_extract import _env_float
         val = _env_float("EXTRACT_MIN_LINK_SCORE", 0.005)
         assert val == 0.005
 
@@ -696,37 +992,29 @@ class TestMaintenanceConfig:
 class TestApplyMaintenance:
     """Test _apply_maintenance() auto-linking and compaction detection."""
 
-    def test_auto_links_created_for_add_action(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
-        mock_engine.add_link.return_value = {"from_id": 100, "to_id": 5, "type": "related_to"}
+    def test_auto_links_created_for_add_action(self, stub_engine):
         decisions = [{"action": "ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "add", "text": "New fact", "id": 100}]}
         audn_artifacts = {"similar_per_fact": {0: [
             {"id": 5, "text": "Similar memory", "rrf_score": 0.025, "source": "test/proj"},
             {"id": 6, "text": "Another memory", "rrf_score": 0.020, "source": "test/proj"},
         ]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts)
         assert len(result["links_created"]) == 2
         assert result["links_created"][0]["from_id"] == 100
         assert result["links_created"][0]["to_id"] == 5
-        mock_engine.add_link.assert_any_call(100, 5, "related_to")
-        mock_engine.add_link.assert_any_call(100, 6, "related_to")
+        assert ((100, 5, "related_to"), {}) in stub_engine.calls_to("add_link")
+        assert ((100, 6, "related_to"), {}) in stub_engine.calls_to("add_link")
 
-    def test_auto_links_created_for_conflict_action(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
-        mock_engine.add_link.return_value = {"from_id": 200, "to_id": 10}
+    def test_auto_links_created_for_conflict_action(self, stub_engine):
         decisions = [{"action": "CONFLICT", "fact_index": 0, "old_id": 10}]
         exec_result = {"actions": [{"action": "conflict", "text": "Conflicting fact", "id": 200, "conflicts_with": 10}]}
         audn_artifacts = {"similar_per_fact": {0: [{"id": 10, "text": "Original", "rrf_score": 0.028, "source": "test/proj"}]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts)
         assert len(result["links_created"]) == 1
-        mock_engine.add_link.assert_called_once_with(200, 10, "related_to")
+        assert stub_engine.calls_to("add_link") == [((200, 10, "related_to"), {})]
 
-    def test_no_links_for_update_delete_noop(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
+    def test_no_links_for_update_delete_noop(self, stub_engine):
         decisions = [
             {"action": "UPDATE", "fact_index": 0, "old_id": 1},
             {"action": "DELETE", "fact_index": 1, "old_id": 2},
@@ -742,40 +1030,31 @@ class TestApplyMaintenance:
             1: [{"id": 11, "rrf_score": 0.020, "source": "t"}],
             2: [{"id": 12, "rrf_score": 0.018, "source": "t"}],
         }}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts)
         assert result["links_created"] == []
-        mock_engine.add_link.assert_not_called()
+        assert stub_engine.calls_to("add_link") == []
 
-    def test_auto_links_created_for_fallback_add_action(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
-        mock_engine.add_link.return_value = {"from_id": 100, "to_id": 5, "type": "related_to"}
+    def test_auto_links_created_for_fallback_add_action(self, stub_engine):
         decisions = [{"action": "FALLBACK_ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "fallback_add", "text": "Fallback fact", "id": 100}]}
         audn_artifacts = {"similar_per_fact": {0: [
             {"id": 5, "text": "Similar memory", "rrf_score": 0.025, "source": "test/proj"},
         ]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts)
         assert len(result["links_created"]) == 1
-        mock_engine.add_link.assert_called_once_with(100, 5, "related_to")
+        assert stub_engine.calls_to("add_link") == [((100, 5, "related_to"), {})]
 
-    def test_max_links_caps_per_memory(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
-        mock_engine.add_link.return_value = {}
+    def test_max_links_caps_per_memory(self, stub_engine):
         decisions = [{"action": "ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "add", "text": "New", "id": 100}]}
         audn_artifacts = {"similar_per_fact": {0: [
             {"id": i, "rrf_score": 0.03 - i * 0.001, "source": "t"} for i in range(10)
         ]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts, max_links=2)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts, max_links=2)
         assert len(result["links_created"]) == 2
-        assert mock_engine.add_link.call_count == 2
+        assert len(stub_engine.calls_to("add_link")) == 2
 
-    def test_min_link_score_filters_weak_matches(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
-        mock_engine.add_link.return_value = {}
+    def test_min_link_score_filters_weak_matches(self, stub_engine):
         decisions = [{"action": "ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "add", "text": "New", "id": 100}]}
         audn_artifacts = {"similar_per_fact": {0: [
@@ -783,23 +1062,19 @@ class TestApplyMaintenance:
             {"id": 6, "rrf_score": 0.003, "source": "t"},
             {"id": 7, "rrf_score": 0.001, "source": "t"},
         ]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts, min_link_score=0.005)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts, min_link_score=0.005)
         assert len(result["links_created"]) == 1
         assert result["links_created"][0]["to_id"] == 5
 
-    def test_max_links_zero_disables_linking(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
+    def test_max_links_zero_disables_linking(self, stub_engine):
         decisions = [{"action": "ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "add", "text": "New", "id": 100}]}
         audn_artifacts = {"similar_per_fact": {0: [{"id": 5, "rrf_score": 0.025, "source": "t"}]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts, max_links=0)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts, max_links=0)
         assert result["links_created"] == []
-        mock_engine.add_link.assert_not_called()
+        assert stub_engine.calls_to("add_link") == []
 
-    def test_error_and_skipped_actions_ignored(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
+    def test_error_and_skipped_actions_ignored(self, stub_engine):
         decisions = [{"action": "ADD", "fact_index": 0}, {"action": "ADD", "fact_index": 1}]
         exec_result = {"actions": [
             {"action": "error", "text": "failed", "error": "some error"},
@@ -809,13 +1084,12 @@ class TestApplyMaintenance:
             0: [{"id": 5, "rrf_score": 0.025, "source": "t"}],
             1: [{"id": 6, "rrf_score": 0.020, "source": "t"}],
         }}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts)
         assert result["links_created"] == []
-        mock_engine.add_link.assert_not_called()
+        assert stub_engine.calls_to("add_link") == []
 
     def test_add_link_value_error_skipped_gracefully(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
+        mock_engine = Mock(spec=_ENGINE_API)
         mock_engine.add_link.side_effect = ValueError("Target memory 5 not found")
         decisions = [{"action": "ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "add", "text": "New", "id": 100}]}
@@ -823,21 +1097,16 @@ class TestApplyMaintenance:
         result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts)
         assert result["links_created"] == []
 
-    def test_empty_similar_per_fact_no_errors(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
+    def test_empty_similar_per_fact_no_errors(self, stub_engine):
         decisions = [{"action": "ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "add", "text": "New", "id": 100}]}
         audn_artifacts = {"similar_per_fact": {}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts)
         assert result["links_created"] == []
         assert result["compaction_candidates"] == []
 
-    def test_two_new_memories_can_link_to_same_target(self):
+    def test_two_new_memories_can_link_to_same_target(self, stub_engine):
         """Per-edge dedup: different new memories MAY both link to same target."""
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
-        mock_engine.add_link.return_value = {}
         decisions = [{"action": "ADD", "fact_index": 0}, {"action": "ADD", "fact_index": 1}]
         exec_result = {"actions": [
             {"action": "add", "text": "Fact A", "id": 100},
@@ -847,28 +1116,24 @@ class TestApplyMaintenance:
             0: [{"id": 5, "rrf_score": 0.025, "source": "t"}],
             1: [{"id": 5, "rrf_score": 0.022, "source": "t"}],
         }}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts)
         assert len(result["links_created"]) == 2
-        assert mock_engine.add_link.call_count == 2
-        mock_engine.add_link.assert_any_call(100, 5, "related_to")
-        mock_engine.add_link.assert_any_call(101, 5, "related_to")
+        assert len(stub_engine.calls_to("add_link")) == 2
+        assert ((100, 5, "related_to"), {}) in stub_engine.calls_to("add_link")
+        assert ((101, 5, "related_to"), {}) in stub_engine.calls_to("add_link")
 
-    def test_deleted_target_skipped_in_auto_linking(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
+    def test_deleted_target_skipped_in_auto_linking(self, stub_engine):
         decisions = [{"action": "DELETE", "fact_index": 0, "old_id": 5}, {"action": "ADD", "fact_index": 1}]
         exec_result = {"actions": [
             {"action": "delete", "old_id": 5},
             {"action": "add", "text": "New", "id": 100},
         ]}
         audn_artifacts = {"similar_per_fact": {1: [{"id": 5, "rrf_score": 0.025, "source": "t"}]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts)
         assert result["links_created"] == []
-        mock_engine.add_link.assert_not_called()
+        assert stub_engine.calls_to("add_link") == []
 
-    def test_compaction_candidate_detected_for_tight_cluster(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
+    def test_compaction_candidate_detected_for_tight_cluster(self, stub_engine):
         decisions = [{"action": "ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "add", "text": "New", "id": 100}]}
         audn_artifacts = {"similar_per_fact": {0: [
@@ -876,7 +1141,7 @@ class TestApplyMaintenance:
             {"id": 6, "rrf_score": 0.024, "source": "learning/proj"},
             {"id": 7, "rrf_score": 0.023, "source": "claude-code/proj"},
         ]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts, max_links=0)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts, max_links=0)
         assert len(result["compaction_candidates"]) == 1
         candidate = result["compaction_candidates"][0]
         assert candidate["fact_index"] == 0
@@ -885,21 +1150,17 @@ class TestApplyMaintenance:
         assert "learning/proj" in candidate["sources"]
         assert "claude-code/proj" in candidate["sources"]
 
-    def test_no_compaction_for_fewer_than_three(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
+    def test_no_compaction_for_fewer_than_three(self, stub_engine):
         decisions = [{"action": "ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "add", "text": "New", "id": 100}]}
         audn_artifacts = {"similar_per_fact": {0: [
             {"id": 5, "rrf_score": 0.025, "source": "t"},
             {"id": 6, "rrf_score": 0.024, "source": "t"},
         ]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts, max_links=0)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts, max_links=0)
         assert result["compaction_candidates"] == []
 
-    def test_no_compaction_for_spread_scores(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
+    def test_no_compaction_for_spread_scores(self, stub_engine):
         decisions = [{"action": "ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "add", "text": "New", "id": 100}]}
         audn_artifacts = {"similar_per_fact": {0: [
@@ -907,12 +1168,10 @@ class TestApplyMaintenance:
             {"id": 6, "rrf_score": 0.020, "source": "t"},
             {"id": 7, "rrf_score": 0.010, "source": "t"},
         ]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts, max_links=0)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts, max_links=0)
         assert result["compaction_candidates"] == []
 
-    def test_same_source_compaction_not_cross_source(self):
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
+    def test_same_source_compaction_not_cross_source(self, stub_engine):
         decisions = [{"action": "ADD", "fact_index": 0}]
         exec_result = {"actions": [{"action": "add", "text": "New", "id": 100}]}
         audn_artifacts = {"similar_per_fact": {0: [
@@ -920,14 +1179,12 @@ class TestApplyMaintenance:
             {"id": 6, "rrf_score": 0.024, "source": "learning/proj"},
             {"id": 7, "rrf_score": 0.023, "source": "learning/proj"},
         ]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts, max_links=0)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts, max_links=0)
         assert len(result["compaction_candidates"]) == 1
         assert result["compaction_candidates"][0]["cross_source"] is False
 
-    def test_compaction_excludes_deleted_memories(self):
+    def test_compaction_excludes_deleted_memories(self, stub_engine):
         """Memories deleted in the same batch should not appear in compaction candidates."""
-        from llm_extract import _apply_maintenance
-        mock_engine = MagicMock()
         decisions = [
             {"action": "DELETE", "fact_index": 0, "old_id": 5},
             {"action": "ADD", "fact_index": 1},
@@ -941,7 +1198,7 @@ class TestApplyMaintenance:
             {"id": 6, "rrf_score": 0.024, "source": "t"},
             {"id": 7, "rrf_score": 0.023, "source": "t"},
         ]}}
-        result = _apply_maintenance(mock_engine, decisions, exec_result, audn_artifacts, max_links=0)
+        result = _apply_maintenance(stub_engine, decisions, exec_result, audn_artifacts, max_links=0)
         # Only 2 non-deleted memories remain — below threshold of 3
         assert result["compaction_candidates"] == []
 
@@ -949,81 +1206,60 @@ class TestApplyMaintenance:
 class TestExtractionMaintenance:
     """Test _apply_maintenance() integration in run_extraction()."""
 
-    def test_run_extraction_includes_maintenance_results(self):
-        from llm_extract import run_extraction
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.side_effect = [
-            _cr(json.dumps([{"category": "DECISION", "text": "Uses Drizzle ORM"}])),
-            _cr(json.dumps([{"action": "ADD", "fact_index": 0}]))
-        ]
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = [
+    def test_run_extraction_includes_maintenance_results(self, stub_provider, stub_engine):
+        provider = stub_provider([
+            json.dumps([{"category": "DECISION", "text": "Uses Drizzle ORM"}]),
+            json.dumps([{"action": "ADD", "fact_index": 0}]),
+        ])
+        stub_engine.search_results = [
             {"id": 30, "text": "Prisma was the old ORM", "rrf_score": 0.022, "source": "test/proj"}
         ]
-        mock_engine.add_memories.return_value = [121]
-        mock_engine.add_link.return_value = {}
         result = run_extraction(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             messages="User: use drizzle\nAssistant: Done",
             source="test/project", context="stop"
         )
         assert "links_created" in result
         assert "compaction_candidates" in result
         assert len(result["links_created"]) == 1
-        assert result["links_created"][0]["from_id"] == 121
+        assert result["links_created"][0]["from_id"] == 100
         assert result["links_created"][0]["to_id"] == 30
-        mock_engine.add_link.assert_called_once_with(121, 30, "related_to")
+        assert stub_engine.calls_to("add_link") == [((100, 30, "related_to"), {})]
 
-    def test_single_call_mode_skips_maintenance(self):
-        from llm_extract import run_extraction
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.return_value = _cr(json.dumps([
+    def test_single_call_mode_skips_maintenance(self, stub_provider, stub_engine):
+        provider = stub_provider([json.dumps([
             {"action": "ADD", "fact_index": 0, "text": "Some fact", "category": "detail"}
-        ]))
-        mock_engine = MagicMock()
-        mock_engine.add_memories.return_value = [100]
+        ])])
         result = run_extraction(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             messages="User: test", source="test/project",
             profile={"single_call": True},
         )
-        mock_engine.add_link.assert_not_called()
-
-    def test_dry_run_skips_maintenance(self):
-        from llm_extract import run_extraction
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.side_effect = [
-            _cr(json.dumps([{"category": "DETAIL", "text": "Some fact"}])),
-            _cr(json.dumps([{"action": "ADD", "fact_index": 0}]))
-        ]
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = []
+        assert stub_engine.calls_to("add_link") == []
+
+    def test_dry_run_skips_maintenance(self, stub_provider, stub_engine):
+        provider = stub_provider([
+            json.dumps([{"category": "DETAIL", "text": "Some fact"}]),
+            json.dumps([{"action": "ADD", "fact_index": 0}]),
+        ])
         result = run_extraction(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             messages="User: test", source="test/project",
             profile={"dry_run": True},
         )
         assert result.get("dry_run") is True
-        mock_engine.add_link.assert_not_called()
+        assert stub_engine.calls_to("add_link") == []
 
-    def test_maintenance_failure_does_not_crash_extraction(self):
+    def test_maintenance_failure_does_not_crash_extraction(self, stub_provider, stub_engine):
         """If _apply_maintenance raises, extraction result is still returned."""
-        from llm_extract import run_extraction
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.side_effect = [
-            _cr(json.dumps([{"category": "DETAIL", "text": "Some fact"}])),
-            _cr(json.dumps([{"action": "ADD", "fact_index": 0}]))
-        ]
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = [{"id": 5, "rrf_score": 0.025, "source": "t"}]
-        mock_engine.add_memories.return_value = [100]
+        provider = stub_provider([
+            json.dumps([{"category": "DETAIL", "text": "Some fact"}]),
+            json.dumps([{"action": "ADD", "fact_index": 0}]),
+        ])
+        stub_engine.search_results = [{"id": 5, "rrf_score": 0.025, "source": "t"}]
         with patch("llm_extract._apply_maintenance", side_effect=RuntimeError("Maintenance crashed")):
             result = run_extraction(
-                mock_provider, mock_engine,
+                provider, stub_engine,
                 messages="User: test", source="test/project",
             )
         assert result["stored_count"] == 1
@@ -1035,19 +1271,12 @@ class TestExtractionMaintenance:
 class TestAUDNFallbackVisibility:
     """Test that AUDN exception fallback produces distinguishable actions."""
 
-    def test_audn_exception_returns_fallback_add_not_plain_add(self):
+    def test_audn_exception_returns_fallback_add_not_plain_add(self, stub_provider, stub_engine):
         """When AUDN LLM call throws, actions should be tagged FALLBACK_ADD."""
-        from llm_extract import run_audn
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.side_effect = RuntimeError("API timeout")
-
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = []
+        provider = stub_provider(raises=RuntimeError("API timeout"))
 
         decisions, tokens, _ = run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "fact one", "category": "detail"},
                    {"text": "fact two", "category": "decision"}],
             source="test/project"
@@ -1057,49 +1286,32 @@ class TestAUDNFallbackVisibility:
             assert d["action"] == "FALLBACK_ADD", \
                 f"Expected FALLBACK_ADD, got {d['action']} — fallback should be distinguishable from real ADD"
 
-    def test_fallback_add_tokens_are_zero(self):
+    def test_fallback_add_tokens_are_zero(self, stub_provider, stub_engine):
         """Fallback path should report zero tokens (no LLM call succeeded)."""
-        from llm_extract import run_audn
-
-        mock_provider = MagicMock()
-        mock_provider.supports_audn = True
-        mock_provider.complete.side_effect = Exception("connection reset")
-
-        mock_engine = MagicMock()
-        mock_engine.hybrid_search.return_value = []
+        provider = stub_provider(raises=Exception("connection reset"))
 
         _, tokens, _ = run_audn(
-            mock_provider, mock_engine,
+            provider, stub_engine,
             facts=[{"text": "a fact", "category": "detail"}],
             source="test/project"
         )
         assert tokens == {"input": 0, "output": 0}
 
-    def test_execute_actions_handles_fallback_add_as_add(self):
+    def test_execute_actions_handles_fallback_add_as_add(self, stub_engine):
         """execute_actions should treat FALLBACK_ADD the same as ADD."""
-        from llm_extract import execute_actions
-
-        mock_engine = MagicMock()
-        mock_engine.add_memories.return_value = [100]
-
         actions = [{"action": "FALLBACK_ADD", "fact_index": 0}]
         facts = [{"text": "Fallback fact", "category": "detail"}]
 
-        result = execute_actions(mock_engine, actions, facts, source="test/proj")
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
         assert result["stored_count"] == 1
-        mock_engine.add_memories.assert_called_once()
+        assert len(stub_engine.calls_to("add_memories")) == 1
 
-    def test_execute_actions_preserves_fallback_add_label(self):
+    def test_execute_actions_preserves_fallback_add_label(self, stub_engine):
         """result_actions should use 'fallback_add' not 'add' for fallback actions."""
-        from llm_extract import execute_actions
-
-        mock_engine = MagicMock()
-        mock_engine.add_memories.return_value = [100]
-
         actions = [{"action": "FALLBACK_ADD", "fact_index": 0}]
         facts = [{"text": "Fallback fact", "category": "detail"}]
 
-        result = execute_actions(mock_engine, actions, facts, source="test/proj")
+        result = execute_actions(stub_engine, actions, facts, source="test/proj")
         assert result["actions"][0]["action"] == "fallback_add", \
             "FALLBACK_ADD should be preserved in result_actions for metrics visibility"
 
@@ -1109,16 +1321,12 @@ class TestAUDNPromptDeleteSemantics:
 
     def test_delete_definition_mentions_no_replacement(self):
         """DELETE should be defined as 'no longer true AND no replacement exists'."""
-        from llm_extract import AUDN_PROMPT
-
         delete_section = _extract_action_definition(AUDN_PROMPT, "DELETE")
         assert "no replacement" in delete_section.lower() or "no successor" in delete_section.lower(), \
             f"DELETE definition should mention 'no replacement' to distinguish from UPDATE. Got: {delete_section}"
 
     def test_delete_definition_not_same_as_update(self):
         """DELETE and UPDATE must have clearly different trigger conditions."""
-        from llm_extract import AUDN_PROMPT
-
         delete_def = _extract_action_definition(AUDN_PROMPT, "DELETE")
         update_def = _extract_action_definition(AUDN_PROMPT, "UPDATE")
 
@@ -1131,8 +1339,6 @@ class TestAUDNPromptDeleteSemantics:
 
     def test_delete_has_concrete_example(self):
         """DELETE definition should include a concrete example."""
-        from llm_extract import AUDN_PROMPT
-
         delete_section = _extract_action_definition(AUDN_PROMPT, "DELETE")
         assert "e.g." in delete_section.lower() or "example" in delete_section.lower(), \
             f"DELETE definition should include an example. Got: {delete_section}"
@@ -1142,7 +1348,6 @@ class TestTrainingDataCollection:
     """Test _save_training_pair() passive data collection."""
 
     def test_saves_jsonl_when_dir_set(self, tmp_path):
-        import llm_extract
         orig = llm_extract.TRAINING_DATA_DIR
         llm_extract.TRAINING_DATA_DIR = str(tmp_path)
         try:
@@ -1168,7 +1373,6 @@ class TestTrainingDataCollection:
             llm_extract.TRAINING_DATA_DIR = orig
 
     def test_saves_audn_payload_when_provided(self, tmp_path):
-        import llm_extract
         orig = llm_extract.TRAINING_DATA_DIR
         llm_extract.TRAINING_DATA_DIR = str(tmp_path)
         try:
@@ -1198,7 +1402,6 @@ class TestTrainingDataCollection:
             llm_extract.TRAINING_DATA_DIR = orig
 
     def test_noop_when_dir_not_set(self, tmp_path):
-        import llm_extract
         orig = llm_extract.TRAINING_DATA_DIR
         llm_extract.TRAINING_DATA_DIR = ""
         try:
@@ -1209,7 +1412,6 @@ class TestTrainingDataCollection:
             llm_extract.TRAINING_DATA_DIR = orig
 
     def test_appends_multiple_records(self, tmp_path):
-        import llm_extract
         orig = llm_extract.TRAINING_DATA_DIR
         llm_extract.TRAINING_DATA_DIR = str(tmp_path)
         try:
@@ -1223,7 +1425,6 @@ class TestTrainingDataCollection:
             llm_extract.TRAINING_DATA_DIR = orig
 
     def test_never_raises_on_bad_dir(self):
-        import llm_extract
         orig = llm_extract.TRAINING_DATA_DIR
         llm_extract.TRAINING_DATA_DIR = "/nonexistent/readonly/path"
         try:
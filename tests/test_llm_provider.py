@@ -1,344 +1,357 @@
 """Tests for llm_provider module."""
-import os
 import pytest
 import json
 import time
-from unittest.mock import patch, MagicMock, PropertyMock
+import types
+from unittest.mock import patch, MagicMock
+
+from llm_provider import (
+    AnthropicProvider,
+    ChatGPTSubscriptionProvider,
+    OpenAIProvider,
+    _is_oauth_token,
+    _OAuthState,
+    get_provider,
+)
+
+
+# Pre-encoded response bodies.
+_OLLAMA_OK = b'{"response":"test output"}'
+_OLLAMA_TEST = b'{"response":"test"}'
+_REFRESH_OK = b'{"access_token":"new-access","refresh_token":"new-refresh","expires_in":3600}'
+_REFRESH_ROTATED = b'{"access_token":"refreshed-token","refresh_token":"new-refresh","expires_in":3600}'
+
+
+class _FakeResp:
+    """Canned HTTP response for both urlopen (read/status) and httpx (json/status_code)."""
+
+    def __init__(self, body=b"", status=200):
+        self._body, self.status = body, status
+
+    @property
+    def status_code(self):
+        return self.status
+
+    def read(self):
+        return self._body
+
+    def json(self):
+        return json.loads(self._body)
+
+    def raise_for_status(self):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture(autouse=True)
+def _fresh_provider_cache():
+    """get_provider() memoizes by env; tests swap SDK mocks under the same env."""
+    get_provider.cache_clear()
+    yield
+    get_provider.cache_clear()
+
+
+@pytest.fixture
+def ollama_env(clean_auth_env):
+    clean_auth_env.setenv("EXTRACT_PROVIDER", "ollama")
+    return clean_auth_env
+
+
+@pytest.fixture
+def patched_urlopen():
+    """llm_provider's urlopen (used by the OAuth refresh) replaced with a mock."""
+    with patch("llm_provider.urllib.request.urlopen") as mock_urlopen:
+        yield mock_urlopen
+
+
+@pytest.fixture(scope="class")
+def _stub_sdk_modules():
+    """Install lightweight anthropic/openai/httpx stand-ins once per test class."""
+    stubs = {name: types.ModuleType(name) for name in ("anthropic", "openai", "httpx")}
+    stubs["anthropic"].Anthropic = MagicMock()
+    stubs["openai"].OpenAI = MagicMock()
+    # Enough httpx surface for _make_oauth_httpx_client to subclass and build.
+    stubs["httpx"].BaseTransport = stubs["httpx"].Request = stubs["httpx"].Response = object
+    stubs["httpx"].HTTPTransport = MagicMock()
+    stubs["httpx"].Client = MagicMock()
+    with patch.dict("sys.modules", stubs):
+        yield stubs
+
+
+@pytest.fixture(scope="module")
+def chatgpt_provider():
+    """ChatGPTSubscriptionProvider built once against a stub openai SDK and token exchange."""
+    openai_stub = types.ModuleType("openai")
+    openai_stub.OpenAI = MagicMock()
+    tokens = {"id_token": "id", "refresh_token": "rt", "expires_in": 3600}
+    with patch.dict("sys.modules", {"openai": openai_stub}), \
+         patch("llm_provider.refresh_tokens", return_value=tokens), \
+         patch("llm_provider.exchange_id_token_for_api_key", return_value="sk-k"):
+        return ChatGPTSubscriptionProvider(refresh_token="rt", client_id="cid")
+
+
+@pytest.fixture
+def sdk_stubs(_stub_sdk_modules):
+    """The class's SDK stubs with call history cleared for this test."""
+    for name, attr in (("anthropic", "Anthropic"), ("openai", "OpenAI"), ("httpx", "Client")):
+        getattr(_stub_sdk_modules[name], attr).reset_mock(return_value=True, side_effect=True)
+    return _stub_sdk_modules
 
 
 class TestProviderFactory:
     """Test get_provider() factory function."""
 
-    def test_returns_none_when_no_provider_set(self):
-        with patch.dict(os.environ, {}, clear=True):
-            from llm_provider import get_provider
-            assert get_provider() is None
-
-    def test_returns_none_for_empty_provider(self):
-        with patch.dict(os.environ, {"EXTRACT_PROVIDER": ""}):
-            from llm_provider import get_provider
-            assert get_provider() is None
-
-    def test_raises_for_unknown_provider(self):
-        with patch.dict(os.environ, {"EXTRACT_PROVIDER": "unknown"}):
-            from llm_provider import get_provider
-            with pytest.raises(ValueError, match="Unknown.*unknown"):
-                get_provider()
-
-    def test_anthropic_provider_requires_key(self):
-        env = {"EXTRACT_PROVIDER": "anthropic"}
-        with patch.dict(os.environ, env, clear=True):
-            from llm_provider import get_provider
-            with pytest.raises(ValueError, match="ANTHROPIC_API_KEY"):
-                get_provider()
-
-    def test_openai_provider_requires_key(self):
-        env = {"EXTRACT_PROVIDER": "openai"}
-        with patch.dict(os.environ, env, clear=True):
-            from llm_provider import get_provider
-            with pytest.raises(ValueError, match="OPENAI_API_KEY"):
-                get_provider()
-
-    def test_ollama_provider_no_key_needed(self):
-        env = {"EXTRACT_PROVIDER": "ollama"}
-        with patch.dict(os.environ, env, clear=True):
-            from llm_provider import get_provider
-            provider = get_provider()
-            assert provider is not None
-            assert provider.provider_name == "ollama"
-            assert provider.supports_audn is True
+    def test_returns_none_when_no_provider_set(self, clean_auth_env):
+        assert get_provider() is None
+
+    def test_returns_none_for_empty_provider(self, clean_auth_env):
+        clean_auth_env.setenv("EXTRACT_PROVIDER", "")
+        assert get_provider() is None
+
+    def test_raises_for_unknown_provider(self, clean_auth_env):
+        clean_auth_env.setenv("EXTRACT_PROVIDER", "unknown")
+        with pytest.raises(ValueError, match="Unknown.*unknown"):
+            get_provider()
+
+    def test_anthropic_provider_requires_key(self, clean_auth_env):
+        clean_auth_env.setenv("EXTRACT_PROVIDER", "anthropic")
+        with pytest.raises(ValueError, match="ANTHROPIC_API_KEY"):
+            get_provider()
+
+    def test_openai_provider_requires_key(self, clean_auth_env):
+        clean_auth_env.setenv("EXTRACT_PROVIDER", "openai")
+        with pytest.raises(ValueError, match="OPENAI_API_KEY"):
+            get_provider()
+
+    def test_ollama_provider_no_key_needed(self, ollama_env):
+        provider = get_provider()
+        assert provider is not None
+        assert provider.provider_name == "ollama"
+        assert provider.supports_audn is True
+
+    def test_get_provider_caches_across_calls(self, ollama_env):
+        first = get_provider()
+        assert get_provider() is first
 
+        ollama_env.setenv("EXTRACT_MODEL", "llama3:8b")
+        assert get_provider() is not first
+        assert get_provider().model == "llama3:8b"
 
+        get_provider.cache_clear()
+        ollama_env.delenv("EXTRACT_MODEL")
+        assert get_provider() is not first
+
+
+@pytest.mark.usefixtures("_stub_sdk_modules")
 class TestAnthropicOAuth:
     """Test Anthropic OAuth subscription token support."""
 
-    def test_standard_key_no_oauth(self):
+    def test_standard_key_no_oauth(self, sdk_stubs, clean_auth_env):
         """Standard API key should not create OAuth state."""
-        env = {"EXTRACT_PROVIDER": "anthropic", "ANTHROPIC_API_KEY": "sk-ant-api03-fake"}
-        with patch.dict(os.environ, env):
-            mock_anthropic = MagicMock()
-            with patch.dict("sys.modules", {"anthropic": mock_anthropic}):
-                from llm_provider import get_provider
-                provider = get_provider()
-                assert provider._oauth is None
-                mock_anthropic.Anthropic.assert_called_once_with(api_key="sk-ant-api03-fake")
-
-    def test_oauth_token_creates_oauth_state(self):
+        clean_auth_env.setenv("EXTRACT_PROVIDER", "anthropic")
+        clean_auth_env.setenv("ANTHROPIC_API_KEY", "sk-ant-api03-fake")
+        provider = get_provider()
+        assert provider._oauth is None
+        sdk_stubs["anthropic"].Anthropic.assert_called_once_with(api_key="sk-ant-api03-fake")
+
+    def test_oauth_token_creates_oauth_state(self, sdk_stubs, clean_auth_env):
         """OAuth token (sk-ant-oat01-) should use custom transport and create OAuth state."""
-        env = {"EXTRACT_PROVIDER": "anthropic", "ANTHROPIC_API_KEY": "sk-ant-oat01-faketoken"}
-        with patch.dict(os.environ, env):
-            mock_anthropic = MagicMock()
-            with patch.dict("sys.modules", {"anthropic": mock_anthropic, "httpx": MagicMock()}):
-                from llm_provider import get_provider
-                provider = get_provider()
-                assert provider._oauth is not None
-                assert provider._oauth.access_token == "sk-ant-oat01-faketoken"
-                call_kwargs = mock_anthropic.Anthropic.call_args
-                assert call_kwargs.kwargs.get("api_key") == "placeholder"
-                assert "http_client" in call_kwargs.kwargs
+        clean_auth_env.setenv("EXTRACT_PROVIDER", "anthropic")
+        clean_auth_env.setenv("ANTHROPIC_API_KEY", "sk-ant-oat01-faketoken")
+        provider = get_provider()
+        assert provider._oauth is not None
+        assert provider._oauth.access_token == "sk-ant-oat01-faketoken"
+        call_kwargs = sdk_stubs["anthropic"].Anthropic.call_args
+        assert call_kwargs.kwargs.get("api_key") == "placeholder"
+        assert "http_client" in call_kwargs.kwargs
 
     def test_oauth_token_detection(self):
         """Verify the OAuth token detection helper."""
-        from llm_provider import _is_oauth_token
         assert _is_oauth_token("sk-ant-oat01-abc123") is True
         assert _is_oauth_token("sk-ant-api03-abc123") is False
         assert _is_oauth_token("") is False
 
     def test_oauth_state_not_expired_initially(self):
         """Fresh OAuth state with no expiry should not be expired."""
-        from llm_provider import _OAuthState
         state = _OAuthState(access_token="test-token")
         assert state.is_expired() is False
 
     def test_oauth_state_expired_when_past_deadline(self):
         """OAuth state should report expired when past expires_at."""
-        from llm_provider import _OAuthState
         state = _OAuthState(access_token="test-token")
         state.expires_at = time.time() - 10  # 10 seconds ago
         assert state.is_expired() is True
 
-    def test_oauth_refresh_updates_tokens(self):
-        """Successful refresh should update access_token, refresh_token, and expires_at."""
-        from llm_provider import _OAuthState
+    @pytest.mark.parametrize("body,new_access,new_refresh", [
+        (_REFRESH_OK, "new-access", "new-refresh"),
+        (_REFRESH_ROTATED, "refreshed-token", "new-refresh"),
+    ])
+    def test_oauth_refresh_updates_tokens(self, body, new_access, new_refresh, patched_urlopen):
+        """Successful refresh should update access_token, refresh_token, and expires_at.
+
+        The transport reads state.access_token directly, so it picks up the
+        refreshed token without being rebuilt.
+        """
         state = _OAuthState(access_token="old-token")
         state.refresh_token = "old-refresh"
         state.expires_at = time.time() - 10  # expired
+        assert state.is_expired() is True
 
-        refresh_response = json.dumps({
-            "access_token": "new-access",
-            "refresh_token": "new-refresh",
-            "expires_in": 3600,
-        }).encode()
-
-        mock_resp = MagicMock()
-        mock_resp.read.return_value = refresh_response
-        mock_resp.__enter__ = MagicMock(return_value=mock_resp)
-        mock_resp.__exit__ = MagicMock(return_value=False)
-
-        with patch("llm_provider.urllib.request.urlopen", return_value=mock_resp):
-            result = state.refresh()
+        patched_urlopen.return_value = _FakeResp(body)
+        result = state.refresh()
 
         assert result is True
-        assert state.access_token == "new-access"
-        assert state.refresh_token == "new-refresh"
+        assert state.access_token == new_access
+        assert state.refresh_token == new_refresh
         assert state.expires_at > time.time()
 
-    def test_oauth_refresh_fails_without_refresh_token(self):
+    def test_oauth_refresh_fails_without_refresh_token(self, patched_urlopen):
         """Refresh should fail gracefully when no refresh_token is set."""
-        from llm_provider import _OAuthState
         state = _OAuthState(access_token="test-token")
         assert state.refresh() is False
+        patched_urlopen.assert_not_called()
 
-    def test_oauth_refresh_handles_network_error(self):
+    def test_oauth_refresh_handles_network_error(self, patched_urlopen):
         """Refresh should return False on network error."""
-        from llm_provider import _OAuthState
         state = _OAuthState(access_token="test-token")
         state.refresh_token = "some-refresh"
 
-        with patch("llm_provider.urllib.request.urlopen", side_effect=Exception("network error")):
-            result = state.refresh()
+        patched_urlopen.side_effect = Exception("network error")
+        result = state.refresh()
 
         assert result is False
 
-    def test_oauth_state_refresh_updates_access_token_used_by_transport(self):
-        """When OAuth token expires, refresh should update access_token in state."""
-        from llm_provider import _OAuthState
-        state = _OAuthState(access_token="old-token")
-        state.refresh_token = "refresh-token"
-        state.expires_at = time.time() - 10  # expired
-
-        refresh_response = json.dumps({
-            "access_token": "refreshed-token",
-            "refresh_token": "new-refresh",
-            "expires_in": 3600,
-        }).encode()
-
-        mock_resp = MagicMock()
-        mock_resp.read.return_value = refresh_response
-        mock_resp.__enter__ = MagicMock(return_value=mock_resp)
-        mock_resp.__exit__ = MagicMock(return_value=False)
-
-        with patch("llm_provider.urllib.request.urlopen", return_value=mock_resp):
-            assert state.is_expired() is True
-            result = state.refresh()
-
-        assert result is True
-        assert state.access_token == "refreshed-token"
-        # Transport reads state.access_token directly, so it will use the refreshed token
-
-    def test_anthropic_complete_sets_temperature_zero(self):
+    def test_anthropic_complete_sets_temperature_zero(self, sdk_stubs):
         """Anthropic completions should be deterministic for evals and extraction."""
-        from llm_provider import AnthropicProvider
-
-        mock_anthropic = MagicMock()
+        create = sdk_stubs["anthropic"].Anthropic.return_value.messages.create
         mock_response = MagicMock()
         mock_response.content = [MagicMock(text='{"score": 1.0, "reasoning": "ok"}')]
         mock_response.usage = MagicMock(input_tokens=10, output_tokens=5)
-        mock_anthropic.Anthropic.return_value.messages.create.return_value = mock_response
+        create.return_value = mock_response
 
-        with patch.dict("sys.modules", {"anthropic": mock_anthropic}):
-            provider = AnthropicProvider(api_key="sk-ant-api03-fake")
-            provider.complete("sys", "usr")
+        provider = AnthropicProvider(api_key="sk-ant-api03-fake")
+        provider.complete("sys", "usr")
 
-        call = mock_anthropic.Anthropic.return_value.messages.create.call_args
-        assert call.kwargs["temperature"] == 0.0
+        assert create.call_args.kwargs["temperature"] == 0.0
 
 
 class TestOllamaProvider:
     """Test OllamaProvider without network calls."""
 
-    def test_default_model(self):
-        with patch.dict(os.environ, {"EXTRACT_PROVIDER": "ollama"}):
-            from llm_provider import get_provider
-            provider = get_provider()
-            assert provider.model == "gemma3:4b"
+    def test_default_model(self, ollama_provider):
+        assert ollama_provider.model == "gemma3:4b"
 
-    def test_custom_model(self):
-        env = {"EXTRACT_PROVIDER": "ollama", "EXTRACT_MODEL": "llama3:8b"}
-        with patch.dict(os.environ, env):
-            from llm_provider import get_provider
-            provider = get_provider()
-            assert provider.model == "llama3:8b"
+    def test_custom_model(self, ollama_env):
+        ollama_env.setenv("EXTRACT_MODEL", "llama3:8b")
+        provider = get_provider()
+        assert provider.model == "llama3:8b"
 
-    def test_custom_url(self):
-        env = {"EXTRACT_PROVIDER": "ollama", "OLLAMA_URL": "http://myhost:11434"}
-        with patch.dict(os.environ, env):
-            from llm_provider import get_provider
-            provider = get_provider()
-            assert "myhost" in provider.base_url
+    def test_custom_url(self, ollama_env):
+        ollama_env.setenv("OLLAMA_URL", "http://myhost:11434")
+        provider = get_provider()
+        assert "myhost" in provider.base_url
 
-    def test_complete_calls_ollama_api(self):
-        env = {"EXTRACT_PROVIDER": "ollama"}
-        with patch.dict(os.environ, env):
-            from llm_provider import get_provider
-            provider = get_provider()
+    def test_complete_calls_ollama_api(self, ollama_provider):
+        mock_resp = _FakeResp(_OLLAMA_OK)
 
-            mock_resp = MagicMock()
-            mock_resp.read.return_value = json.dumps({"response": "test output"}).encode()
-            mock_resp.__enter__ = MagicMock(return_value=mock_resp)
-            mock_resp.__exit__ = MagicMock(return_value=False)
+        with patch.object(ollama_provider._client, "post", return_value=mock_resp) as mock_post:
+            result = ollama_provider.complete("system prompt", "user prompt")
+            assert result.text == "test output"
+            mock_post.assert_called_once()
+            assert mock_post.call_args[0][0] == "/api/generate"
 
-            with patch("llm_provider.urllib.request.urlopen", return_value=mock_resp) as mock_urlopen:
-                result = provider.complete("system prompt", "user prompt")
-                assert result.text == "test output"
-                mock_urlopen.assert_called_once()
+    def test_complete_reuses_pooled_client(self, ollama_provider):
+        client = ollama_provider._client
 
-    def test_health_check(self):
-        env = {"EXTRACT_PROVIDER": "ollama"}
-        with patch.dict(os.environ, env):
-            from llm_provider import get_provider
-            provider = get_provider()
+        mock_resp = _FakeResp(_OLLAMA_OK)
 
-            mock_resp = MagicMock()
-            mock_resp.status = 200
-            mock_resp.__enter__ = MagicMock(return_value=mock_resp)
-            mock_resp.__exit__ = MagicMock(return_value=False)
+        with patch.object(client, "post", return_value=mock_resp) as mock_post:
+            ollama_provider.complete("system", "first")
+            ollama_provider.complete("system", "second")
+            assert mock_post.call_count == 2
+        assert ollama_provider._client is client
 
-            with patch("llm_provider.urllib.request.urlopen", return_value=mock_resp):
-                assert provider.health_check() is True
+    def test_health_check(self, ollama_provider):
+        mock_resp = _FakeResp(status=200)
 
-    def test_health_check_failure(self):
-        env = {"EXTRACT_PROVIDER": "ollama"}
-        with patch.dict(os.environ, env):
-            from llm_provider import get_provider
-            provider = get_provider()
+        with patch.object(ollama_provider._client, "get", return_value=mock_resp):
+            assert ollama_provider.health_check() is True
 
-            with patch("llm_provider.urllib.request.urlopen", side_effect=Exception("conn refused")):
-                assert provider.health_check() is False
+    def test_health_check_failure(self, ollama_provider):
+        with patch.object(ollama_provider._client, "get", side_effect=Exception("conn refused")):
+            assert ollama_provider.health_check() is False
 
-    def test_ollama_supports_audn(self):
-        env = {"EXTRACT_PROVIDER": "ollama"}
-        with patch.dict(os.environ, env):
-            from llm_provider import get_provider
-            provider = get_provider()
-            assert provider.supports_audn is True
+    def test_ollama_supports_audn(self, ollama_provider):
+        assert ollama_provider.supports_audn is True
 
-    def test_ollama_complete_sends_correct_payload(self):
+    def test_ollama_complete_sends_correct_payload(self, ollama_provider):
         """No format:'json' (breaks array extraction), think:false for thinking models."""
-        env = {"EXTRACT_PROVIDER": "ollama"}
-        with patch.dict(os.environ, env):
-            from llm_provider import get_provider
-            provider = get_provider()
-
-            mock_resp = MagicMock()
-            mock_resp.read.return_value = json.dumps({"response": "test"}).encode()
-            mock_resp.__enter__ = MagicMock(return_value=mock_resp)
-            mock_resp.__exit__ = MagicMock(return_value=False)
+        mock_resp = _FakeResp(_OLLAMA_TEST)
 
-            with patch("llm_provider.urllib.request.urlopen", return_value=mock_resp) as mock_urlopen:
-                provider.complete("system", "user")
-                call_args = mock_urlopen.call_args
-                request_obj = call_args[0][0]
-                body = json.loads(request_obj.data)
-                assert "format" not in body
-                assert body.get("think") is False
-                assert body.get("options", {}).get("temperature") == 0.0
+        with patch.object(ollama_provider._client, "post", return_value=mock_resp) as mock_post:
+            ollama_provider.complete("system", "user")
+            body = json.loads(mock_post.call_args.kwargs["content"])
+            assert "format" not in body
+            assert body.get("think") is False
+            assert body.get("options", {}).get("temperature") == 0.0
 
 
 class TestProviderInterface:
     """Test that all providers expose the same interface."""
 
-    def test_ollama_has_required_attrs(self):
-        env = {"EXTRACT_PROVIDER": "ollama"}
-        with patch.dict(os.environ, env):
-            from llm_provider import get_provider
-            provider = get_provider()
-            assert hasattr(provider, "complete")
-            assert hasattr(provider, "health_check")
-            assert hasattr(provider, "provider_name")
-            assert hasattr(provider, "model")
-            assert hasattr(provider, "supports_audn")
+    @pytest.mark.parametrize("provider_fixture", ["ollama_provider", "chatgpt_provider"])
+    def test_provider_interface(self, provider_fixture, request):
+        provider = request.getfixturevalue(provider_fixture)
+        for attr in ("complete", "health_check", "provider_name", "model", "supports_audn"):
+            assert hasattr(provider, attr)
 
 
+@pytest.mark.usefixtures("_stub_sdk_modules")
 class TestChatGPTSubscriptionProvider:
     """Test ChatGPTSubscriptionProvider OAuth token exchange + OpenAI SDK."""
 
-    def test_factory_creates_chatgpt_subscription_provider(self):
-        env = {
-            "EXTRACT_PROVIDER": "chatgpt-subscription",
-            "CHATGPT_REFRESH_TOKEN": "fake-refresh-token",
-            "CHATGPT_CLIENT_ID": "fake-client-id",
+    def test_factory_creates_chatgpt_subscription_provider(self, clean_auth_env):
+        clean_auth_env.setenv("EXTRACT_PROVIDER", "chatgpt-subscription")
+        clean_auth_env.setenv("CHATGPT_REFRESH_TOKEN", "fake-refresh-token")
+        clean_auth_env.setenv("CHATGPT_CLIENT_ID", "fake-client-id")
+        mock_tokens = {
+            "id_token": "fake-id",
+            "refresh_token": "new-refresh",
+            "expires_in": 3600,
         }
-        with patch.dict(os.environ, env, clear=True):
-            mock_tokens = {
-                "id_token": "fake-id",
-                "refresh_token": "new-refresh",
-                "expires_in": 3600,
-            }
-            with patch("llm_provider.refresh_tokens", return_value=mock_tokens), \
-                 patch("llm_provider.exchange_id_token_for_api_key", return_value="sk-fake-key"), \
-                 patch.dict("sys.modules", {"openai": MagicMock()}):
-                from llm_provider import get_provider
-                provider = get_provider()
-                assert provider is not None
-                assert provider.provider_name == "chatgpt-subscription"
-                assert provider.supports_audn is True
-
-    def test_requires_refresh_token(self):
-        env = {"EXTRACT_PROVIDER": "chatgpt-subscription", "CHATGPT_CLIENT_ID": "cid"}
-        with patch.dict(os.environ, env, clear=True):
-            from llm_provider import get_provider
-            with pytest.raises(ValueError, match="CHATGPT_REFRESH_TOKEN"):
-                get_provider()
-
-    def test_requires_client_id(self):
-        env = {"EXTRACT_PROVIDER": "chatgpt-subscription", "CHATGPT_REFRESH_TOKEN": "rt"}
-        with patch.dict(os.environ, env, clear=True):
-            from llm_provider import get_provider
-            with pytest.raises(ValueError, match="CHATGPT_CLIENT_ID"):
-                get_provider()
-
-    def test_complete_refreshes_expired_key(self):
+        with patch("llm_provider.refresh_tokens", return_value=mock_tokens), \
+             patch("llm_provider.exchange_id_token_for_api_key", return_value="sk-fake-key"):
+            provider = get_provider()
+            assert provider is not None
+            assert provider.provider_name == "chatgpt-subscription"
+            assert provider.supports_audn is True
+
+    def test_requires_refresh_token(self, clean_auth_env):
+        clean_auth_env.setenv("EXTRACT_PROVIDER", "chatgpt-subscription")
+        clean_auth_env.setenv("CHATGPT_CLIENT_ID", "cid")
+        with pytest.raises(ValueError, match="CHATGPT_REFRESH_TOKEN"):
+            get_provider()
+
+    def test_requires_client_id(self, clean_auth_env):
+        clean_auth_env.setenv("EXTRACT_PROVIDER", "chatgpt-subscription")
+        clean_auth_env.setenv("CHATGPT_REFRESH_TOKEN", "rt")
+        with pytest.raises(ValueError, match="CHATGPT_CLIENT_ID"):
+            get_provider()
+
+    def test_complete_refreshes_expired_key(self, sdk_stubs):
         """When API key is expired, complete() should refresh before calling OpenAI."""
-        from llm_provider import ChatGPTSubscriptionProvider
-        mock_openai = MagicMock()
+        create = sdk_stubs["openai"].OpenAI.return_value.chat.completions.create
         mock_response = MagicMock()
         mock_response.choices = [MagicMock()]
         mock_response.choices[0].message.content = "test response"
-        mock_openai.OpenAI.return_value.chat.completions.create.return_value = mock_response
+        create.return_value = mock_response
 
-        with patch.dict("sys.modules", {"openai": mock_openai}), \
-             patch("llm_provider.refresh_tokens", return_value={
+        with patch("llm_provider.refresh_tokens", return_value={
                  "id_token": "new-id", "refresh_token": "new-rt", "expires_in": 3600,
              }) as mock_refresh, \
              patch("llm_provider.exchange_id_token_for_api_key", return_value="sk-new"):
@@ -351,25 +364,13 @@ class TestChatGPTSubscriptionProvider:
             assert result.text == "test response"
             # Should have refreshed (init + expiry refresh = 2 calls)
             assert mock_refresh.call_count == 2
-            call = mock_openai.OpenAI.return_value.chat.completions.create.call_args
-            assert call.kwargs["temperature"] == 0.0
+            assert create.call_args.kwargs["temperature"] == 0.0
 
-    def test_default_model(self):
-        from llm_provider import ChatGPTSubscriptionProvider
-        mock_openai = MagicMock()
-        with patch.dict("sys.modules", {"openai": mock_openai}), \
-             patch("llm_provider.refresh_tokens", return_value={
-                 "id_token": "id", "refresh_token": "rt", "expires_in": 3600,
-             }), \
-             patch("llm_provider.exchange_id_token_for_api_key", return_value="sk-k"):
-            provider = ChatGPTSubscriptionProvider(refresh_token="rt", client_id="cid")
-            assert provider.model == "gpt-4.1-nano"
+    def test_default_model(self, chatgpt_provider):
+        assert chatgpt_provider.model == "gpt-4.1-nano"
 
     def test_custom_model(self):
-        from llm_provider import ChatGPTSubscriptionProvider
-        mock_openai = MagicMock()
-        with patch.dict("sys.modules", {"openai": mock_openai}), \
-             patch("llm_provider.refresh_tokens", return_value={
+        with patch("llm_provider.refresh_tokens", return_value={
                  "id_token": "id", "refresh_token": "rt", "expires_in": 3600,
              }), \
              patch("llm_provider.exchange_id_token_for_api_key", return_value="sk-k"):
@@ -378,27 +379,11 @@ class TestChatGPTSubscriptionProvider:
             )
             assert provider.model == "gpt-4o"
 
-    def test_has_required_interface(self):
-        from llm_provider import ChatGPTSubscriptionProvider
-        mock_openai = MagicMock()
-        with patch.dict("sys.modules", {"openai": mock_openai}), \
-             patch("llm_provider.refresh_tokens", return_value={
-                 "id_token": "id", "refresh_token": "rt", "expires_in": 3600,
-             }), \
-             patch("llm_provider.exchange_id_token_for_api_key", return_value="sk-k"):
-            provider = ChatGPTSubscriptionProvider(refresh_token="rt", client_id="cid")
-            assert hasattr(provider, "complete")
-            assert hasattr(provider, "health_check")
-            assert hasattr(provider, "provider_name")
-            assert hasattr(provider, "model")
-            assert hasattr(provider, "supports_audn")
-
 
 class TestOpenAIProvider:
     """Test direct OpenAI provider behavior."""
 
     def test_complete_sets_temperature_zero(self):
-        from llm_provider import OpenAIProvider
 
         mock_openai = MagicMock()
         mock_response = MagicMock()
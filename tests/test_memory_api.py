@@ -1,52 +1,97 @@
 """Tests for memory CRUD/search API endpoints."""
 
-import importlib
-import os
-from unittest.mock import MagicMock, patch
+import copy
+from unittest.mock import MagicMock, call
 
 import pytest
-from fastapi.testclient import TestClient
+from starlette.requests import Request
+from starlette.routing import Match
+
+from auth_context import AuthContext
+
+
+# Canonical engine configuration, applied to a fresh mock for every test.
+_ENGINE_TEMPLATE = {
+    "stats_light.return_value": {"total_memories": 5, "dimension": 384, "model": "all-MiniLM-L6-v2"},
+    "search.return_value": [],
+    "hybrid_search.return_value": [],
+    "delete_memories.return_value": {"deleted_count": 2, "deleted_ids": [1, 3], "missing_ids": []},
+    "get_memory.return_value": {"id": 1, "text": "hello", "source": "carto/poet-pads/db"},
+    "get_memories.return_value": {"memories": [{"id": 1}], "missing_ids": [2]},
+    "upsert_memory.return_value": {"id": 7, "action": "created"},
+    "upsert_memories.return_value": {
+        "created": 1,
+        "updated": 1,
+        "errors": 0,
+        "results": [{"id": 7, "action": "created"}, {"id": 8, "action": "updated"}],
+    },
+    "delete_by_prefix.return_value": {"deleted_count": 4},
+    "update_memory.return_value": {"id": 4, "updated_fields": ["text"]},
+    "is_ready.return_value": {"ready": True, "status": "ready"},
+    "reload_embedder.return_value": {
+        "reloaded": True,
+        "model": "all-MiniLM-L6-v2",
+        "dimension": 384,
+    },
+}
 
 
 @pytest.fixture
-def client():
-    with patch.dict(os.environ, {"API_KEY": "test-key", "EXTRACT_PROVIDER": ""}):
-        import app as app_module
-
-        importlib.reload(app_module)
-        mock_engine = MagicMock()
-        mock_engine.stats_light.return_value = {"total_memories": 5, "dimension": 384, "model": "all-MiniLM-L6-v2"}
-        mock_engine.search.return_value = []
-        mock_engine.hybrid_search.return_value = []
-        mock_engine.delete_memories.return_value = {"deleted_count": 2, "deleted_ids": [1, 3], "missing_ids": []}
-        mock_engine.get_memory.return_value = {"id": 1, "text": "hello", "source": "carto/poet-pads/db"}
-        mock_engine.get_memories.return_value = {"memories": [{"id": 1}], "missing_ids": [2]}
-        mock_engine.upsert_memory.return_value = {"id": 7, "action": "created"}
-        mock_engine.upsert_memories.return_value = {
-            "created": 1,
-            "updated": 1,
-            "errors": 0,
-            "results": [{"id": 7, "action": "created"}, {"id": 8, "action": "updated"}],
-        }
-        mock_engine.delete_by_prefix.return_value = {"deleted_count": 4}
-        mock_engine.update_memory.return_value = {"id": 4, "updated_fields": ["text"]}
-        mock_engine.is_ready.return_value = {"ready": True, "status": "ready"}
-        mock_engine.reload_embedder.return_value = {
-            "reloaded": True,
-            "model": "all-MiniLM-L6-v2",
-            "dimension": 384,
-        }
-        app_module.memory = mock_engine
-        yield TestClient(app_module.app), mock_engine
+def client(app_env, monkeypatch):
+    app_module, test_client = app_env
+    mock_engine = MagicMock(**copy.deepcopy(_ENGINE_TEMPLATE))
+    monkeypatch.setattr(app_module, "memory", mock_engine)
+    yield test_client, mock_engine
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def app_module(app_env, client):
+    """The loaded app with this test's mock engine installed."""
+    return app_env[0]
+
+
+def _env_key_request(method: str, path: str) -> Request:
+    """Request as verify_api_key leaves it after accepting the env API key."""
+    request = Request({
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [],
+        "query_string": b"",
+        "client": ("testclient", 50000),
+    })
+    request.state.auth = AuthContext(role="admin", prefixes=None, key_type="env")
+    return request
+
+
+def _resolve_route(app, method: str, path: str):
+    """The route the app would dispatch (method, path) to, as Starlette matches it."""
+    scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            return route
+    return None
+
+
+# Search, batch search and readiness go through TestClient. The dispatch
+# table calls handlers directly to skip the ASGI stack and JSON round-trip,
+# and test_dispatch_routes checks each of its paths still reaches that
+# handler behind the API-key dependency.
+
+# Pre-encoded request body for the TestClient smoke test.
+_SEARCH_BODY = b'{"query":"python","k":3,"hybrid":false,"source_prefix":"carto/poet-pads/"}'
+_JSON_HEADERS = {"Content-Type": "application/json", "X-API-Key": "test-key"}
 
 
 def test_search_accepts_source_prefix_and_passes_to_engine(client):
     test_client, mock_engine = client
-    response = test_client.post(
-        "/search",
-        json={"query": "python", "k": 3, "hybrid": False, "source_prefix": "carto/poet-pads/"},
-        headers={"X-API-Key": "test-key"},
-    )
+    response = test_client.post("/search", content=_SEARCH_BODY, headers=_JSON_HEADERS)
     assert response.status_code == 200
     mock_engine.search.assert_called_once_with(
         query="python",
@@ -59,79 +104,95 @@ def test_search_accepts_source_prefix_and_passes_to_engine(client):
     )
 
 
-def test_delete_batch_endpoint_deletes_multiple_ids(client):
-    test_client, _ = client
-    response = test_client.post(
-        "/memory/delete-batch",
-        json={"ids": [1, 3]},
-        headers={"X-API-Key": "test-key"},
-    )
-    assert response.status_code == 200
-    body = response.json()
-    assert body["success"] is True
-    assert body["deleted_count"] == 2
-    assert body["deleted_ids"] == [1, 3]
-
-
-def test_get_memory_by_id(client):
-    test_client, mock_engine = client
-    response = test_client.get("/memory/1", headers={"X-API-Key": "test-key"})
-    assert response.status_code == 200
-    assert response.json()["id"] == 1
-    mock_engine.get_memory.assert_called_once_with(1)
-
-
-def test_get_memory_batch(client):
-    test_client, mock_engine = client
-    response = test_client.post(
-        "/memory/get-batch",
-        json={"ids": [1, 2]},
-        headers={"X-API-Key": "test-key"},
-    )
-    assert response.status_code == 200
-    body = response.json()
-    assert body["count"] == 1
-    assert body["missing_ids"] == [2]
-    mock_engine.get_memories.assert_called_once_with([1, 2])
-
-
-def test_upsert_memory(client):
-    test_client, mock_engine = client
-    response = test_client.post(
-        "/memory/upsert",
-        json={"text": "new text", "source": "carto/poet-pads/db", "key": "entity-1", "metadata": {"team": "carto"}},
-        headers={"X-API-Key": "test-key"},
-    )
-    assert response.status_code == 200
-    body = response.json()
-    assert body["success"] is True
-    assert body["action"] == "created"
-    mock_engine.upsert_memory.assert_called_once_with(
-        text="new text",
-        source="carto/poet-pads/db",
-        key="entity-1",
-        metadata={"team": "carto"},
-    )
-
-
-def test_upsert_batch_memory(client):
-    test_client, mock_engine = client
-    response = test_client.post(
-        "/memory/upsert-batch",
-        json={
-            "memories": [
-                {"text": "t1", "source": "a", "key": "k1"},
-                {"text": "t2", "source": "b", "key": "k2"},
-            ]
-        },
-        headers={"X-API-Key": "test-key"},
-    )
-    assert response.status_code == 200
-    body = response.json()
-    assert body["success"] is True
-    assert body["created"] == 1
-    assert body["updated"] == 1
-    mock_engine.upsert_memories.assert_called_once()
+# (method, path, handler, path args, request model, payload, engine method,
+#  expected engine call, expected subset of the response body)
+_DISPATCH_CASES = [
+    pytest.param(
+        "POST", "/memory/delete-batch", "delete_batch", (), "DeleteBatchRequest", {"ids": [1, 3]},
+        "delete_memories", call([1, 3]),
+        {"success": True, "deleted_count": 2, "deleted_ids": [1, 3]},
+        id="delete_batch",
+    ),
+    pytest.param(
+        "GET", "/memory/1", "get_memory", (1,), None, None,
+        "get_memory", call(1),
+        {"id": 1},
+        id="get_memory",
+    ),
+    pytest.param(
+        "POST", "/memory/get-batch", "get_memory_batch", (), "MemoryGetBatchRequest", {"ids": [1, 2]},
+        "get_memories", call([1, 2]),
+        {"count": 1, "missing_ids": [2]},
+        id="get_batch",
+    ),
+    pytest.param(
+        "POST", "/memory/upsert", "upsert_memory", (), "UpsertMemoryRequest",
+        {"text": "new text", "source": "carto/poet-pads/db", "key": "entity-1", "metadata": {"team": "carto"}},
+        "upsert_memory",
+        call(text="new text", source="carto/poet-pads/db", key="entity-1", metadata={"team": "carto"}),
+        {"success": True, "action": "created"},
+        id="upsert",
+    ),
+    pytest.param(
+        "POST", "/memory/upsert-batch", "upsert_memory_batch", (), "UpsertBatchRequest",
+        {"memories": [{"text": "t1", "source": "a", "key": "k1"}, {"text": "t2", "source": "b", "key": "k2"}]},
+        "upsert_memories",
+        call([
+            {"text": "t1", "source": "a", "key": "k1", "metadata": None},
+            {"text": "t2", "source": "b", "key": "k2", "metadata": None},
+        ]),
+        {"success": True, "created": 1, "updated": 1},
+        id="upsert_batch",
+    ),
+    pytest.param(
+        "POST", "/memory/delete-by-prefix", "delete_by_prefix", (), "DeleteByPrefixRequest",
+        {"source_prefix": "carto/poet-pads/"},
+        "delete_by_prefix", call("carto/poet-pads/", skip_snapshot=False, dry_run=False),
+        {"deleted_count": 4},
+        id="delete_by_prefix",
+    ),
+    pytest.param(
+        "PATCH", "/memory/4", "patch_memory", (4,), "PatchMemoryRequest", {"text": "updated"},
+        "update_memory",
+        call(memory_id=4, text="updated", source=None, metadata_patch=None, pinned=None, archived=None),
+        {"id": 4},
+        id="patch",
+    ),
+    pytest.param(
+        "POST", "/maintenance/embedder/reload", "reload_embedder", (), None, None,
+        "reload_embedder", call(),
+        {"success": True, "reloaded": True},
+        id="reload_embedder",
+    ),
+]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "method,path,handler,path_args,model,payload,engine_method,expected_call,expected_body",
+    _DISPATCH_CASES,
+)
+async def test_endpoint_dispatch(
+    app_module, method, path, handler, path_args, model, payload, engine_method, expected_call, expected_body
+):
+    args = list(path_args)
+    if model is not None:
+        args.append(getattr(app_module, model)(**payload))
+    body = await getattr(app_module, handler)(*args, _env_key_request(method, path))
+    assert getattr(app_module.memory, engine_method).call_args_list == [expected_call]
+    assert {key: body[key] for key in expected_body} == expected_body
+
+
+@pytest.mark.parametrize("method,path,handler,model", [
+    pytest.param(*case.values[:3], case.values[4], id=case.id) for case in _DISPATCH_CASES
+])
+def test_dispatch_routes(app_module, method, path, handler, model):
+    route = _resolve_route(app_module.app, method, path)
+    assert route is not None, f"{method} {path} does not resolve"
+    assert route.endpoint is getattr(app_module, handler)
+    assert any(dep.dependency is app_module.verify_api_key for dep in route.dependencies)
+    if model is not None:
+        assert route.body_field.type_ is getattr(app_module, model)
 
 
 def test_search_batch(client):
@@ -152,54 +213,9 @@ def test_search_batch(client):
     assert len(body["results"]) == 2
 
 
-def test_delete_by_prefix(client):
-    test_client, mock_engine = client
-    response = test_client.post(
-        "/memory/delete-by-prefix",
-        json={"source_prefix": "carto/poet-pads/"},
-        headers={"X-API-Key": "test-key"},
-    )
-    assert response.status_code == 200
-    assert response.json()["deleted_count"] == 4
-    mock_engine.delete_by_prefix.assert_called_once_with("carto/poet-pads/", skip_snapshot=False, dry_run=False)
-
-
-def test_patch_memory(client):
-    test_client, mock_engine = client
-    response = test_client.patch(
-        "/memory/4",
-        json={"text": "updated"},
-        headers={"X-API-Key": "test-key"},
-    )
-    assert response.status_code == 200
-    assert response.json()["id"] == 4
-    mock_engine.update_memory.assert_called_once_with(
-        memory_id=4,
-        text="updated",
-        source=None,
-        metadata_patch=None,
-        pinned=None,
-        archived=None,
-    )
-
-
 def test_health_ready(client):
     test_client, mock_engine = client
-    response = test_client.get("/health/ready", headers={"X-API-Key": "test-key"})
+    response = test_client.get("/health/ready")
     assert response.status_code == 200
-    body = response.json()
-    assert body["status"] == "ready"
+    assert response.json()["status"] == "ready"
     mock_engine.is_ready.assert_called_once()
-
-
-def test_reload_embedder_endpoint(client):
-    test_client, mock_engine = client
-    response = test_client.post(
-        "/maintenance/embedder/reload",
-        headers={"X-API-Key": "test-key"},
-    )
-    assert response.status_code == 200
-    body = response.json()
-    assert body["success"] is True
-    assert body["reloaded"] is True
-    mock_engine.reload_embedder.assert_called_once_with()
@@ -1,12 +1,25 @@
 """Tests for MemoryEngine core functionality"""
 
 import json
+import os
+import shutil
 import tempfile
 import pytest
 from pathlib import Path
+from unittest.mock import MagicMock
 
 from memory_engine import MemoryEngine
 
+# Engine tests exercise storage and ranking, not the ONNX model itself.
+pytestmark = pytest.mark.usefixtures("hash_embedder")
+
+
+def _count_dir(path: Path) -> int:
+    if not path.exists():
+        return 0
+    with os.scandir(path) as entries:
+        return sum(1 for _ in entries)
+
 
 @pytest.fixture
 def engine(tmp_path):
@@ -14,10 +27,11 @@ def engine(tmp_path):
     return MemoryEngine(data_dir=str(tmp_path))
 
 
-@pytest.fixture
-def populated_engine(engine):
-    """Engine with some test memories"""
-    engine.add_memories(
+@pytest.fixture(scope="module")
+def _populated_template(tmp_path_factory, hash_embedder):
+    """Data dir holding the populated state, embedded once per module."""
+    data_dir = tmp_path_factory.mktemp("tmpl")
+    MemoryEngine(data_dir=str(data_dir)).add_memories(
         texts=[
             "Python is a great programming language for data science",
             "JavaScript runs in the browser and on Node.js",
@@ -27,7 +41,22 @@ def populated_engine(engine):
         ],
         sources=["lang.md", "lang.md", "devops.md", "python.md", "ml.md"],
     )
-    return engine
+    return data_dir
+
+
+@pytest.fixture(scope="module")
+def shared_engine(tmp_path_factory, _populated_template):
+    """Populated engine shared by read-only tests; never mutate it."""
+    data_dir = tmp_path_factory.mktemp("shared")
+    shutil.copytree(_populated_template, data_dir, dirs_exist_ok=True)
+    return MemoryEngine(data_dir=str(data_dir))
+
+
+@pytest.fixture
+def populated_engine(tmp_path, _populated_template):
+    """Engine with some test memories, copied from the module template"""
+    shutil.copytree(_populated_template, tmp_path, dirs_exist_ok=True)
+    return MemoryEngine(data_dir=str(tmp_path))
 
 
 class TestAddAndSearch:
@@ -40,24 +69,36 @@ class TestAddAndSearch:
         ids = engine.add_memories(texts=[], sources=[])
         assert ids == []
 
-    def test_search_returns_results(self, populated_engine):
-        results = populated_engine.search("Python web framework", k=3)
-        assert len(results) > 0
-        assert results[0]["similarity"] > 0
+    @pytest.mark.parametrize(
+        "query,k,threshold,min_results,max_results",
+        [
+            ("Python web framework", 3, None, 1, 3),
+            # Very high threshold should filter most results
+            ("Python", 5, 0.99, 0, 5),
+            # k beyond the index size is capped at total_memories
+            ("test", 1000, None, 0, 5),
+        ],
+        ids=["returns_results", "with_threshold", "k_capped"],
+    )
+    def test_search(self, shared_engine, query, k, threshold, min_results, max_results):
+        results = shared_engine.search(query, k=k, threshold=threshold)
+        assert min_results <= len(results) <= max_results
+        if min_results:
+            assert results[0]["similarity"] > 0
+
+    def test_add_batch_encodes_in_one_call(self, engine, monkeypatch):
+        encode = MagicMock(side_effect=engine.model.encode)
+        monkeypatch.setattr(engine.model, "encode", encode)
+        texts = [f"batch memory number {i}" for i in range(100)]
+        ids = engine.add_memories(texts=texts, sources=["batch.md"] * len(texts))
+        assert len(ids) == 100
+        assert encode.call_count == 1
+        assert len(encode.call_args.args[0]) == 100
 
     def test_search_empty_index(self, engine):
         results = engine.search("anything")
         assert results == []
 
-    def test_search_with_threshold(self, populated_engine):
-        results = populated_engine.search("Python", k=5, threshold=0.99)
-        # Very high threshold should filter most results
-        assert len(results) <= 5
-
-    def test_search_k_capped(self, populated_engine):
-        results = populated_engine.search("test", k=1000)
-        assert len(results) <= populated_engine.stats_light()["total_memories"]
-
     def test_add_sets_created_at_and_updated_at(self, engine):
         ids = engine.add_memories(["timestamp test"], ["test/ts"])
         meta = engine.metadata[ids[0]]
@@ -70,17 +111,17 @@ class TestAddAndSearch:
 
 
 class TestHybridSearch:
-    def test_hybrid_returns_results(self, populated_engine):
-        results = populated_engine.hybrid_search("Docker containers", k=3)
+    def test_hybrid_returns_results(self, shared_engine):
+        results = shared_engine.hybrid_search("Docker containers", k=3)
         assert len(results) > 0
 
     def test_hybrid_empty_index(self, engine):
         results = engine.hybrid_search("anything")
         assert results == []
 
-    def test_bm25_exact_match_boost(self, populated_engine):
+    def test_bm25_exact_match_boost(self, shared_engine):
         """BM25 should boost exact keyword matches"""
-        results = populated_engine.hybrid_search("Memories", k=3)
+        results = shared_engine.hybrid_search("Memories", k=3)
         assert any("Memories" in r["text"] for r in results)
 
 
@@ -95,13 +136,10 @@ class TestDelete:
         with pytest.raises(ValueError):
             populated_engine.delete_memory(999)
 
-    def test_delete_by_source(self, populated_engine):
-        result = populated_engine.delete_by_source("lang.md")
-        assert result["deleted_count"] == 2
-
-    def test_delete_by_source_no_match(self, populated_engine):
-        result = populated_engine.delete_by_source("nonexistent.md")
-        assert result["deleted_count"] == 0
+    @pytest.mark.parametrize("pattern,expected", [("lang.md", 2), ("nonexistent.md", 0)], ids=["match", "no_match"])
+    def test_delete_by_source(self, populated_engine, pattern, expected):
+        result = populated_engine.delete_by_source(pattern)
+        assert result["deleted_count"] == expected
 
     def test_delete_memories_batch(self, populated_engine):
         count_before = populated_engine.stats_light()["total_memories"]
@@ -117,25 +155,37 @@ class TestDelete:
 
 
 class TestNovelty:
-    def test_novel_text(self, populated_engine):
-        is_new, _ = populated_engine.is_novel("Kubernetes orchestrates containers")
+    def test_novel_text(self, shared_engine):
+        is_new, _ = shared_engine.is_novel("Kubernetes orchestrates containers")
         assert is_new is True
 
-    def test_duplicate_text(self, populated_engine):
-        is_new, match = populated_engine.is_novel(
+    def test_duplicate_text(self, shared_engine):
+        is_new, match = shared_engine.is_novel(
             "Python is a great programming language", threshold=0.5
         )
         assert is_new is False
         assert match is not None
 
+    def test_execute_actions_skips_near_duplicate_adds(self, engine):
+        from llm_extract import execute_actions
+
+        actions = [{"action": "ADD", "fact_index": 0}, {"action": "ADD", "fact_index": 1}]
+        facts = [
+            {"text": "The team uses PostgreSQL", "category": "decision"},
+            {"text": "The team uses PostgreSQL.", "category": "decision"},
+        ]
+        result = execute_actions(engine, actions, facts, source="test/proj")
+        assert engine.stats_light()["total_memories"] == 1
+        assert [a["id"] for a in result["actions"]] == [0, None]
+
 
 class TestFetchAndUpsert:
-    def test_get_memory(self, populated_engine):
-        mem = populated_engine.get_memory(0)
+    def test_get_memory(self, shared_engine):
+        mem = shared_engine.get_memory(0)
         assert mem["id"] == 0
 
-    def test_get_memories(self, populated_engine):
-        result = populated_engine.get_memories([0, 999])
+    def test_get_memories(self, shared_engine):
+        result = shared_engine.get_memories([0, 999])
         assert len(result["memories"]) == 1
         assert result["missing_ids"] == [999]
 
@@ -148,14 +198,14 @@ class TestFetchAndUpsert:
     def test_update_memory_source_only_fast_path(self, populated_engine):
         """Source-only update should skip backup and re-embedding."""
         old_text = populated_engine.get_memory(0)["text"]
-        backup_count_before = len(list(Path(populated_engine.data_dir).glob("backups/*")))
+        backup_count_before = _count_dir(populated_engine.backup_dir)
         result = populated_engine.update_memory(0, source="new-source/path")
         assert result["updated_fields"] == ["source"]
         mem = populated_engine.get_memory(0)
         assert mem["source"] == "new-source/path"
         assert mem["text"] == old_text  # text unchanged
         # Source-only fast path should NOT create a backup
-        backup_count_after = len(list(Path(populated_engine.data_dir).glob("backups/*")))
+        backup_count_after = _count_dir(populated_engine.backup_dir)
         assert backup_count_after == backup_count_before
 
     def test_update_preserves_created_at(self, populated_engine):
@@ -187,12 +237,12 @@ class TestFetchAndUpsert:
 
 
 class TestDeduplication:
-    def test_find_no_duplicates(self, populated_engine):
-        dupes = populated_engine.find_duplicates(threshold=0.99)
+    def test_find_no_duplicates(self, shared_engine):
+        dupes = shared_engine.find_duplicates(threshold=0.99)
         assert len(dupes) == 0
 
-    def test_dedup_dry_run(self, populated_engine):
-        result = populated_engine.deduplicate(threshold=0.3, dry_run=True)
+    def test_dedup_dry_run(self, shared_engine):
+        result = shared_engine.deduplicate(threshold=0.3, dry_run=True)
         assert result["dry_run"] is True
 
 
@@ -240,9 +290,9 @@ class TestBackupRestore:
         populated_engine.restore_from_backup(backup_path.name)
         assert populated_engine.stats_light()["total_memories"] < count_after_add
 
-    def test_restore_nonexistent(self, populated_engine):
+    def test_restore_nonexistent(self, shared_engine):
         with pytest.raises(FileNotFoundError):
-            populated_engine.restore_from_backup("nonexistent_backup")
+            shared_engine.restore_from_backup("nonexistent_backup")
 
     def test_backup_prefix_sanitized(self, populated_engine):
         backup_path = populated_engine._backup(prefix="../../../etc")
@@ -250,19 +300,20 @@ class TestBackupRestore:
 
 
 class TestListMemories:
-    def test_list_all(self, populated_engine):
-        result = populated_engine.list_memories()
-        assert result["total"] == 5
-        assert len(result["memories"]) == 5
-
-    def test_list_with_pagination(self, populated_engine):
-        result = populated_engine.list_memories(offset=2, limit=2)
-        assert len(result["memories"]) == 2
-        assert result["offset"] == 2
-
-    def test_list_with_source_filter(self, populated_engine):
-        result = populated_engine.list_memories(source_filter="lang.md")
-        assert result["total"] == 2
+    @pytest.mark.parametrize(
+        "kwargs,total,count",
+        [
+            ({}, 5, 5),
+            ({"offset": 2, "limit": 2}, 5, 2),
+            ({"source_filter": "lang.md"}, 2, 2),
+        ],
+        ids=["all", "pagination", "source_filter"],
+    )
+    def test_list(self, shared_engine, kwargs, total, count):
+        result = shared_engine.list_memories(**kwargs)
+        assert result["total"] == total
+        assert len(result["memories"]) == count
+        assert result["offset"] == kwargs.get("offset", 0)
 
 
 class TestPersistence:
@@ -277,15 +328,11 @@ class TestPersistence:
         assert listed["memories"][0]["text"] == "persisted data"
 
     def test_integrity_check(self, engine, tmp_path):
+        # add_memories persists metadata itself; no separate save() needed
         engine.add_memories(texts=["data"], sources=["test.md"])
-        engine.save()
 
-        # Corrupt metadata by removing an entry
-        with open(engine.metadata_path) as f:
-            meta = json.load(f)
-        meta.pop()
-        with open(engine.metadata_path, "w") as f:
-            json.dump(meta, f)
+        # Corrupt metadata by dropping its only entry while Qdrant keeps the point
+        engine.metadata_path.write_text("[]", encoding="utf-8")
 
         with pytest.raises(RuntimeError, match="mismatch"):
             MemoryEngine(data_dir=str(tmp_path))
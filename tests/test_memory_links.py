@@ -8,6 +8,9 @@ from unittest.mock import MagicMock, patch
 import pytest
 from fastapi.testclient import TestClient
 
+# Engines in this module share one ONNX embedder per model.
+pytestmark = pytest.mark.usefixtures("shared_onnx_embedders")
+
 
 VALID_LINK_TYPES = ["supersedes", "related_to", "blocked_by", "caused_by", "reinforces"]
 
@@ -10,6 +10,9 @@ from unittest.mock import MagicMock, call, patch
 import pytest
 from fastapi.testclient import TestClient
 
+# Engines in this module share one ONNX embedder per model.
+pytestmark = pytest.mark.usefixtures("shared_onnx_embedders")
+
 
 # ---------------------------------------------------------------------------
 # Engine-level tests (real MemoryEngine with mocked Qdrant)
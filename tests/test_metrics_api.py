@@ -1,32 +1,32 @@
 """Tests for /metrics endpoint."""
 
-import os
-from unittest.mock import MagicMock, patch
+import copy
+from unittest.mock import MagicMock
 
 import pytest
-from fastapi.testclient import TestClient
+
+
+# Canonical engine configuration, applied to a fresh mock for every test.
+_ENGINE_TEMPLATE = {
+    "stats_light.return_value": {"total_memories": 5},
+    "stats.return_value": {"total_memories": 5},
+    "reload_embedder.return_value": {
+        "reloaded": True,
+        "model": "all-MiniLM-L6-v2",
+        "dimension": 384,
+        "gc_collected": 4,
+    },
+}
 
 
 @pytest.fixture
-def client():
-    with patch.dict(os.environ, {"API_KEY": "test-key", "EXTRACT_PROVIDER": ""}):
-        import importlib
-        import app as app_module
-
-        importlib.reload(app_module)
-
-        mock_engine = MagicMock()
-        mock_engine.stats_light.return_value = {"total_memories": 5}
-        mock_engine.stats.return_value = {"total_memories": 5}
-        mock_engine.reload_embedder.return_value = {
-            "reloaded": True,
-            "model": "all-MiniLM-L6-v2",
-            "dimension": 384,
-            "gc_collected": 4,
-        }
-        app_module.memory = mock_engine
-
-        yield TestClient(app_module.app), mock_engine
+def client(app_env, monkeypatch):
+    app_module, test_client = app_env
+    mock_engine = MagicMock(**copy.deepcopy(_ENGINE_TEMPLATE))
+    monkeypatch.setattr(app_module, "memory", mock_engine)
+    # The trend delta spans the whole sample window, so start each test empty.
+    app_module.memory_trend.clear()
+    yield test_client, mock_engine
 
 
 def test_metrics_includes_latency_error_queue_and_memory_sections(client):
@@ -0,0 +1,56 @@
+"""Tests for the OpenAI embedding provider's fixed-width encode path."""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+
+def _make_embedder(model="text-embedding-3-small", rows=None):
+    mock_openai = MagicMock()
+    client = mock_openai.OpenAI.return_value
+
+    def fake_create(model, input):
+        data = [SimpleNamespace(embedding=rows(text)) for text in input]
+        return SimpleNamespace(data=data)
+
+    client.embeddings.create.side_effect = fake_create
+    with patch.dict("sys.modules", {"openai": mock_openai}):
+        from openai_embedder import OpenAIEmbedder
+
+        return OpenAIEmbedder(model=model, api_key="sk-test"), client
+
+
+def test_known_dim_uses_specialized_normalizer():
+    from openai_embedder import _NORMALIZERS
+
+    embedder, _ = _make_embedder(rows=lambda t: [3.0, 4.0] + [0.0] * 1534)
+    assert embedder._normalize is _NORMALIZERS[1536]
+
+    out = embedder.encode(["a", "b", "c"], batch_size=2)
+    assert out.shape == (3, 1536)
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out[:, :2], [[0.6, 0.8]] * 3, rtol=1e-6)
+
+
+def test_unknown_dim_probes_and_normalizes():
+    embedder, client = _make_embedder(model="custom-embed", rows=lambda t: [0.0, 2.0, 0.0])
+    assert embedder.get_sentence_embedding_dimension() == 3
+    assert client.embeddings.create.call_count == 1
+
+    out = embedder.encode("hello")
+    np.testing.assert_allclose(out, [[0.0, 1.0, 0.0]])
+
+
+def test_encode_without_normalization_returns_raw_vectors():
+    embedder, _ = _make_embedder(model="custom-embed", rows=lambda t: [0.0, 2.0, 0.0])
+    out = embedder.encode(["x"], normalize_embeddings=False)
+    np.testing.assert_allclose(out, [[0.0, 2.0, 0.0]])
+
+
+def test_normalizer_rejects_wrong_width():
+    from openai_embedder import _make_normalizer
+
+    with pytest.raises(ValueError):
+        _make_normalizer(4)(np.ones((1, 3), dtype=np.float32))
@@ -12,6 +12,9 @@ from fastapi.testclient import TestClient
 
 from memory_engine import MemoryEngine
 
+# Engines in this module share one ONNX embedder per model.
+pytestmark = pytest.mark.usefixtures("shared_onnx_embedders")
+
 
 class TestPinProtect:
     """Pin/archive fields on PATCH /memory/{id} and bulk-delete exclusion."""
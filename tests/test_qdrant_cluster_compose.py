@@ -1,33 +1,29 @@
 """Tests for generated N-node Qdrant compose overlays."""
 
-import subprocess
-from pathlib import Path
+import importlib
 
 import pytest
 
 
-ROOT = Path(__file__).resolve().parents[1]
-
-
 @pytest.mark.parametrize(
-    "script_name",
-    ["render_qdrant_cluster_compose.py", "render_cluster_compose.py"],
+    "module_name",
+    ["scripts.render_qdrant_cluster_compose", "scripts.render_cluster_compose"],
 )
-def test_render_three_node_cluster(tmp_path, script_name):
+def test_render_three_node_cluster(tmp_path, module_name):
     output = tmp_path / "docker-compose.qdrant-cluster.generated.yml"
-    cmd = [
-        str(ROOT / ".venv" / "bin" / "python"),
-        str(ROOT / "scripts" / script_name),
-        "--nodes",
-        "3",
-        "--output",
-        str(output),
-    ]
-    result = subprocess.run(cmd, cwd=str(ROOT), capture_output=True, text=True, check=False)
-    assert result.returncode == 0, result.stderr
+    importlib.import_module(module_name).main(["--nodes", "3", "--output", str(output)])
     assert output.exists()
 
     text = output.read_text(encoding="utf-8")
     assert "qdrant_node1:" in text
     assert "qdrant_node3:" in text
     assert "--bootstrap" in text
+
+
+@pytest.mark.parametrize(
+    "module_name",
+    ["scripts.render_qdrant_cluster_compose", "scripts.render_cluster_compose"],
+)
+def test_render_rejects_zero_nodes(module_name):
+    with pytest.raises(ValueError, match="nodes must be >= 1"):
+        importlib.import_module(module_name).render_cluster_compose(0)
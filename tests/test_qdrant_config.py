@@ -2,11 +2,16 @@
 
 import importlib
 import os
+from functools import lru_cache
 from pathlib import Path
 
 
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@lru_cache(maxsize=8)
 def _read(path: str) -> str:
-    return Path(path).read_text(encoding="utf-8")
+    return (ROOT / path).read_text(encoding="utf-8")
 
 
 def test_dependencies_use_qdrant_client_not_faiss():
@@ -1,17 +1,34 @@
 """Unit tests for the Qdrant storage adapter."""
 
+import bisect
+from itertools import islice
 from types import SimpleNamespace
 
+import numpy as np
+
 from qdrant_config import QdrantSettings
 from qdrant_store import QdrantStore
 
 
+_TEST_VEC = np.full(384, 0.1, dtype=np.float32)
+
+
 class FakeQdrantClient:
+    """In-memory stand-in with cosine scoring over one contiguous vector matrix.
+
+    Vectors are kept unit-normalized in ``_vecs`` (one row per point) with
+    payloads in a parallel list, so a query is a single matrix-vector product.
+    """
+
     def __init__(self):
         self.created = None
         self.upsert_calls = []
         self.deleted = []
-        self._points = {}
+        self._vecs = np.empty((0, 0), dtype=np.float32)
+        self._ids: list[int] = []
+        self._payloads: list[dict] = []
+        self._id_to_row: dict[int, int] = {}
+        self._ordered_ids: list[int] = []  # ascending, as Qdrant scrolls
 
     def get_collection(self, collection_name):
         if self.created is None:
@@ -25,35 +42,71 @@ class FakeQdrantClient:
             replication_factor=replication_factor,
             write_consistency_factor=write_consistency_factor,
         )
+        self._vecs = np.empty((0, vectors_config.size), dtype=np.float32)
 
     def upsert(self, collection_name, points, wait, ordering):
         self.upsert_calls.append((collection_name, wait, ordering))
-        for p in points:
-            self._points[int(p.id)] = p
+        # An id repeated within one batch keeps its last point, as in Qdrant.
+        last = {int(p.id): i for i, p in enumerate(points)}
+        if len(last) < len(points):
+            points = [points[i] for i in sorted(last.values())]
+        vecs = np.asarray([p.vector for p in points], dtype=np.float32).reshape(len(points), -1)
+        vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+        new_rows = []
+        for p, vec in zip(points, vecs):
+            pid = int(p.id)
+            row = self._id_to_row.get(pid)
+            if row is None:
+                self._id_to_row[pid] = len(self._ids)
+                self._ids.append(pid)
+                bisect.insort(self._ordered_ids, pid)
+                self._payloads.append(p.payload)
+                new_rows.append(vec)
+            else:
+                self._vecs[row] = vec
+                self._payloads[row] = p.payload
+        if new_rows:
+            self._vecs = np.vstack([self._vecs, np.asarray(new_rows)]) if self._vecs.size else np.asarray(new_rows)
         return {"status": "ok"}
 
     def query_points(self, collection_name, query, limit, score_threshold, with_payload, with_vectors, consistency, query_filter=None):
+        if not self._ids:
+            return SimpleNamespace(points=[])
+        q = np.asarray(query, dtype=np.float32)
+        scores = self._vecs @ (q / max(float(np.linalg.norm(q)), 1e-12))
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        if score_threshold is not None:
+            top = top[scores[top] >= score_threshold]
         points = [
-            SimpleNamespace(id=pid, payload=pt.payload, score=0.95)
-            for pid, pt in sorted(self._points.items())
-        ][:limit]
+            SimpleNamespace(id=self._ids[row], payload=self._payloads[row], score=float(scores[row]))
+            for row in top
+        ]
         return SimpleNamespace(points=points)
 
     def delete(self, collection_name, points_selector, wait, ordering):
-        for pid in points_selector.points:
-            self._points.pop(int(pid), None)
+        rows = {self._id_to_row[int(pid)] for pid in points_selector.points if int(pid) in self._id_to_row}
+        if rows:
+            keep = [row for row in range(len(self._ids)) if row not in rows]
+            self._vecs = self._vecs[keep]
+            self._ids = [self._ids[row] for row in keep]
+            self._payloads = [self._payloads[row] for row in keep]
+            self._id_to_row = {pid: row for row, pid in enumerate(self._ids)}
+            self._ordered_ids = [pid for pid in self._ordered_ids if pid in self._id_to_row]
         self.deleted.append((collection_name, list(points_selector.points), wait, ordering))
         return {"status": "ok"}
 
     def scroll(self, collection_name, offset, limit, with_payload, with_vectors):
-        ids = sorted(self._points.keys())
         start = int(offset) if offset is not None else 0
-        chunk_ids = ids[start : start + limit]
-        points = [self._points[i] for i in chunk_ids]
+        points = [
+            SimpleNamespace(id=pid, payload=self._payloads[self._id_to_row[pid]])
+            for pid in islice(self._ordered_ids, start, start + limit)
+        ]
         next_offset = start + len(points)
-        if next_offset >= len(ids):
-            next_offset = None
-        return points, next_offset
+        return points, (next_offset if next_offset < len(self._ordered_ids) else None)
 
 
 def _settings() -> QdrantSettings:
@@ -85,12 +138,12 @@ def test_upsert_and_search_roundtrip():
         [
             {
                 "id": 1,
-                "vector": [0.1] * 384,
+                "vector": _TEST_VEC,
                 "payload": {"text": "hello", "source": "s"},
             }
         ]
     )
-    hits = store.search([0.1] * 384, limit=5)
+    hits = store.search(_TEST_VEC, limit=5)
     assert hits
     assert hits[0]["id"] == 1
     assert hits[0]["payload"]["text"] == "hello"
@@ -101,9 +154,55 @@ def test_delete_points_removes_data():
     store = QdrantStore(settings=_settings(), client=fake)
     store.ensure_collection(dim=384)
     store.upsert_points(
-        [{"id": 1, "vector": [0.1] * 384, "payload": {"text": "hello", "source": "s"}}]
+        [{"id": 1, "vector": _TEST_VEC, "payload": {"text": "hello", "source": "s"}}]
     )
     store.delete_points([1])
-    hits = store.search([0.1] * 384, limit=5)
+    hits = store.search(_TEST_VEC, limit=5)
     assert hits == []
 
+
+def test_search_ranks_by_similarity_and_applies_threshold():
+    fake = FakeQdrantClient()
+    store = QdrantStore(settings=_settings(), client=fake)
+    store.ensure_collection(dim=3)
+    store.upsert_points(
+        [
+            {"id": 1, "vector": [1.0, 0.0, 0.0], "payload": {"text": "exact"}},
+            {"id": 2, "vector": [0.0, 1.0, 0.0], "payload": {"text": "orthogonal"}},
+            {"id": 3, "vector": [1.0, 1.0, 0.0], "payload": {"text": "close"}},
+        ]
+    )
+    hits = store.search([1.0, 0.0, 0.0], limit=2)
+    assert [hit["id"] for hit in hits] == [1, 3]
+    assert hits[0]["score"] > hits[1]["score"]
+
+    hits = store.search([1.0, 0.0, 0.0], limit=5, score_threshold=0.9)
+    assert [hit["id"] for hit in hits] == [1]
+
+
+def test_upsert_repeated_id_in_one_batch_keeps_last_point():
+    fake = FakeQdrantClient()
+    store = QdrantStore(settings=_settings(), client=fake)
+    store.ensure_collection(dim=3)
+    store.upsert_points(
+        [
+            {"id": 1, "vector": [0.0, 1.0, 0.0], "payload": {"text": "first"}},
+            {"id": 1, "vector": [1.0, 0.0, 0.0], "payload": {"text": "second"}},
+        ]
+    )
+    hits = store.search([1.0, 0.0, 0.0], limit=5)
+    assert [(hit["id"], hit["payload"]["text"]) for hit in hits] == [(1, "second")]
+    assert hits[0]["score"] > 0.99
+
+
+def test_scroll_all_pages_in_id_order():
+    fake = FakeQdrantClient()
+    store = QdrantStore(settings=_settings(), client=fake)
+    store.ensure_collection(dim=384)
+    store.upsert_points([{"id": pid, "vector": _TEST_VEC, "payload": {"n": pid}} for pid in (3, 1, 2)])
+    store.delete_points([2])
+
+    first, offset = store.scroll_all(limit=1)
+    rest, end = store.scroll_all(offset=offset, limit=10)
+    assert [p["id"] for p in first + rest] == [1, 3]
+    assert end is None
@@ -271,7 +271,7 @@ class TestSearchEndpointIntegration:
     """Test /search applies query intent classification."""
 
     @pytest.fixture
-    def client(self):
+    def client(self, monkeypatch):
         from unittest.mock import MagicMock, patch
         from fastapi.testclient import TestClient
         from app import app
@@ -281,7 +281,8 @@ class TestSearchEndpointIntegration:
         mock_engine.search.return_value = []
         mock_engine.metadata = []
 
-        with patch("app.memory", mock_engine), patch("app.API_KEY", "test-key"):
+        monkeypatch.setenv("API_KEY", "test-key")
+        with patch("app.memory", mock_engine):
             tc = TestClient(app)
             yield tc, mock_engine
 
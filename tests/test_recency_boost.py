@@ -8,6 +8,9 @@ import pytest
 
 from memory_engine import MemoryEngine
 
+# Engines in this module share one ONNX embedder per model.
+pytestmark = pytest.mark.usefixtures("shared_onnx_embedders")
+
 
 class TestRecencyScore:
     """Test the _recency_score static helper."""
@@ -3,36 +3,71 @@
 Covers reviewer findings P1-P3 and ensures hardening holds.
 """
 
-import importlib
-import os
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock
 
 import pytest
-from fastapi.testclient import TestClient
 
 
-@pytest.fixture
-def client():
-    with patch.dict(os.environ, {"API_KEY": "test-key", "EXTRACT_PROVIDER": ""}):
-        import app as app_module
+class _StubCloudSync:
+    """CloudSync stand-in; set download_error to make download_backup raise."""
+
+    def __init__(self):
+        self.latest_snapshot = "latest"
+        self.download_error = None
+
+    def get_latest_snapshot(self):
+        return self.latest_snapshot
+
+    def download_backup(self, backup_name, dest_dir):
+        if self.download_error is not None:
+            raise self.download_error
+        return {"backup_name": backup_name, "files": []}
+
+
+class _StubEngine:
+    """Just the MemoryEngine surface these endpoints touch.
+
+    Records the arguments of each call in ``calls``; set ``restore_error`` to
+    make restore_from_backup raise.
+    """
 
-        importlib.reload(app_module)
-        mock_engine = MagicMock()
-        mock_engine.stats_light.return_value = {
-            "total_memories": 5,
-            "dimension": 384,
-            "model": "all-MiniLM-L6-v2",
-        }
-        mock_engine.add_memories.return_value = [42]
-        mock_engine.get_backup_dir.return_value = Path("/data/backups")
+    def __init__(self):
+        self.cloud = _StubCloudSync()
+        self.calls = {}
+        self.add_ids = [42]
+        self.restore_error = None
 
-        # Cloud sync mock
-        mock_cloud = MagicMock()
-        mock_engine.get_cloud_sync.return_value = mock_cloud
+    def stats_light(self):
+        return {"total_memories": 5, "dimension": 384, "model": "all-MiniLM-L6-v2"}
 
-        app_module.memory = mock_engine
-        yield TestClient(app_module.app), mock_engine, mock_cloud
+    def get_backup_dir(self):
+        return Path("/data/backups")
+
+    def get_cloud_sync(self):
+        return self.cloud
+
+    def add_memories(self, **kwargs):
+        self.calls["add_memories"] = kwargs
+        return list(self.add_ids)
+
+    def rebuild_from_files(self, sources):
+        self.calls["rebuild_from_files"] = sources
+        return {"files_processed": 0, "memories_added": 0, "backup_location": "/data/backups/pre_rebuild"}
+
+    def restore_from_backup(self, backup_name):
+        self.calls["restore_from_backup"] = backup_name
+        if self.restore_error is not None:
+            raise self.restore_error
+        return {"restored_count": 0}
+
+
+@pytest.fixture
+def client(app_env, monkeypatch):
+    app_module, test_client = app_env
+    engine = _StubEngine()
+    monkeypatch.setattr(app_module, "memory", engine)
+    yield test_client, engine, engine.cloud
 
 
 # -- Path traversal rejection -----------------------------------------------
@@ -40,12 +75,7 @@ def client():
 
 def test_index_build_rejects_path_traversal(client):
     """P1: /index/build must block ../ in user-provided sources."""
-    test_client, mock_engine, _ = client
-    mock_engine.rebuild_from_files.return_value = {
-        "files_processed": 0,
-        "memories_added": 0,
-        "backup_location": "/data/backups/pre_rebuild",
-    }
+    test_client, engine, _ = client
     response = test_client.post(
         "/index/build",
         json={"sources": ["../../etc/passwd", "normal.md"]},
@@ -53,16 +83,14 @@ def test_index_build_rejects_path_traversal(client):
     )
     assert response.status_code == 200
     # The traversal path should have been filtered out
-    args = mock_engine.rebuild_from_files.call_args
-    sources = args[1].get("sources", args[0][0] if args[0] else [])
-    for s in sources:
+    for s in engine.calls["rebuild_from_files"]:
         assert ".." not in s
 
 
 def test_restore_rejects_path_traversal(client):
     """P1: /restore must reject backup names with traversal characters as 400."""
-    test_client, mock_engine, _ = client
-    mock_engine.restore_from_backup.side_effect = ValueError("Invalid backup name: ../etc")
+    test_client, engine, _ = client
+    engine.restore_error = ValueError("Invalid backup name: ../etc")
     response = test_client.post(
         "/restore",
         json={"backup_name": "../etc"},
@@ -74,8 +102,8 @@ def test_restore_rejects_path_traversal(client):
 
 def test_sync_download_rejects_traversal_backup_name(client):
     """P1: /sync/download must reject backup names with traversal characters."""
-    test_client, _, mock_cloud = client
-    mock_cloud.download_backup.side_effect = ValueError("Invalid backup name: ../../etc")
+    test_client, _, cloud = client
+    cloud.download_error = ValueError("Invalid backup name: ../../etc")
     response = test_client.post(
         "/sync/download?backup_name=../../etc&confirm=true",
         headers={"X-API-Key": "test-key"},
@@ -86,8 +114,8 @@ def test_sync_download_rejects_traversal_backup_name(client):
 
 def test_sync_restore_rejects_traversal_backup_name(client):
     """P1: /sync/restore/{name} must reject traversal backup names."""
-    test_client, _, mock_cloud = client
-    mock_cloud.download_backup.side_effect = ValueError("Invalid backup name: ../../../etc")
+    test_client, _, cloud = client
+    cloud.download_error = ValueError("Invalid backup name: ../../../etc")
     response = test_client.post(
         "/sync/restore/../../../etc?confirm=true",
         headers={"X-API-Key": "test-key"},
@@ -101,8 +129,8 @@ def test_sync_restore_rejects_traversal_backup_name(client):
 
 def test_sync_download_returns_404_when_no_remote_backup(client):
     """P2: /sync/download must return 404 — not 500 — when no backup exists."""
-    test_client, _, mock_cloud = client
-    mock_cloud.get_latest_snapshot.return_value = None
+    test_client, _, cloud = client
+    cloud.latest_snapshot = None
     response = test_client.post(
         "/sync/download?confirm=true",
         headers={"X-API-Key": "test-key"},
@@ -113,8 +141,8 @@ def test_sync_download_returns_404_when_no_remote_backup(client):
 
 def test_sync_download_returns_404_when_specific_backup_missing(client):
     """P2: /sync/download returns 404 when named backup is not in cloud."""
-    test_client, _, mock_cloud = client
-    mock_cloud.download_backup.side_effect = FileNotFoundError("No backup found: nonexistent")
+    test_client, _, cloud = client
+    cloud.download_error = FileNotFoundError("No backup found: nonexistent")
     response = test_client.post(
         "/sync/download?backup_name=nonexistent&confirm=true",
         headers={"X-API-Key": "test-key"},
@@ -127,8 +155,8 @@ def test_sync_download_returns_404_when_specific_backup_missing(client):
 
 def test_batch_add_preserves_partial_metadata(client):
     """P2: /memory/add-batch must not drop metadata when some rows omit it."""
-    test_client, mock_engine, _ = client
-    mock_engine.add_memories.return_value = [1, 2, 3]
+    test_client, engine, _ = client
+    engine.add_ids = [1, 2, 3]
     response = test_client.post(
         "/memory/add-batch",
         json={
@@ -142,7 +170,7 @@ def test_batch_add_preserves_partial_metadata(client):
     )
     assert response.status_code == 200
     # Verify metadata_list was passed (not None)
-    call_kwargs = mock_engine.add_memories.call_args[1]
+    call_kwargs = engine.calls["add_memories"]
     metadata_list = call_kwargs.get("metadata_list")
     assert metadata_list is not None, "metadata_list should not be None when some rows have metadata"
     assert len(metadata_list) == 3
@@ -153,8 +181,8 @@ def test_batch_add_preserves_partial_metadata(client):
 
 def test_batch_add_no_metadata_passes_none(client):
     """When NO rows have metadata, metadata_list should be None (optimization)."""
-    test_client, mock_engine, _ = client
-    mock_engine.add_memories.return_value = [1, 2]
+    test_client, engine, _ = client
+    engine.add_ids = [1, 2]
     response = test_client.post(
         "/memory/add-batch",
         json={
@@ -166,7 +194,7 @@ def test_batch_add_no_metadata_passes_none(client):
         headers={"X-API-Key": "test-key"},
     )
     assert response.status_code == 200
-    call_kwargs = mock_engine.add_memories.call_args[1]
+    call_kwargs = engine.calls["add_memories"]
     assert call_kwargs.get("metadata_list") is None
 
 
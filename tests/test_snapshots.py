@@ -14,6 +14,9 @@ from fastapi.testclient import TestClient
 from qdrant_config import QdrantSettings
 from qdrant_store import QdrantStore
 
+# Engines in this module share one ONNX embedder per model.
+pytestmark = pytest.mark.usefixtures("shared_onnx_embedders")
+
 
 def _remote_settings() -> QdrantSettings:
     return QdrantSettings(
@@ -0,0 +1,31 @@
+"""Guards against test modules that silently shadow their own tests."""
+import ast
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+
+TESTS_DIR = Path(__file__).resolve().parent
+TEST_MODULES = sorted(TESTS_DIR.glob("test_*.py"))
+
+
+def _duplicate_test_names(body: list[ast.stmt]) -> list[str]:
+    names = Counter(
+        node.name
+        for node in body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        and node.name.lower().startswith("test")
+    )
+    return sorted(name for name, count in names.items() if count > 1)
+
+
+@pytest.mark.parametrize("module", TEST_MODULES, ids=lambda p: p.name)
+def test_no_redefined_tests(module: Path) -> None:
+    """A second def with the same name replaces the first, so it never runs."""
+    tree = ast.parse(module.read_text(encoding="utf-8"))
+    duplicates = _duplicate_test_names(tree.body)
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            duplicates += [f"{node.name}.{name}" for name in _duplicate_test_names(node.body)]
+    assert duplicates == []
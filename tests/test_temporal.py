@@ -4,6 +4,9 @@ from datetime import datetime, timezone, timedelta
 from unittest.mock import patch, MagicMock, call
 from memory_engine import MemoryEngine
 
+# Engines in this module share one ONNX embedder per model.
+pytestmark = pytest.mark.usefixtures("shared_onnx_embedders")
+
 
 @pytest.fixture
 def engine(tmp_path):
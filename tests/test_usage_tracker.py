@@ -1,63 +1,67 @@
 """Tests for usage_tracker module."""
-import os
-import tempfile
+import gc
+import sqlite3
+import time
+import weakref
+from unittest.mock import MagicMock
+
 import pytest
-from usage_tracker import UsageTracker, NullTracker
+import usage_tracker
+from usage_tracker import FLUSH_MAX_EVENTS, UsageTracker, NullTracker
 
 
 class TestRetrievalTracking:
-    def setup_method(self):
-        self.tmpdir = tempfile.mkdtemp()
-        self.db_path = os.path.join(self.tmpdir, "usage.db")
-        self.tracker = UsageTracker(self.db_path)
-
-    def test_log_retrieval_stores_record(self):
-        self.tracker.log_retrieval(memory_id=42, query="test query", source="test")
-        stats = self.tracker.get_retrieval_stats(memory_ids=[42])
+    @pytest.fixture
+    def tracker(self, tmp_path):
+        return UsageTracker(str(tmp_path / "usage.db"))
+
+    def test_log_retrieval_stores_record(self, tracker):
+        tracker.log_retrieval(memory_id=42, query="test query", source="test")
+        stats = tracker.get_retrieval_stats(memory_ids=[42])
         assert stats[42]["count"] == 1
 
-    def test_log_retrieval_multiple_increments(self):
-        self.tracker.log_retrieval(memory_id=10, query="q1")
-        self.tracker.log_retrieval(memory_id=10, query="q2")
-        stats = self.tracker.get_retrieval_stats(memory_ids=[10])
+    def test_log_retrieval_multiple_increments(self, tracker):
+        tracker.log_retrieval(memory_id=10, query="q1")
+        tracker.log_retrieval(memory_id=10, query="q2")
+        stats = tracker.get_retrieval_stats(memory_ids=[10])
         assert stats[10]["count"] == 2
 
-    def test_get_retrieval_stats_returns_last_ts(self):
-        self.tracker.log_retrieval(memory_id=5, query="q1", source="test")
-        stats = self.tracker.get_retrieval_stats(memory_ids=[5])
+    def test_get_retrieval_stats_returns_last_ts(self, tracker):
+        tracker.log_retrieval(memory_id=5, query="q1", source="test")
+        stats = tracker.get_retrieval_stats(memory_ids=[5])
         assert stats[5]["last_retrieved_at"] is not None
 
-    def test_get_retrieval_stats_missing_ids_return_zero(self):
-        stats = self.tracker.get_retrieval_stats(memory_ids=[99, 100])
+    def test_get_retrieval_stats_missing_ids_return_zero(self, tracker):
+        stats = tracker.get_retrieval_stats(memory_ids=[99, 100])
         assert stats[99]["count"] == 0
         assert stats[99]["last_retrieved_at"] is None
         assert stats[100]["count"] == 0
 
-    def test_get_unretrieved_memory_ids(self):
-        self.tracker.log_retrieval(memory_id=1, query="q1")
-        unretrieved = self.tracker.get_unretrieved_memory_ids(
+    def test_get_unretrieved_memory_ids(self, tracker):
+        tracker.log_retrieval(memory_id=1, query="q1")
+        unretrieved = tracker.get_unretrieved_memory_ids(
             all_memory_ids=[1, 2, 3]
         )
         assert set(unretrieved) == {2, 3}
 
-    def test_get_unretrieved_memory_ids_all_retrieved(self):
-        self.tracker.log_retrieval(memory_id=1, query="q1")
-        self.tracker.log_retrieval(memory_id=2, query="q2")
-        unretrieved = self.tracker.get_unretrieved_memory_ids(
+    def test_get_unretrieved_memory_ids_all_retrieved(self, tracker):
+        tracker.log_retrieval(memory_id=1, query="q1")
+        tracker.log_retrieval(memory_id=2, query="q2")
+        unretrieved = tracker.get_unretrieved_memory_ids(
             all_memory_ids=[1, 2]
         )
         assert unretrieved == []
 
-    def test_get_unretrieved_memory_ids_none_retrieved(self):
-        unretrieved = self.tracker.get_unretrieved_memory_ids(
+    def test_get_unretrieved_memory_ids_none_retrieved(self, tracker):
+        unretrieved = tracker.get_unretrieved_memory_ids(
             all_memory_ids=[1, 2, 3]
         )
         assert set(unretrieved) == {1, 2, 3}
 
-    def test_log_retrieval_truncates_long_query(self):
+    def test_log_retrieval_truncates_long_query(self, tracker):
         long_query = "x" * 1000
-        self.tracker.log_retrieval(memory_id=7, query=long_query, source="test")
-        stats = self.tracker.get_retrieval_stats(memory_ids=[7])
+        tracker.log_retrieval(memory_id=7, query=long_query, source="test")
+        stats = tracker.get_retrieval_stats(memory_ids=[7])
         assert stats[7]["count"] == 1
 
     def test_null_tracker_noop(self):
@@ -72,3 +76,209 @@ class TestRetrievalTracking:
     def test_null_tracker_get_unretrieved_memory_ids(self):
         tracker = NullTracker()
         assert tracker.get_unretrieved_memory_ids(all_memory_ids=[1, 2, 3]) == []
+
+    def test_null_tracker_covers_public_interface(self):
+        public = {
+            name for name, value in vars(UsageTracker).items() if callable(value) and not name.startswith("_")
+        }
+        assert public <= set(dir(NullTracker))
+        assert NullTracker().log_api_event("search", source="s", count=2) is None
+
+
+class TestEventBatching:
+    def test_api_events_buffer_until_flush(self, tmp_path):
+        db_path = str(tmp_path / "usage.db")
+        tracker = UsageTracker(db_path)
+        tracker.log_api_event("search", "s1")
+        tracker.log_api_event("add", "s1", count=3)
+
+        conn = sqlite3.connect(db_path)
+        try:
+            assert conn.execute("SELECT COUNT(*) FROM api_events").fetchone()[0] == 0
+            tracker.flush()
+            rows = conn.execute("SELECT operation, source, count FROM api_events ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        assert rows == [("search", "s1", 1), ("add", "s1", 3)]
+
+    def test_get_usage_sees_buffered_events(self, tmp_path):
+        tracker = UsageTracker(str(tmp_path / "usage.db"))
+        tracker.log_api_event("search", "s1")
+        tracker.log_extraction_tokens("openai", "gpt-4.1-nano", "extract", 100, 20)
+
+        usage = tracker.get_usage("all")
+        assert usage["operations"]["search"]["total"] == 1
+        assert type(usage["operations"]) is dict
+        assert type(usage["operations"]["search"]["by_source"]) is dict
+        assert usage["extraction"]["total_calls"] == 1
+        assert usage["extraction"]["total_input_tokens"] == 100
+
+    def test_flushes_when_buffer_fills(self, tmp_path):
+        db_path = str(tmp_path / "usage.db")
+        tracker = UsageTracker(db_path)
+        for _ in range(FLUSH_MAX_EVENTS):
+            tracker.log_api_event("search")
+
+        conn = sqlite3.connect(db_path)
+        try:
+            assert conn.execute("SELECT COUNT(*) FROM api_events").fetchone()[0] == FLUSH_MAX_EVENTS
+        finally:
+            conn.close()
+
+    def test_wal_mode_persists_for_new_connections(self, tmp_path):
+        db_path = str(tmp_path / "usage.db")
+        UsageTracker(db_path)
+
+        conn = sqlite3.connect(db_path)
+        try:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        finally:
+            conn.close()
+
+    def test_get_usage_reuses_read_connection(self, tmp_path):
+        tracker = UsageTracker(str(tmp_path / "usage.db"))
+        tracker.log_api_event("search")
+        assert tracker.get_usage("all")["operations"]["search"]["total"] == 1
+        read_conn = tracker._read_conn
+
+        tracker.log_api_event("search")
+        assert tracker.get_usage("all")["operations"]["search"]["total"] == 2
+        assert tracker._read_conn is read_conn
+
+    def test_get_usage_period_excludes_old_events(self, tmp_path):
+        db_path = str(tmp_path / "usage.db")
+        tracker = UsageTracker(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "INSERT INTO api_events (ts, operation, source, count) VALUES ('2000-01-01T00:00:00Z', 'search', 'old', 1)"
+        )
+        conn.commit()
+        conn.close()
+        tracker.log_api_event("search", "new")
+
+        assert tracker.get_usage("7d")["operations"]["search"]["by_source"] == {"new": 1}
+        assert tracker.get_usage("all")["operations"]["search"]["total"] == 2
+
+    def test_get_usage_estimates_cost_per_model(self, tmp_path):
+        tracker = UsageTracker(str(tmp_path / "usage.db"))
+        tracker.log_extraction_tokens("openai", "gpt-4.1-mini", "extract", 1_000_000, 500_000)
+        tracker.log_extraction_tokens("custom", "unpriced-model", "extract", 1_000_000, 0)
+
+        # 0.40 + 0.5 * 1.60 for gpt-4.1-mini, plus the $1/1M input fallback.
+        assert tracker.get_usage("all")["extraction"]["estimated_cost_usd"] == pytest.approx(2.2)
+
+    def test_idle_events_flush_in_background(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(usage_tracker, "FLUSH_INTERVAL_SEC", 0.05)
+        db_path = str(tmp_path / "usage.db")
+        tracker = UsageTracker(db_path)
+        tracker.log_api_event("search")
+
+        conn = sqlite3.connect(db_path)
+        try:
+            deadline = time.monotonic() + 5
+            count = 0
+            while count == 0 and time.monotonic() < deadline:
+                time.sleep(0.02)
+                count = conn.execute("SELECT COUNT(*) FROM api_events").fetchone()[0]
+        finally:
+            conn.close()
+        assert count == 1
+
+    def test_background_flusher_reuses_one_connection(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(usage_tracker, "FLUSH_INTERVAL_SEC", 0.05)
+        db_path = str(tmp_path / "usage.db")
+        tracker = UsageTracker(db_path)
+        connect = tracker._connect
+        opened = []
+        monkeypatch.setattr(tracker, "_connect", lambda *a, **kw: opened.append(1) or connect(*a, **kw))
+        # Leave every write to the background thread.
+        monkeypatch.setattr(tracker, "_maybe_flush", lambda: None)
+
+        conn = sqlite3.connect(db_path)
+        try:
+            for expected, operation in enumerate(("search", "add"), start=1):
+                tracker.log_api_event(operation)
+                deadline = time.monotonic() + 5
+                count = 0
+                while count < expected and time.monotonic() < deadline:
+                    time.sleep(0.02)
+                    count = conn.execute("SELECT COUNT(*) FROM api_events").fetchone()[0]
+                assert count == expected
+        finally:
+            conn.close()
+        assert len(opened) == 1
+
+    def test_background_flusher_stops_with_tracker(self, tmp_path):
+        tracker = UsageTracker(str(tmp_path / "usage.db"))
+        flusher = tracker._flusher
+        del tracker
+        gc.collect()
+        flusher.join(timeout=5)
+        assert not flusher.is_alive()
+
+    def test_failed_flush_keeps_events_for_retry(self, tmp_path, monkeypatch):
+        tracker = UsageTracker(str(tmp_path / "usage.db"))
+        tracker.log_api_event("search")
+        broken = MagicMock()
+        broken.execute.side_effect = sqlite3.OperationalError("database is locked")
+        with monkeypatch.context() as mp:
+            mp.setattr(tracker, "_get_conn", lambda: broken)
+            tracker.flush()
+
+        assert tracker.get_usage("all")["operations"]["search"]["total"] == 1
+
+    def test_exit_hook_does_not_keep_tracker_alive(self, tmp_path):
+        tracker = UsageTracker(str(tmp_path / "usage.db"))
+        ref = weakref.ref(tracker)
+        del tracker
+        gc.collect()
+        assert ref() is None
+
+    def test_buffered_events_carry_log_time_ts(self, tmp_path):
+        db_path = str(tmp_path / "usage.db")
+        tracker = UsageTracker(db_path)
+        tracker.log_api_event("search")
+        tracker.flush()
+
+        conn = sqlite3.connect(db_path)
+        try:
+            ts, sqlite_now = conn.execute(
+                "SELECT ts, strftime('%Y-%m-%dT%H:%M:%SZ', 'now') FROM api_events"
+            ).fetchone()
+        finally:
+            conn.close()
+        assert len(ts) == len(sqlite_now) and ts.endswith("Z")
+        assert ts <= sqlite_now
+
+    def test_usage_queries_use_covering_indexes(self, tmp_path):
+        db_path = str(tmp_path / "usage.db")
+        UsageTracker(db_path)
+
+        conn = sqlite3.connect(db_path)
+        try:
+            api_plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT operation, source, SUM(count) FROM api_events "
+                "WHERE ts >= ? GROUP BY operation, source",
+                ("2000-01-01T00:00:00Z",),
+            ).fetchall()
+            tok_plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT provider, model, stage, SUM(input_tokens), SUM(output_tokens) "
+                "FROM extraction_tokens WHERE ts >= ? GROUP BY provider, model, stage",
+                ("2000-01-01T00:00:00Z",),
+            ).fetchall()
+        finally:
+            conn.close()
+        assert "COVERING INDEX idx_api_events_ts_op_src" in " ".join(row[-1] for row in api_plan)
+        assert "COVERING INDEX idx_ext_ts_model" in " ".join(row[-1] for row in tok_plan)
+
+    def test_flush_failures_are_counted_and_rate_limited(self, tmp_path, caplog):
+        tracker = UsageTracker(str(tmp_path / "usage.db"))
+        tracker._get_conn().execute("DROP TABLE api_events")
+
+        with caplog.at_level("WARNING", logger="usage_tracker"):
+            for _ in range(3):
+                tracker.log_api_event("search")
+                tracker.flush()
+
+        assert tracker._flush_errors == 3
+        assert len([r for r in caplog.records if "Failed to flush" in r.getMessage()]) == 1
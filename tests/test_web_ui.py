@@ -1,26 +1,17 @@
 """Tests for browser UI routes and static assets."""
 
-import os
-from unittest.mock import MagicMock, patch
-
 import pytest
-from fastapi.testclient import TestClient
-
 
-@pytest.fixture
-def client():
-    with patch.dict(os.environ, {"API_KEY": "test-key", "EXTRACT_PROVIDER": ""}):
-        import importlib
-        import app as app_module
 
-        importlib.reload(app_module)
+class _StubEngine:
+    """The UI routes never touch the engine, so any engine call fails loudly."""
 
-        mock_engine = MagicMock()
-        mock_engine.stats_light.return_value = {"total_memories": 5}
-        mock_engine.stats.return_value = {"total_memories": 5}
-        app_module.memory = mock_engine
 
-        yield TestClient(app_module.app)
+@pytest.fixture
+def client(app_env, monkeypatch):
+    app_module, test_client = app_env
+    monkeypatch.setattr(app_module, "memory", _StubEngine())
+    yield test_client
 
 
 def test_ui_page_is_served_without_api_key_header(client):
@@ -3,9 +3,14 @@
 Enabled via USAGE_TRACKING=true env var. When disabled, NullTracker provides
 zero-overhead no-op stubs with the same interface.
 """
+import atexit
 import logging
 import sqlite3
 import threading
+import time
+import weakref
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any
 
 logger = logging.getLogger(__name__)
@@ -22,6 +27,65 @@ MODEL_PRICING = {
     "gemma3:4b": {"input": 0.0, "output": 0.0},
 }
 
+# (input, output) USD per token, pre-divided so cost is two multiplies per model.
+_TOKEN_RATES = {
+    model: (pricing["input"] / 1_000_000, pricing["output"] / 1_000_000)
+    for model, pricing in MODEL_PRICING.items()
+}
+_FALLBACK_TOKEN_RATES = (1.0 / 1_000_000, 4.0 / 1_000_000)
+
+
+def _rate_case_sql(side: int) -> str:
+    whens = " ".join(
+        "WHEN '{}' THEN {!r}".format(model.replace("'", "''"), rates[side])
+        for model, rates in _TOKEN_RATES.items()
+    )
+    return f"CASE model {whens} ELSE {_FALLBACK_TOKEN_RATES[side]!r} END"
+
+
+# Cost of one extraction_tokens group, evaluated by SQLite inside the GROUP BY.
+_COST_SQL = f"SUM(input_tokens) * {_rate_case_sql(0)} + SUM(output_tokens) * {_rate_case_sql(1)}"
+
+# api_events / extraction_tokens rows are buffered and written in one
+# transaction once either limit is reached (or on flush()). A background thread
+# flushes whatever an idle server leaves in the buffer every FLUSH_INTERVAL_SEC.
+FLUSH_MAX_EVENTS = 256
+FLUSH_INTERVAL_SEC = 1.0
+# Rows from failed flushes are kept for retry up to this many per table;
+# older rows beyond it are dropped and counted.
+FLUSH_BACKLOG_MAX = 16 * FLUSH_MAX_EVENTS
+
+# Live trackers, flushed once at interpreter exit without keeping them alive.
+_live_trackers: "weakref.WeakSet[UsageTracker]" = weakref.WeakSet()
+
+
+def _flush_live_trackers() -> None:
+    for tracker in list(_live_trackers):
+        tracker._stop_flusher()
+        tracker.flush()
+
+
+def _run_flusher(ref: "weakref.ref[UsageTracker]", stop: threading.Event) -> None:
+    """Flush a tracker's buffers every FLUSH_INTERVAL_SEC until ``stop`` is set.
+
+    Holds only a weak reference between passes so the tracker can still be
+    collected; its finalizer sets ``stop``. The thread keeps one connection
+    for its lifetime and closes it on the way out.
+    """
+    while not stop.wait(FLUSH_INTERVAL_SEC):
+        tracker = ref()
+        if tracker is None:
+            return
+        if tracker._buf_api or tracker._buf_tok:
+            tracker.flush()
+        del tracker
+    tracker = ref()
+    if tracker is not None:
+        tracker._close_thread_conn()
+
+
+atexit.register(_flush_live_trackers)
+
 PERIOD_SQL = {
     "today": "AND ts >= strftime('%Y-%m-%dT00:00:00Z', 'now')",
     "7d": "AND ts >= strftime('%Y-%m-%dT%H:%M:%SZ', 'now', '-7 days')",
@@ -29,26 +93,44 @@ PERIOD_SQL = {
     "all": "",
 }
 
+PERIOD_DAYS = {"7d": 7, "30d": 30}
 
-class NullTracker:
-    """No-op tracker when usage tracking is disabled."""
 
-    def log_api_event(self, operation: str, source: str = "", count: int = 1) -> None:
-        pass
+def _period_cutoff(period: str) -> str | None:
+    """Lower bound on ``ts`` for a PERIOD_SQL period, or None for "all".
 
-    def log_extraction_tokens(
-        self,
-        provider: str,
-        model: str,
-        stage: str,
-        input_tokens: int = 0,
-        output_tokens: int = 0,
-        source: str = "",
-    ) -> None:
-        pass
+    Same bounds as PERIOD_SQL, but computed in Python so the query text stays
+    fixed and can be served from the connection's statement cache.
+    """
+    if period == "all":
+        return None
+    now = datetime.now(timezone.utc)
+    if period == "today":
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        start = now - timedelta(days=PERIOD_DAYS.get(period, 7))
+    return start.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _noop(*args: Any, **kwargs: Any) -> None:
+    pass
 
-    def log_retrieval(self, memory_id: int, query: str = "", source: str = "", rank: int = 0, result_count: int = 0) -> None:
-        pass
+
+class NullTracker:
+    """No-op tracker when usage tracking is disabled.
+
+    The write paths run on every request, so they share one module-level
+    no-op as staticmethods instead of paying for a bound-method call each.
+    """
+
+    log_api_event = staticmethod(_noop)
+    log_extraction_tokens = staticmethod(_noop)
+    log_retrieval = staticmethod(_noop)
+    log_search_feedback = staticmethod(_noop)
+    log_extraction_outcome = staticmethod(_noop)
+    log_graph_search = staticmethod(_noop)
+    log_temporal_search = staticmethod(_noop)
+    flush = staticmethod(_noop)
 
     def get_retrieval_stats(self, memory_ids: list[int]) -> dict:
         return {}
@@ -56,9 +138,6 @@ class NullTracker:
     def get_unretrieved_memory_ids(self, all_memory_ids: list[int]) -> list[int]:
         return []
 
-    def log_search_feedback(self, memory_id: int, query: str = "", signal: str = "", search_id: str = "") -> None:
-        pass
-
     def get_feedback_scores(self, memory_ids: list[int]) -> dict[int, int]:
         return {}
 
@@ -71,25 +150,12 @@ class NullTracker:
     def get_search_quality(self, period: str = "7d", memory_ids: list | None = None) -> Dict[str, Any]:
         return {"enabled": False}
 
-    def log_extraction_outcome(self, source: str = "", extracted: int = 0, stored: int = 0,
-                               updated: int = 0, deleted: int = 0, noop: int = 0, conflict: int = 0,
-                               fallback: int = 0, links_created: int = 0) -> None:
-        pass
-
     def get_extraction_quality(self, period: str = "7d") -> Dict[str, Any]:
         return {"enabled": False}
 
-    def log_graph_search(self, query: str = "", graph_weight: float = 0.0,
-                         direct_count: int = 0, graph_count: int = 0, total_results: int = 0) -> None:
-        pass
-
     def get_graph_search_stats(self, period: str = "7d") -> dict:
         return {}
 
-    def log_temporal_search(self, query: str = "", has_since: bool = False,
-                            has_until: bool = False, auto_detected: bool = False) -> None:
-        pass
-
     def get_temporal_search_stats(self, period: str = "7d") -> dict:
         return {}
 
@@ -117,8 +183,21 @@ class UsageTracker:
     def __init__(self, db_path: str):
         self._db_path = db_path
         self._local = threading.local()
-        # Create tables on init using a dedicated connection
+        self._buf_lock = threading.Lock()
+        self._buf_api: list[tuple] = []
+        self._buf_tok: list[tuple] = []
+        self._last_flush = time.monotonic()
+        self._ts_cache = (0, "")
+        self._flush_errors = 0
+        self._retry_after = 0.0
+        self._dropped_events = 0
+        self._read_lock = threading.Lock()
+        self._read_conn: sqlite3.Connection | None = None
+        # Create tables on init using a dedicated connection. WAL mode is
+        # stored in the database file, so setting it once here covers every
+        # later connection.
         conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
         conn.executescript("""
             CREATE TABLE IF NOT EXISTS api_events (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -137,9 +216,16 @@ class UsageTracker:
                 output_tokens INTEGER DEFAULT 0,
                 source TEXT DEFAULT ''
             );
-            CREATE INDEX IF NOT EXISTS idx_api_events_ts ON api_events(ts);
-            CREATE INDEX IF NOT EXISTS idx_api_events_op ON api_events(operation);
-            CREATE INDEX IF NOT EXISTS idx_extraction_tokens_ts ON extraction_tokens(ts);
+            -- Covering indexes for the ts range + GROUP BY scans. They replace
+            -- the single-column indexes, which the planner would otherwise
+            -- prefer for GROUP BY operation at the cost of a row lookup each.
+            DROP INDEX IF EXISTS idx_api_events_ts;
+            DROP INDEX IF EXISTS idx_api_events_op;
+            DROP INDEX IF EXISTS idx_extraction_tokens_ts;
+            CREATE INDEX IF NOT EXISTS idx_api_events_ts_op_src
+                ON api_events(ts, operation, source, count);
+            CREATE INDEX IF NOT EXISTS idx_ext_ts_model
+                ON extraction_tokens(ts, provider, model, stage, input_tokens, output_tokens);
             CREATE TABLE IF NOT EXISTS retrieval_log (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 ts TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ','now')),
@@ -220,12 +306,28 @@ class UsageTracker:
         except Exception:
             pass
         conn.close()
+        self._flusher_stop = threading.Event()
+        self._flusher = threading.Thread(
+            target=_run_flusher,
+            args=(weakref.ref(self), self._flusher_stop),
+            name="usage-tracker-flush",
+            daemon=True,
+        )
+        self._flusher.start()
+        weakref.finalize(self, self._flusher_stop.set)
+        _live_trackers.add(self)
         logger.info("Usage tracker initialized: %s", db_path)
 
-    def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self._db_path, timeout=5)
-        conn.execute("PRAGMA journal_mode=WAL")
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        # Autocommit: single-row writes commit on their own and flush() opens
+        # its transaction explicitly, so the module never issues implicit BEGINs.
+        conn = sqlite3.connect(
+            self._db_path, timeout=5, check_same_thread=check_same_thread, isolation_level=None
+        )
+        # Per-connection settings only; journal_mode=WAL is set once in __init__.
         conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
         return conn
 
     def _get_conn(self) -> sqlite3.Connection:
@@ -234,16 +336,103 @@ class UsageTracker:
             self._local.conn = self._connect()
         return self._local.conn
 
-    def log_api_event(self, operation: str, source: str = "", count: int = 1) -> None:
+    def _close_thread_conn(self) -> None:
+        """Close the calling thread's write connection, if it opened one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+    def _stop_flusher(self) -> None:
+        """Stop the background flusher and wait briefly for it to exit."""
+        self._flusher_stop.set()
+        if self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=FLUSH_INTERVAL_SEC)
+
+    def _get_read_conn(self) -> sqlite3.Connection:
+        """Shared connection for dashboard reads; callers must hold _read_lock."""
+        if self._read_conn is None:
+            self._read_conn = self._connect(check_same_thread=False)
+            self._read_conn.execute("PRAGMA cache_size=-20000")
+        return self._read_conn
+
+    def _now_ts(self) -> str:
+        """Current UTC time in the ts column format, formatted at most once per second."""
+        now = int(time.time())
+        cached = self._ts_cache
+        if cached[0] != now:
+            cached = self._ts_cache = (now, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)))
+        return cached[1]
+
+    def _maybe_flush(self) -> None:
+        """Flush buffered events once the size or age threshold is crossed."""
+        now = time.monotonic()
+        if now < self._retry_after:
+            return
+        if (
+            len(self._buf_api) + len(self._buf_tok) >= FLUSH_MAX_EVENTS
+            or now - self._last_flush >= FLUSH_INTERVAL_SEC
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered api_events and extraction_tokens rows in one transaction."""
+        with self._buf_lock:
+            buf_api, self._buf_api = self._buf_api, []
+            buf_tok, self._buf_tok = self._buf_tok, []
+            self._last_flush = time.monotonic()
+        if not buf_api and not buf_tok:
+            return
         try:
             conn = self._get_conn()
-            conn.execute(
-                "INSERT INTO api_events (operation, source, count) VALUES (?, ?, ?)",
-                (operation, source, count),
-            )
-            conn.commit()
-        except Exception:
-            logger.debug("Failed to log api event", exc_info=True)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if buf_api:
+                    conn.executemany(
+                        "INSERT INTO api_events (ts, operation, source, count) VALUES (?, ?, ?, ?)",
+                        buf_api,
+                    )
+                if buf_tok:
+                    conn.executemany(
+                        "INSERT INTO extraction_tokens "
+                        "(ts, provider, model, stage, input_tokens, output_tokens, source) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        buf_tok,
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            # Put the rows back ahead of newer ones for the next flush, and
+            # hold off size-triggered retries for one interval.
+            with self._buf_lock:
+                self._buf_api[:0] = buf_api
+                self._buf_tok[:0] = buf_tok
+                for buf in (self._buf_api, self._buf_tok):
+                    overflow = len(buf) - FLUSH_BACKLOG_MAX
+                    if overflow > 0:
+                        del buf[:overflow]
+                        self._dropped_events += overflow
+                self._retry_after = time.monotonic() + FLUSH_INTERVAL_SEC
+            # Count every failure but only log the 1st, 1025th, ... so a locked
+            # or full database does not build a traceback per flush.
+            self._flush_errors += 1
+            if self._flush_errors & 0x3FF == 1:
+                logger.warning(
+                    "Failed to flush %d usage events, kept for retry "
+                    "(%d flush failures, %d events dropped so far)",
+                    len(buf_api) + len(buf_tok),
+                    self._flush_errors,
+                    self._dropped_events,
+                    exc_info=True,
+                )
+
+    def log_api_event(self, operation: str, source: str = "", count: int = 1) -> None:
+        with self._buf_lock:
+            self._buf_api.append((self._now_ts(), operation, source, count))
+        self._maybe_flush()
 
     def log_extraction_tokens(
         self,
@@ -254,16 +443,9 @@ class UsageTracker:
         output_tokens: int = 0,
         source: str = "",
     ) -> None:
-        try:
-            conn = self._get_conn()
-            conn.execute(
-                "INSERT INTO extraction_tokens (provider, model, stage, input_tokens, output_tokens, source) "
-                "VALUES (?, ?, ?, ?, ?, ?)",
-                (provider, model, stage, input_tokens, output_tokens, source),
-            )
-            conn.commit()
-        except Exception:
-            logger.debug("Failed to log extraction tokens", exc_info=True)
+        with self._buf_lock:
+            self._buf_tok.append((self._now_ts(), provider, model, stage, input_tokens, output_tokens, source))
+        self._maybe_flush()
 
     def log_retrieval(self, memory_id: int, query: str = "", source: str = "", rank: int = 0, result_count: int = 0) -> None:
         try:
@@ -272,7 +454,6 @@ class UsageTracker:
                 "INSERT INTO retrieval_log (memory_id, query, source, rank, result_count) VALUES (?, ?, ?, ?, ?)",
                 (memory_id, query[:500], source, rank, result_count),
             )
-            conn.commit()
         except Exception:
             logger.debug("Failed to log retrieval", exc_info=True)
 
@@ -317,7 +498,6 @@ class UsageTracker:
                 "INSERT INTO search_feedback (memory_id, query, signal, search_id) VALUES (?, ?, ?, ?)",
                 (memory_id, query[:500], signal, search_id),
             )
-            conn.commit()
         except Exception:
             logger.debug("Failed to log search feedback", exc_info=True)
 
@@ -356,13 +536,13 @@ class UsageTracker:
         conn = self._connect()
         try:
             cursor = conn.execute("DELETE FROM search_feedback WHERE id = ?", (feedback_id,))
-            conn.commit()
             return cursor.rowcount > 0
         finally:
             conn.close()
 
     def get_search_quality(self, period: str = "7d", memory_ids: list | None = None) -> Dict[str, Any]:
         period_filter = PERIOD_SQL.get(period, PERIOD_SQL["7d"])
+        self.flush()
         conn = self._connect()
         conn.row_factory = sqlite3.Row
         try:
@@ -454,7 +634,6 @@ class UsageTracker:
                 "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 (source, extracted, stored, updated, deleted, noop, conflict, fallback, links_created),
             )
-            conn.commit()
         except Exception:
             logger.debug("Failed to log extraction outcome", exc_info=True)
 
@@ -467,7 +646,6 @@ class UsageTracker:
                 "VALUES (?, ?, ?, ?, ?)",
                 (query[:500], graph_weight, direct_count, graph_count, total_results),
             )
-            conn.commit()
         except Exception:
             logger.debug("Failed to log graph search event", exc_info=True)
 
@@ -502,7 +680,6 @@ class UsageTracker:
                 "VALUES (?, ?, ?, ?)",
                 (query[:500], int(has_since), int(has_until), int(auto_detected)),
             )
-            conn.commit()
         except Exception:
             logger.debug("Failed to log temporal search event", exc_info=True)
 
@@ -600,71 +777,72 @@ class UsageTracker:
             conn.close()
 
     def get_usage(self, period: str = "7d") -> Dict[str, Any]:
-        period_filter = PERIOD_SQL.get(period, PERIOD_SQL["7d"])
-        conn = self._connect()
-        conn.row_factory = sqlite3.Row
-        try:
-            # Operations by source
-            rows = conn.execute(
-                f"SELECT operation, source, SUM(count) as total FROM api_events WHERE 1=1 {period_filter} GROUP BY operation, source"
-            ).fetchall()
-            operations: Dict[str, Any] = {}
-            for row in rows:
-                op = row["operation"]
-                if op not in operations:
-                    operations[op] = {"total": 0, "by_source": {}}
-                operations[op]["total"] += row["total"]
-                src = row["source"] or "(unknown)"
-                operations[op]["by_source"][src] = operations[op]["by_source"].get(src, 0) + row["total"]
-
-            # Extraction tokens
-            rows = conn.execute(
-                f"SELECT provider, model, stage, SUM(input_tokens) as inp, SUM(output_tokens) as out, COUNT(*) as calls "
-                f"FROM extraction_tokens WHERE 1=1 {period_filter} GROUP BY provider, model, stage"
-            ).fetchall()
-            total_input = 0
-            total_output = 0
-            total_calls = 0
-            by_model: Dict[str, Any] = {}
-            for row in rows:
-                total_input += row["inp"]
-                total_output += row["out"]
-                total_calls += row["calls"]
-                model_key = row["model"]
-                if model_key not in by_model:
-                    by_model[model_key] = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
-                by_model[model_key]["calls"] += row["calls"]
-                by_model[model_key]["input_tokens"] += row["inp"]
-                by_model[model_key]["output_tokens"] += row["out"]
-
-            # Estimate cost
-            estimated_cost = 0.0
-            for model_key, data in by_model.items():
-                pricing = MODEL_PRICING.get(model_key)
-                if pricing is None:
-                    logger.warning("Unknown model %r for pricing; using fallback $1/$4 per 1M tokens", model_key)
-                    pricing = {"input": 1.0, "output": 4.0}
-                estimated_cost += (data["input_tokens"] / 1_000_000) * pricing["input"]
-                estimated_cost += (data["output_tokens"] / 1_000_000) * pricing["output"]
-
-            return {
-                "enabled": True,
-                "period": period,
-                "operations": operations,
-                "extraction": {
-                    "total_calls": total_calls,
-                    "total_input_tokens": total_input,
-                    "total_output_tokens": total_output,
-                    "by_model": by_model,
-                    "estimated_cost_usd": round(estimated_cost, 4),
-                },
-            }
-        finally:
-            conn.close()
+        cutoff = _period_cutoff(period)
+        if cutoff is None:
+            # "all": no predicate at all, so SQLite plans a plain scan.
+            where, params = "", ()
+        else:
+            where, params = "WHERE ts >= ?", (cutoff, cutoff)
+        self.flush()
+        # Both groupings in one statement: 'api' rows are (operation, source,
+        # total) and 'tok' rows are (provider, model, stage, inp, out, calls, cost).
+        sql = (
+            f"SELECT 'api' AS kind, operation AS a, source AS b, '' AS c, SUM(count) AS n1, 0 AS n2, 0 AS n3, "
+            f"0.0 AS cost FROM api_events {where} GROUP BY operation, source "
+            f"UNION ALL "
+            f"SELECT 'tok', provider, model, stage, SUM(input_tokens), SUM(output_tokens), COUNT(*), "
+            f"{_COST_SQL} FROM extraction_tokens {where} GROUP BY provider, model, stage"
+        )
+        with self._read_lock:
+            rows = self._get_read_conn().execute(sql, params).fetchall()
+
+        operations: Dict[str, Any] = defaultdict(lambda: {"total": 0, "by_source": defaultdict(int)})
+        total_input = 0
+        total_output = 0
+        total_calls = 0
+        by_model: Dict[str, Any] = {}
+        estimated_cost = 0.0
+        for kind, a, b, _c, n1, n2, n3, cost in rows:
+            if kind == "api":
+                # Operations by source: a=operation, b=source, n1=total
+                bucket = operations[a]
+                bucket["total"] += n1
+                bucket["by_source"][b or "(unknown)"] += n1
+                continue
+            # Extraction tokens: b=model, n1=input, n2=output, n3=calls
+            total_input += n1
+            total_output += n2
+            total_calls += n3
+            estimated_cost += cost
+            model_bucket = by_model.get(b)
+            if model_bucket is None:
+                if b not in _TOKEN_RATES:
+                    logger.warning("Unknown model %r for pricing; using fallback $1/$4 per 1M tokens", b)
+                model_bucket = by_model[b] = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+            model_bucket["calls"] += n3
+            model_bucket["input_tokens"] += n1
+            model_bucket["output_tokens"] += n2
+
+        return {
+            "enabled": True,
+            "period": period,
+            "operations": {
+                op: {"total": bucket["total"], "by_source": dict(bucket["by_source"])}
+                for op, bucket in operations.items()
+            },
+            "extraction": {
+                "total_calls": total_calls,
+                "total_input_tokens": total_input,
+                "total_output_tokens": total_output,
+                "by_model": by_model,
+                "estimated_cost_usd": round(estimated_cost, 4),
+            },
+        }
 
     def get_quality_summary(self, period: str = "7d") -> Dict[str, Any]:
         """Top-level efficacy metrics combining retrieval and extraction quality."""
         period_filter = PERIOD_SQL.get(period, PERIOD_SQL["7d"])
+        self.flush()
         conn = self._connect()
         conn.row_factory = sqlite3.Row
         try: